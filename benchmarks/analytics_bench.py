@@ -0,0 +1,114 @@
+"""Script-thread blocking time: inline analytics vs the process-pool executor
+
+Builds a window of synthetic sessions and times each job (clustered
+correlation of the top symbols, multi-day summary of the universe) three
+ways: computed inline on the calling thread, submitted to a warm
+AnalyticsExecutor (time until the caller is free again, and until the
+result is ready), and submitted by many sessions at once (deduplicated to
+one run). Also reports the input size handed over via shared memory
+compared with pickling the same arrays.
+
+Usage:
+    python benchmarks/analytics_bench.py [--days 10] [--symbols 550] [--top 200] [--sessions 8]
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd  # noqa: E402
+
+from psx.analytics import AnalyticsExecutor, correlation_job, share_arrays, summary_job  # noqa: E402
+from psx.data.synthetic import synthetic_session  # noqa: E402
+from psx.history import SessionHistory  # noqa: E402
+
+
+def window_arrays(histories, rows, fields):
+    arrays = {}
+    for i, history in enumerate(histories):
+        for field, name in fields.items():
+            arrays[f"{name}_{i}"] = history.matrix(field)[rows]
+    return arrays
+
+
+def inline(func, arrays, n_sessions, outputs):
+    """Run a job on this thread with private output arrays"""
+    import numpy as np
+
+    local = dict(arrays)
+    for name, (shape, dtype) in outputs.items():
+        local[name] = np.full(shape, np.nan, dtype=dtype)
+    local['progress'] = np.zeros(2)
+    started = time.perf_counter()
+    func(local, n_sessions=n_sessions)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=10)
+    parser.add_argument('--symbols', type=int, default=550)
+    parser.add_argument('--top', type=int, default=200)
+    parser.add_argument('--sessions', type=int, default=8)
+    args = parser.parse_args()
+
+    days = pd.bdate_range(end='2025-01-17', periods=args.days)
+    histories = [
+        SessionHistory.from_frame(synthetic_session(day.strftime('%Y-%m-%d'), n_symbols=args.symbols, seed=i))
+        for i, day in enumerate(days)
+    ]
+    jobs = [
+        ('correlation', correlation_job, window_arrays(histories, slice(0, args.top), {'current_price': 'prices'}),
+         {'corr': ((args.top, args.top), 'f8')}),
+        ('summary', summary_job, window_arrays(histories, slice(None), {
+            'current_price': 'price', 'high': 'high', 'low': 'low', 'volume': 'volume'}), {}),
+    ]
+
+    executor = AnalyticsExecutor()
+    # Start the pool processes outside the timings
+    executor.submit('warm', summary_job, jobs[1][2], {'n_sessions': args.days}).result()
+
+    print(f"{args.days} sessions x 72 batches, {args.symbols} symbols (correlation over the top {args.top}), "
+          f"{executor.max_workers} pool workers, {os.cpu_count()} CPU(s)\n")
+    print(f"{'job':<13}{'input MB':>9}{'share ms':>10}{'pickle ms':>11}{'inline ms':>11}"
+          f"{'blocked ms':>12}{'ready ms':>10}{'N sessions ms':>15}{'runs':>6}")
+    for name, func, arrays, outputs in jobs:
+        size = sum(array.nbytes for array in arrays.values()) / 1e6
+        started = time.perf_counter()
+        block, _ = share_arrays(arrays)
+        share_ms = (time.perf_counter() - started) * 1000.0
+        block.close()
+        block.unlink()
+        started = time.perf_counter()
+        pickle.loads(pickle.dumps(arrays, protocol=pickle.HIGHEST_PROTOCOL))
+        pickle_ms = (time.perf_counter() - started) * 1000.0
+
+        inline_ms = inline(func, arrays, args.days, outputs) * 1000.0
+
+        params = {'n_sessions': args.days}
+        started = time.perf_counter()
+        job = executor.submit((name, 'single'), func, arrays, params, outputs=outputs)
+        blocked_ms = (time.perf_counter() - started) * 1000.0
+        job.result()
+        ready_ms = (time.perf_counter() - started) * 1000.0
+
+        # Identical requests from many sessions share one run
+        submitted = executor.counters['submitted']
+        started = time.perf_counter()
+        shared = [executor.submit((name, 'shared'), func, arrays, params, outputs=outputs) for _ in range(args.sessions)]
+        for each in shared:
+            each.result()
+        crowd_ms = (time.perf_counter() - started) * 1000.0
+        runs = executor.counters['submitted'] - submitted
+
+        print(f"{name:<13}{size:>9.1f}{share_ms:>10.1f}{pickle_ms:>11.1f}{inline_ms:>11.1f}"
+              f"{blocked_ms:>12.1f}{ready_ms:>10.1f}{crowd_ms:>15.1f}{runs:>6}")
+    executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Requests/sec of the headless API under concurrent keep-alive clients
+
+Starts the API in a child process over an in-memory backend holding a
+synthetic session from yesterday (so every batch is settled), warms it,
+then runs each scenario for a fixed time with N client threads, each on
+its own HTTP/1.1 connection. Reports throughput and latency percentiles.
+Pass --url to load-test a running server instead.
+
+Usage:
+    python benchmarks/api_load.py [--clients 8] [--seconds 3] [--symbols 550] [--url http://127.0.0.1:8502]
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def serve(port, n_symbols, ready):
+    import pandas as pd
+
+    from psx.api import make_server
+    from psx.data import DataManager, MemoryBackend
+    from psx.data.synthetic import synthetic_session
+
+    day = (pd.Timestamp.now(tz='Asia/Karachi') - pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+    server = make_server(DataManager(MemoryBackend(synthetic_session(day, n_symbols=n_symbols))), port=port)
+    ready.set()
+    server.serve_forever()
+
+
+def request(connection, path, headers=None):
+    connection.request('GET', path, headers=headers or {})
+    response = connection.getresponse()
+    body = response.read()
+    return response.status, response.getheader('ETag'), body
+
+
+def run(host, port, path, clients, seconds, headers=None):
+    """Requests/sec and latency percentiles (ms) for one path"""
+    latencies = []
+    statuses = set()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        connection = http.client.HTTPConnection(host, port)
+        mine = []
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            status, _, _ = request(connection, path, headers)
+            mine.append((time.perf_counter() - started) * 1000.0)
+            statuses.add(status)
+        connection.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': latencies[len(latencies) // 2],
+        'p95': latencies[int(len(latencies) * 0.95) - 1],
+        'statuses': sorted(statuses),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--symbols', type=int, default=550)
+    parser.add_argument('--url')
+    args = parser.parse_args()
+
+    process = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        host, port = '127.0.0.1', 8599
+        ready = multiprocessing.Event()
+        process = multiprocessing.Process(target=serve, args=(port, args.symbols, ready), daemon=True)
+        process.start()
+        ready.wait(60)
+        time.sleep(0.2)
+
+    try:
+        connection = http.client.HTTPConnection(host, port)
+        _, _, body = request(connection, '/batches?limit=10')
+        batch = quote(json.loads(body)[3])
+        _, etag, body = request(connection, f'/batch/{batch}')
+        symbol = json.loads(body)['data'][0][0]
+        # Warm the batch, metrics and history caches once
+        for path in (f'/batch/{batch}?format=arrow', f'/metrics/{batch}', f'/history/{symbol}'):
+            request(connection, path)
+        connection.close()
+
+        scenarios = [
+            ('batches', '/batches?limit=10', None),
+            ('batch json', f'/batch/{batch}', None),
+            ('batch arrow', f'/batch/{batch}?format=arrow', None),
+            ('batch 304', f'/batch/{batch}', {'If-None-Match': etag}),
+            ('batch 2 cols', f'/batch/{batch}?columns=symbol,current_price', None),
+            ('metrics', f'/metrics/{batch}', None),
+            ('history', f'/history/{symbol}', None),
+        ]
+        print(f"{args.clients} clients x {args.seconds:g}s per scenario, {args.symbols} symbols\n")
+        print(f"{'scenario':<14}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}  status")
+        for name, path, headers in scenarios:
+            result = run(host, port, path, args.clients, args.seconds, headers)
+            print(f"{name:<14}{result['rps']:>9.0f}{result['p50']:>9.2f}{result['p95']:>9.2f}  {result['statuses']}")
+    finally:
+        if process is not None:
+            process.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""DataManager benchmark against any data backend
+
+Runs the operations the apps perform on a session (batch listing, batch
+loads cold and cached, a full-session fetch) and prints per-operation
+instrumentation from the DataManager. The memory and parquet backends are
+filled with a synthetic session; supabase reads the configured project.
+
+Usage:
+    python benchmarks/backend_bench.py [--backend memory|parquet|supabase] [--symbols 500] [--batches 72]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from psx.data import DataManager, MemoryBackend, ParquetBackend, create_backend  # noqa: E402
+from psx.data.synthetic import synthetic_session  # noqa: E402
+
+
+def build_backend(kind, rows, workdir):
+    """Backend of the requested kind, seeded with ``rows`` where it is local"""
+    if kind == 'memory':
+        return MemoryBackend(rows)
+    if kind == 'parquet':
+        backend = ParquetBackend(os.path.join(workdir, 'stock_data'))
+        backend.write(rows, name='bench')
+        return backend
+    return create_backend(kind)
+
+
+def timed(label, func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    print(f"  {label:<34}{(time.perf_counter() - started) * 1000.0:>10.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', default='memory', choices=['memory', 'parquet', 'supabase'])
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--batches', type=int, default=72)
+    parser.add_argument('--session', default='2025-01-06')
+    args = parser.parse_args()
+
+    rows = synthetic_session(args.session, args.symbols, args.batches)
+    with tempfile.TemporaryDirectory() as workdir:
+        backend = build_backend(args.backend, rows, workdir)
+        if backend is None:
+            sys.exit("Backend is not configured (set SUPABASE_URL and SUPABASE_KEY)")
+        manager = DataManager(backend, on_error=lambda message: print(f"  ! {message}"))
+        session_date = pd.Timestamp(args.session).date()
+
+        print(f"{args.backend} backend, {manager.count_rows()} rows")
+        batches = timed("get_session_batches", manager.get_session_batches, session_date)
+        timed("get_session_batches (cached)", manager.get_session_batches, session_date)
+        if batches:
+            timed("get_data_by_timestamp (cold)", manager.get_data_by_timestamp, batches[len(batches) // 2])
+            timed("get_data_by_timestamp (cached)", manager.get_data_by_timestamp, batches[len(batches) // 2])
+            for ts in batches[:10]:
+                manager.get_data_by_timestamp(ts)
+        timed("get_session_data", manager.get_session_data, session_date)
+        timed("get_all_data", manager.get_all_data)
+
+        print("\nInstrumentation")
+        print(manager.instrumentation().to_string(float_format=lambda value: f"{value:.3f}"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Memory vs access latency of the compressed batch store
+
+Loads a synthetic session of validated batches into CompressedBatchStore
+under several codecs and hot-tier budgets, then replays random batch
+accesses (as the time-travel and diff views do) and reports resident
+bytes per tier and per-access latency.
+
+Usage:
+    python benchmarks/batch_store_bench.py [--symbols 500] [--batches 72] [--accesses 500]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from psx.data.store import CompressedBatchStore, frame_bytes  # noqa: E402
+from psx.data.synthetic import synthetic_session  # noqa: E402
+from psx.quality import validate_batch  # noqa: E402
+
+
+def session_batches(n_symbols, n_batches):
+    rows = synthetic_session(n_symbols=n_symbols, n_batches=n_batches)
+    return [
+        validate_batch(batch.reset_index(drop=True))
+        for _, batch in rows.groupby('scraped_at', sort=True)
+    ]
+
+
+def run(batches, codec, hot_batches, accesses, seed=0):
+    budget = sum(frame_bytes(df) for df in batches[:hot_batches]) if hot_batches else 0
+    store = CompressedBatchStore(hot_budget=budget, codec=codec)
+    for key, df in enumerate(batches):
+        store.put(key, df)
+    loaded = store.stats()
+
+    rng = np.random.default_rng(seed)
+    latencies = []
+    for key in rng.integers(0, len(batches), accesses):
+        started = time.perf_counter()
+        store.get(int(key))
+        latencies.append((time.perf_counter() - started) * 1000.0)
+    latencies.sort()
+    stats = store.stats()
+    return {
+        'resident_mb': (loaded['hot_bytes'] + loaded['cold_bytes']) / 1e6,
+        'cold_mb': loaded['cold_bytes'] / 1e6,
+        'median_ms': statistics.median(latencies),
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1],
+        'hot_hit_rate': stats['hot_hits'] / accesses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--batches', type=int, default=72)
+    parser.add_argument('--accesses', type=int, default=500)
+    args = parser.parse_args()
+
+    batches = session_batches(args.symbols, args.batches)
+    raw_mb = sum(frame_bytes(df) for df in batches) / 1e6
+    print(f"{len(batches)} batches x {args.symbols} symbols, {raw_mb:.1f} MB as DataFrames\n")
+
+    print(f"{'codec':<8}{'hot batches':>12}{'resident MB':>13}{'cold MB':>10}{'median ms':>11}{'p95 ms':>9}{'hot hits':>10}")
+    for codec in (None, 'lz4', 'zstd'):
+        for hot in (len(batches), 8, 0):
+            if codec is None and hot == len(batches):
+                label = 'none'
+            elif codec is None:
+                label = 'ipc'
+            else:
+                label = codec
+            result = run(batches, codec, hot, args.accesses)
+            print(
+                f"{label:<8}{hot:>12}{result['resident_mb']:>13.2f}{result['cold_mb']:>10.2f}"
+                f"{result['median_ms']:>11.3f}{result['p95_ms']:>9.3f}{result['hot_hit_rate']:>10.0%}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Memory and replay cost of the delta-encoded session history
+
+Builds a synthetic trading day in which a share of symbols never trade
+(price and volume frozen after the open, as with illiquid PSX names),
+then compares the dense SessionHistory matrices with DeltaHistory and
+times replaying single batches and expanding the whole day.
+
+Usage:
+    python benchmarks/delta_history_bench.py [--symbols 550] [--batches 72] [--illiquid 0.7]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from psx.data.synthetic import synthetic_session  # noqa: E402
+from psx.delta import DeltaHistory  # noqa: E402
+from psx.history import HISTORY_FIELDS, SessionHistory  # noqa: E402
+
+
+def session_rows(n_symbols, n_batches, illiquid, seed=0):
+    """Synthetic session with a fraction of symbols frozen at their first batch"""
+    df = synthetic_session(n_symbols=n_symbols, n_batches=n_batches, seed=seed)
+    rng = np.random.default_rng(seed)
+    symbols = df['symbol'].unique()
+    frozen = df['symbol'].isin(rng.choice(symbols, int(len(symbols) * illiquid), replace=False))
+    first = df[frozen].groupby('symbol')[list(HISTORY_FIELDS)].transform('first')
+    df.loc[frozen, list(HISTORY_FIELDS)] = first
+    return df
+
+
+def best_ms(func, repeat=20):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return min(times) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=550)
+    parser.add_argument('--batches', type=int, default=72)
+    parser.add_argument('--illiquid', type=float, default=0.7)
+    args = parser.parse_args()
+
+    history = SessionHistory.from_frame(session_rows(args.symbols, args.batches, args.illiquid))
+    delta = DeltaHistory.from_history(history)
+    dense = sum(history.matrix(field).nbytes for field in history.fields)
+
+    print(f"{history.n_symbols} symbols x {history.n_batches} batches, {args.illiquid:.0%} illiquid")
+    print(f"  dense matrices        {dense / 1e6:>8.2f} MB")
+    print(f"  delta encoded         {delta.nbytes() / 1e6:>8.2f} MB ({delta.nbytes() / dense:.0%})")
+    print(f"  encode day            {best_ms(lambda: DeltaHistory.from_history(history), 5):>8.2f} ms")
+    print(f"  replay first batch    {best_ms(lambda: delta.state(0)):>8.3f} ms")
+    print(f"  replay last batch     {best_ms(lambda: delta.state(-1)):>8.3f} ms")
+    print(f"  expand to dense       {best_ms(delta.to_history, 5):>8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
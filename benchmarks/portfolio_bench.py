@@ -0,0 +1,106 @@
+"""Mark-to-market of many portfolios per batch: per-portfolio merges vs one vectorized pass
+
+Builds N random portfolios over a synthetic universe and values them
+against every batch of a session. 'merge' joins each portfolio to the
+batch with pandas and aggregates it on its own, as a naive per-user
+tracker would; 'book' is PortfolioBook, which joins every position of
+every portfolio through the symbol-code index and totals them with
+bincount. 'cached' repeats the book's valuation of a batch it has
+already seen (what every rerun without a new batch costs).
+
+Usage:
+    python benchmarks/portfolio_bench.py [--portfolios 1000] [--positions 30] [--symbols 550] [--batches 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from psx.data.synthetic import synthetic_session  # noqa: E402
+from psx.portfolio import PortfolioBook  # noqa: E402
+
+
+def random_portfolios(symbols, n_portfolios, n_positions, seed=0):
+    rng = np.random.default_rng(seed)
+    portfolios = {}
+    for i in range(n_portfolios):
+        picked = rng.choice(symbols, size=min(n_positions, len(symbols)), replace=False)
+        portfolios[f"P{i:05d}"] = pd.DataFrame({
+            'symbol': picked,
+            'quantity': rng.integers(1, 50, len(picked)).astype(float) * 100,
+            'cost': rng.uniform(10, 500, len(picked)),
+        })
+    return portfolios
+
+
+def merge_valuation(portfolios, batch):
+    """Each portfolio joined and aggregated separately"""
+    quotes = batch[['symbol', 'sector', 'ldcp', 'current_price']]
+    results = {}
+    for name, holdings in portfolios.items():
+        positions = holdings.merge(quotes, on='symbol', how='left')
+        positions['value'] = positions['quantity'] * positions['current_price']
+        positions['day_pnl'] = positions['quantity'] * (positions['current_price'] - positions['ldcp'])
+        value = positions['value'].sum()
+        results[name] = {
+            'value': value,
+            'unrealized_pnl': value - (positions['quantity'] * positions['cost']).sum(),
+            'day_pnl': positions['day_pnl'].sum(),
+            'sectors': positions.groupby('sector')['value'].sum() / value * 100.0,
+        }
+    return results
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return (time.perf_counter() - started) * 1000.0, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--portfolios', type=int, default=1000)
+    parser.add_argument('--positions', type=int, default=30)
+    parser.add_argument('--symbols', type=int, default=550)
+    parser.add_argument('--batches', type=int, default=20)
+    args = parser.parse_args()
+
+    rows = synthetic_session(n_symbols=args.symbols)
+    batches = [(key, group) for key, group in rows.groupby('scraped_at', sort=True)][:args.batches]
+    portfolios = random_portfolios(rows['symbol'].unique(), args.portfolios, args.positions)
+
+    book = PortfolioBook(max_batches=len(batches) + 1)
+    load_ms, _ = timed(lambda: [book.set_portfolio(name, holdings) for name, holdings in portfolios.items()])
+
+    merge_ms, book_ms, cached_ms = [], [], []
+    for key, batch in batches:
+        elapsed, expected = timed(merge_valuation, portfolios, batch)
+        merge_ms.append(elapsed)
+        elapsed, valuation = timed(book.mark, key, batch)
+        book_ms.append(elapsed)
+        cached_ms.append(timed(book.mark, key, batch)[0])
+
+    # Both give the same totals
+    summaries = valuation.summaries()
+    for name in list(portfolios)[:20]:
+        assert np.isclose(summaries.loc[name, 'value'], expected[name]['value'])
+        assert np.isclose(summaries.loc[name, 'day_pnl'], expected[name]['day_pnl'])
+
+    n_positions = sum(len(holdings) for holdings in portfolios.values())
+    print(f"{args.portfolios} portfolios, {n_positions} positions, {args.symbols} symbols, "
+          f"{len(batches)} batches (loading holdings: {load_ms:.0f} ms)\n")
+    print(f"{'method':<10}{'ms/batch':>10}{'p95 ms':>9}{'us/position':>13}")
+    for name, samples in (('merge', merge_ms), ('book', book_ms), ('cached', cached_ms)):
+        samples = np.array(samples)
+        print(f"{name:<10}{np.median(samples):>10.2f}{np.percentile(samples, 95):>9.2f}"
+              f"{np.median(samples) * 1000.0 / n_positions:>13.3f}")
+
+
+if __name__ == '__main__':
+    main()
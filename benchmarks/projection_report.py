@@ -0,0 +1,56 @@
+"""Bytes transferred per batch with and without column projection
+
+Fetches one batch with every stored column and then with only the columns
+each app view needs, printing the JSON payload size of each request. The
+memory and parquet backends use a synthetic session; supabase reads the
+configured project (the most recent batch unless --timestamp is given).
+
+Usage:
+    python benchmarks/projection_report.py [--backend memory|parquet|supabase] [--timestamp ISO]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend_bench import build_backend  # noqa: E402
+from psx.data import DataManager  # noqa: E402
+from psx.data.synthetic import synthetic_session  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', default='memory', choices=['memory', 'parquet', 'supabase'])
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--timestamp')
+    args = parser.parse_args()
+
+    rows = synthetic_session(n_symbols=args.symbols, n_batches=12)
+    with tempfile.TemporaryDirectory() as workdir:
+        backend = build_backend(args.backend, rows, workdir)
+        if backend is None:
+            sys.exit("Backend is not configured (set SUPABASE_URL and SUPABASE_KEY)")
+        manager = DataManager(backend, on_error=lambda message: print(f"  ! {message}"))
+
+        target = args.timestamp
+        if target is None:
+            batches = manager.get_available_batches(limit=1)
+            if not batches:
+                sys.exit("No batches found")
+            target = batches[0]
+
+        print(f"Batch at {target} ({args.backend} backend)")
+        print(f"Stored columns: {', '.join(manager.table_columns() or [])}\n")
+        report = manager.projection_report(target)
+        print(report.to_string(index=False, formatters={
+            'bytes': '{:,}'.format,
+            'bytes_per_row': '{:.0f}'.format,
+            'vs_all': '{:.0%}'.format,
+        }))
+
+
+if __name__ == '__main__':
+    main()
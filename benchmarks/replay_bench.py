@@ -0,0 +1,58 @@
+"""Build time of the animated session replay
+
+Times replay_figure on a synthetic session at several frame budgets,
+split into frame preparation (the figure dict), Plotly validation (what
+st.plotly_chart does) and JSON serialization, with the payload size.
+
+Usage:
+    python benchmarks/replay_bench.py [--symbols 500] [--batches 72] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from psx.data.synthetic import synthetic_session  # noqa: E402
+from psx.history import SessionHistory  # noqa: E402
+from psx.replay import replay_figure  # noqa: E402
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - started) * 1000.0)
+    return result, statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--batches', type=int, default=72)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    import plotly.graph_objects as go
+    import plotly.io as pio
+
+    history = SessionHistory.from_frame(synthetic_session(n_symbols=args.symbols, n_batches=args.batches))
+    print(f"{args.batches} batches x {args.symbols} symbols\n")
+
+    print(f"{'budget':>8}{'frames':>8}{'prepare ms':>12}{'validate ms':>13}{'json ms':>9}{'total ms':>10}{'payload MB':>12}")
+    for budget in (12, 24, 36, args.batches):
+        figure, prepare = timed(lambda: replay_figure(history, budget=budget), args.repeat)
+        validated, validate = timed(lambda: go.Figure(figure), args.repeat)
+        payload, serialize = timed(lambda: pio.to_json(validated, validate=False), args.repeat)
+        print(
+            f"{budget:>8}{len(figure['frames']):>8}{prepare:>12.1f}{validate:>13.1f}{serialize:>9.1f}"
+            f"{prepare + validate + serialize:>10.1f}{len(payload) / 1e6:>12.2f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Page-render latency through a slow and failing backend, with and without the resilience layer
+
+A synthetic session is shifted so its newest batch is still open, and a
+"render" lists the batches and loads the newest one, as the app does on
+every rerun. Renders run through four phases driven by the fault
+injector: healthy, slow (queries take longer than the timeout), outage
+(every query fails) and recovery. 'guarded' wraps the backend in
+ResilientBackend (timeouts, circuit breaker) and serves stale copies
+while revalidating; 'blocking' has neither and waits for every refresh
+(revalidate_wait=None), falling back to the stale copy only once a
+query has failed.
+
+Usage:
+    python benchmarks/resilience_bench.py [--renders 10] [--latency 0.5] [--timeout 0.2] [--reset 2] [--symbols 100]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from psx.data import DataManager, MemoryBackend  # noqa: E402
+from psx.data.faults import FaultInjectingBackend, FaultSettings  # noqa: E402
+from psx.data.resilience import CircuitBreaker, ResilientBackend  # noqa: E402
+from psx.data.synthetic import synthetic_session  # noqa: E402
+
+
+def open_session(n_symbols):
+    """Synthetic session whose last batch landed a minute ago"""
+    rows = synthetic_session(n_symbols=n_symbols)
+    shift = pd.Timestamp.now(tz='UTC') - pd.Timedelta(minutes=1) - rows['scraped_at'].max()
+    rows['scraped_at'] += shift
+    rows['created_at'] += shift
+    return rows
+
+
+def render(data_manager):
+    batches = data_manager.get_available_batches(limit=80)
+    df = data_manager.get_data_by_timestamp(batches[0]) if batches else None
+    return df is not None and not df.empty
+
+
+def run_phase(data_manager, renders, pause):
+    latencies = []
+    served = 0
+    for _ in range(renders):
+        started = time.perf_counter()
+        served += render(data_manager)
+        latencies.append((time.perf_counter() - started) * 1000.0)
+        time.sleep(pause)
+    return np.array(latencies), served
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--renders', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.5)
+    parser.add_argument('--timeout', type=float, default=0.2)
+    parser.add_argument('--reset', type=float, default=2.0)
+    parser.add_argument('--symbols', type=int, default=100)
+    args = parser.parse_args()
+
+    rows = open_session(args.symbols)
+    phases = [
+        ('healthy', {}),
+        ('slow', {'latency': args.latency}),
+        ('outage', {'outage': True}),
+        ('recovery', {}),
+    ]
+    print(f"{args.renders} renders per phase, slow queries {args.latency:g}s, timeout {args.timeout:g}s, "
+          f"breaker resets after {args.reset:g}s\n")
+    print(f"{'mode':<10}{'phase':<10}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'served':>8}{'data age s':>12}  breaker")
+    for mode in ('blocking', 'guarded'):
+        faults = FaultSettings()
+        backend = FaultInjectingBackend(MemoryBackend(rows), faults)
+        if mode == 'guarded':
+            backend = ResilientBackend(backend, timeout=args.timeout, breaker=CircuitBreaker(3, args.reset))
+            data_manager = DataManager(backend, list_ttl=0.2)
+        else:
+            data_manager = DataManager(backend, list_ttl=0.2, revalidate_wait=None)
+        render(data_manager)
+
+        for phase, settings in phases:
+            faults.latency = settings.get('latency', 0.0)
+            faults.outage = settings.get('outage', False)
+            if phase == 'recovery':
+                # Let the breaker reach its trial call
+                time.sleep(args.reset)
+            latencies, served = run_phase(data_manager, args.renders, 0.05)
+            health = data_manager.health()
+            age = f"{health['age']:.1f}" if health['age'] is not None else '-'
+            print(f"{mode:<10}{phase:<10}{np.median(latencies):>9.1f}{np.percentile(latencies, 95):>9.1f}"
+                  f"{latencies.max():>9.1f}{served:>5}/{args.renders:<2}{age:>12}  {health['state']}")
+
+
+if __name__ == '__main__':
+    main()
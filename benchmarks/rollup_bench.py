@@ -0,0 +1,86 @@
+"""Multi-week reads from raw snapshots vs the end-of-day rollup store
+
+Writes N synthetic sessions to a local Parquet mirror of raw rows, rolls
+each day up into a DailyStore with RollupJob, then times the read behind
+a multi-week view (each symbol's daily close and volume over the whole
+window) both ways: scanning raw snapshots and reducing them per day, and
+reading one row per symbol per day from the rollup store.
+
+Usage:
+    python benchmarks/rollup_bench.py [--days 40] [--symbols 550] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from psx.data import DataManager, ParquetBackend, PKT_TZ  # noqa: E402
+from psx.data.rollup import DailyStore, RollupJob  # noqa: E402
+from psx.data.synthetic import synthetic_session  # noqa: E402
+
+
+def directory_mb(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names) / 1e6
+
+
+def raw_closes(backend, start, end):
+    rows = backend.fetch(start, end, columns=['symbol', 'scraped_at', 'current_price', 'volume'])
+    rows['session_date'] = rows['scraped_at'].dt.tz_convert(PKT_TZ).dt.floor('D')
+    daily = rows.groupby(['session_date', 'symbol'], sort=True).agg(close=('current_price', 'last'), volume=('volume', 'max'))
+    return daily.reset_index(), len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=40)
+    parser.add_argument('--symbols', type=int, default=550)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    days = pd.bdate_range(end='2025-01-17', periods=args.days)
+    with tempfile.TemporaryDirectory() as tmp:
+        raw = ParquetBackend(os.path.join(tmp, 'raw'))
+        for i, day in enumerate(days):
+            raw.write(synthetic_session(day.strftime('%Y-%m-%d'), n_symbols=args.symbols, seed=i), name='rows')
+        store = DailyStore(os.path.join(tmp, 'daily'))
+        job = RollupJob(DataManager(raw), store, days=args.days)
+
+        started = time.perf_counter()
+        rolled = job.run_once(now=PKT_TZ.localize(datetime.combine(days[-1].date(), datetime.max.time())))
+        rollup_s = time.perf_counter() - started
+        started = time.perf_counter()
+        job.run_once(now=PKT_TZ.localize(datetime.combine(days[-1].date(), datetime.max.time())))
+        rerun_ms = (time.perf_counter() - started) * 1000.0
+
+        start = PKT_TZ.localize(datetime.combine(days[0].date(), datetime.min.time()))
+        end = PKT_TZ.localize(datetime.combine(days[-1].date(), datetime.max.time()))
+        raw_ms, rollup_ms = [], []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            expected, raw_rows = raw_closes(raw, start, end)
+            raw_ms.append((time.perf_counter() - started) * 1000.0)
+            started = time.perf_counter()
+            daily = store.read(days[0], days[-1], columns=['symbol', 'close', 'volume'])
+            rollup_ms.append((time.perf_counter() - started) * 1000.0)
+
+        assert len(daily) == len(expected)
+        assert np.allclose(daily['close'].to_numpy(), expected['close'].to_numpy())
+        assert np.allclose(daily['volume'].to_numpy(), expected['volume'].to_numpy())
+
+        print(f"{len(rolled)} sessions x {args.symbols} symbols rolled up in {rollup_s:.1f}s "
+              f"({rollup_s * 1000.0 / len(rolled):.0f} ms/session); re-run with nothing pending {rerun_ms:.1f} ms\n")
+        print(f"{'source':<10}{'rows read':>12}{'on disk MB':>12}{'read ms':>10}")
+        print(f"{'raw':<10}{raw_rows:>12,}{directory_mb(raw.root):>12.1f}{np.median(raw_ms):>10.0f}")
+        print(f"{'rollup':<10}{len(daily):>12,}{directory_mb(store.root):>12.1f}{np.median(rollup_ms):>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
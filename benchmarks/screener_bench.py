@@ -0,0 +1,113 @@
+"""Screen evaluation over the whole universe x a day's batches
+
+Runs a set of screens against every batch of a synthetic session and
+times: parsing and compiling each expression (once, then the cached
+lookup), 'query' (the screen's inputs as a frame filtered with
+DataFrame.query, re-parsed per batch), the compiled predicate per batch
+with NumPy and with numexpr, and the whole session as one
+(symbols x batches) evaluation. Match counts are checked to agree.
+
+Usage:
+    python benchmarks/screener_bench.py [--symbols 550] [--batches 72]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import psx.screener as screener  # noqa: E402
+from psx.data.synthetic import synthetic_session  # noqa: E402
+from psx.history import SessionHistory  # noqa: E402
+
+# Written so DataFrame.query accepts them unchanged
+SCREENS = (
+    'change_pct > 1 and volume_ratio_12 > 1.5',
+    'price > sma_20 and rsi_14 < 45',
+    'sector in ("CEMENT", "FERTILIZER") and return_6 > 0.2',
+    'price >= high_36 and change_pct > 0 and turnover > 1000000',
+    '(change_pct < -1 or volatility_12 > 0.4) and not sector == "CEMENT"',
+)
+
+
+def query_frame(screen, batch, history, upto):
+    """The screen's inputs for one batch as named columns"""
+    frame = pd.DataFrame({'symbol': batch['symbol'].to_numpy(), 'sector': batch['sector'].to_numpy()})
+    for name in screen.variables:
+        if name in screener.FIELDS:
+            frame[name] = batch[screener.FIELDS[name]].to_numpy()
+        elif name in screener.COMPUTED:
+            frame[name] = batch['current_price'].to_numpy() * batch['volume'].to_numpy()
+    rows = np.array([history.symbol_index[symbol] for symbol in frame['symbol']])
+    for name, column in screener.indicator_values(history, screen.indicators, upto=upto, last_only=True).items():
+        frame[name] = column[rows]
+    return frame
+
+
+def per_batch(screen, batches, history, engine):
+    screener.SCREEN_ENGINE = engine
+    counts = []
+    started = time.perf_counter()
+    for upto, batch in enumerate(batches, start=1):
+        if engine == 'query':
+            counts.append(len(query_frame(screen, batch, history, upto).query(screen.expression)))
+        else:
+            counts.append(int(screen.evaluate(batch, history, upto=upto).sum()))
+    return (time.perf_counter() - started) * 1000.0 / len(batches), counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=550)
+    parser.add_argument('--batches', type=int, default=72)
+    args = parser.parse_args()
+
+    rows = synthetic_session(n_symbols=args.symbols, n_batches=args.batches)
+    history = SessionHistory.from_frame(rows)
+    batches = [batch.reset_index(drop=True) for _, batch in rows.groupby('scraped_at', sort=True)]
+    sectors = {'sector': batches[-1].set_index('symbol')['sector']}
+    has_numexpr = screener._numexpr() is not None
+
+    print(f"{args.symbols} symbols x {len(batches)} batches, numexpr {'installed' if has_numexpr else 'not installed'}\n")
+    print(f"{'screen':<58}{'compile us':>11}{'cached us':>10}{'query':>9}{'numpy':>9}{'numexpr':>9}"
+          f"{'session np':>12}{'session ne':>12}")
+    for expression in SCREENS:
+        screener._compiled.clear()
+        started = time.perf_counter()
+        screen = screener.compile_screen(expression)
+        compile_us = (time.perf_counter() - started) * 1e6
+        started = time.perf_counter()
+        screener.compile_screen(expression)
+        cached_us = (time.perf_counter() - started) * 1e6
+
+        query_ms, expected = per_batch(screen, batches, history, 'query')
+        numpy_ms, counts = per_batch(screen, batches, history, 'numpy')
+        assert counts == expected
+        numexpr_ms = None
+        if has_numexpr:
+            numexpr_ms, counts = per_batch(screen, batches, history, 'numexpr')
+            assert counts == expected
+
+        # Every batch at once: one evaluation over the symbols x batches matrices
+        session_ms = {}
+        for engine in ('numpy', 'numexpr') if has_numexpr else ('numpy',):
+            screener.SCREEN_ENGINE = engine
+            started = time.perf_counter()
+            passed = screen.evaluate_session(history, sectors)
+            session_ms[engine] = (time.perf_counter() - started) * 1000.0
+            assert passed.sum(axis=0).tolist() == expected
+
+        ne = f"{numexpr_ms:>9.2f}" if numexpr_ms is not None else f"{'-':>9}"
+        ne_session = f"{session_ms['numexpr']:>12.2f}" if 'numexpr' in session_ms else f"{'-':>12}"
+        print(f"{expression[:56]:<58}{compile_us:>11.0f}{cached_us:>10.1f}{query_ms:>9.2f}{numpy_ms:>9.2f}{ne}"
+              f"{session_ms['numpy']:>12.2f}{ne_session}")
+    print("\nquery / numpy / numexpr: ms per batch; session: ms for all batches together")
+
+
+if __name__ == '__main__':
+    main()
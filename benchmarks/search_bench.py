@@ -0,0 +1,69 @@
+"""Symbol search: prebuilt index vs str.contains on every rerun
+
+Types queries one keystroke at a time against a synthetic batch and
+times the old filter (``str.contains`` over the Symbol column), the
+index's ranked lookup and the index-backed filter (lookup plus ``isin``),
+after reporting the one-off index build time.
+
+Usage:
+    python benchmarks/search_bench.py [--symbols 550] [--repeat 200]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from psx.data.manager import DataManager  # noqa: E402
+from psx.data.synthetic import synthetic_session  # noqa: E402
+from psx.search import SymbolSearchIndex  # noqa: E402
+
+QUERIES = ('SYM0123', 'cement', 'oil gas', 'sym12x')
+
+
+def timed_us(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=550)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    rows = synthetic_session(n_symbols=args.symbols, n_batches=1)
+    display_df = DataManager.format_data_for_display(rows)
+
+    started = time.perf_counter()
+    index = SymbolSearchIndex.from_frame(rows)
+    print(f"{args.symbols} symbols, index built in {(time.perf_counter() - started) * 1000:.1f} ms "
+          f"({len(index.terms)} terms)\n")
+
+    print(f"{'query':<10}{'contains us':>13}{'rows':>6}{'search us':>11}{'filter us':>11}{'rows':>6}  top match")
+    for query in QUERIES:
+        for end in range(1, len(query) + 1):
+            typed = query[:end]
+            if typed.endswith(' '):
+                continue
+            contains = display_df[display_df['Symbol'].str.contains(typed, case=False, na=False)]
+            contains_us = timed_us(lambda: display_df[display_df['Symbol'].str.contains(typed, case=False, na=False)], args.repeat)
+            search_us = timed_us(lambda: index.search(typed), args.repeat)
+            filtered = display_df[index.filter_mask(display_df['Symbol'], typed)]
+            filter_us = timed_us(lambda: display_df[index.filter_mask(display_df['Symbol'], typed)], args.repeat)
+            top = index.search(typed, limit=1)
+            print(
+                f"{typed:<10}{contains_us:>13.0f}{len(contains):>6}{search_us:>11.0f}{filter_us:>11.0f}"
+                f"{len(filtered):>6}  {top[0][0] if top else '-'}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Worker throughput and memory: shared batch cache vs independent workers
+
+Fills a shared batch directory from a synthetic session with the loader,
+then runs K worker processes that render random batches (fetch, display
+formatting, metrics) for a fixed time. In 'shared' mode workers map the
+loader's Arrow files; in 'independent' mode each worker has its own
+DataManager over the upstream backend, as separate Streamlit processes do
+today. Reports renders/sec, the private memory (USS, from /proc/self/smaps_rollup)
+each worker gains for its batch cache, and upstream queries.
+
+Usage:
+    python benchmarks/shared_cache_bench.py [--workers 1 2 4] [--seconds 3] [--symbols 550]
+"""
+import argparse
+import importlib
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def private_kb():
+    """Unique set size of this process in kB (Linux)"""
+    total = 0
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                total += int(line.split()[1])
+    return total
+
+
+def session_rows(n_symbols):
+    import pandas as pd
+
+    from psx.data.synthetic import synthetic_session
+
+    day = (pd.Timestamp.now(tz='Asia/Karachi') - pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+    return day, synthetic_session(day, n_symbols=n_symbols)
+
+
+def worker(mode, root, n_symbols, seconds, results):
+    import numpy as np
+    import pandas as pd
+
+    from psx.data import DataManager, MemoryBackend
+    from psx.data.shared import SharedCacheBackend
+
+    # Upstream rows stand in for the database; they and pyarrow (preloaded) are not counted
+    importlib.import_module('pyarrow')
+    day, rows = session_rows(n_symbols)
+    baseline = private_kb()
+    if mode == 'shared':
+        data_manager = DataManager(SharedCacheBackend(root))
+    else:
+        data_manager = DataManager(MemoryBackend(rows))
+        data_manager.cache_session(pd.Timestamp(day).date())
+    batches = data_manager.get_available_batches(limit=72)
+
+    rng = np.random.default_rng(os.getpid())
+    renders = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        df = data_manager.get_data_by_timestamp(batches[rng.integers(len(batches))])
+        DataManager.format_data_for_display(df)
+        DataManager.calculate_market_metrics(df)
+        renders += 1
+
+    stats = data_manager.instrumentation()
+    upstream = int(stats['calls'].sum() - stats['cache_hits'].sum()) if mode == 'independent' else 0
+    results.put((renders, private_kb() - baseline, private_kb(), upstream))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--symbols', type=int, default=550)
+    args = parser.parse_args()
+
+    from psx.data import DataManager, MemoryBackend
+    from psx.data.loader import SharedCacheLoader
+    from psx.data.shared import SharedBatchStore
+
+    parent = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    root = tempfile.mkdtemp(prefix='psx-bench-', dir=parent)
+    try:
+        day, rows = session_rows(args.symbols)
+        store = SharedBatchStore(root, writable=True)
+        started = time.perf_counter()
+        SharedCacheLoader(DataManager(MemoryBackend(rows), batch_store=store), store, sessions=1).sync()
+        stats = store.stats()
+        print(f"loader: {stats['shared_batches']} batches, {stats['shared_bytes'] / 1e6:.1f} MB in {root} "
+              f"({time.perf_counter() - started:.2f}s), {os.cpu_count()} CPU(s)\n")
+
+        print(f"{'mode':<13}{'workers':>8}{'renders/s':>11}{'cache MB/worker':>17}{'USS MB/worker':>15}{'upstream queries':>18}")
+        for mode in ('independent', 'shared'):
+            for count in args.workers:
+                results = multiprocessing.Queue()
+                procs = [multiprocessing.Process(target=worker, args=(mode, root, args.symbols, args.seconds, results)) for _ in range(count)]
+                for proc in procs:
+                    proc.start()
+                outcomes = [results.get() for _ in procs]
+                for proc in procs:
+                    proc.join()
+                renders = sum(o[0] for o in outcomes) / args.seconds
+                growth = sum(o[1] for o in outcomes) / count / 1024
+                uss = sum(o[2] for o in outcomes) / count / 1024
+                upstream = sum(o[3] for o in outcomes)
+                print(f"{mode:<13}{count:>8}{renders:>11.0f}{growth:>17.1f}{uss:>15.1f}{upstream:>18}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Cold-start profile for the Streamlit apps
+
+Prints an import-time breakdown of the app's dependencies and the time to
+first paint (header rendered) measured from a fresh interpreter, with the
+current lazy boot path and with plotly/supabase imported eagerly as before.
+
+Usage:
+    python benchmarks/startup_profile.py [streamlit_app.py] [--runs 3]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APP_MODULES = [
+    'streamlit', 'pandas', 'numpy', 'pytz', 'dotenv',
+    'plotly.express', 'plotly.graph_objects', 'plotly.subplots', 'supabase',
+]
+
+EAGER_MODULES = ['plotly.express', 'plotly.graph_objects', 'plotly.subplots', 'supabase']
+
+# Runs the app once in-process through Streamlit's AppTest harness
+RUN_APP = """
+from streamlit.testing.v1 import AppTest
+AppTest.from_file({path!r}, default_timeout=60).run()
+"""
+
+BOOT_LINE = "_BOOT_STARTED = tm.perf_counter()\n"
+
+
+def import_breakdown(modules):
+    """Cumulative import time (ms) of each top-level package, from -X importtime"""
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, cwd=ROOT
+    )
+    roots = {module.split('.')[0] for module in modules}
+    totals = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)", line)
+        if not match:
+            continue
+        cumulative_us, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        # Only first-level imports of the app's packages; nested ones are part of their parent
+        package = name.split('.')[0]
+        if len(indent) == 0 and package in roots:
+            totals[package] = totals.get(package, 0.0) + cumulative_us / 1000.0
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def eager_copy(app_path):
+    """Copy of the app that imports plotly/supabase up front, like the old boot path"""
+    with open(os.path.join(ROOT, app_path), encoding='utf-8') as handle:
+        source = handle.read()
+    imports = "".join(f"import {module}\n" for module in EAGER_MODULES)
+    path = os.path.join(ROOT, f"_eager_{os.path.basename(app_path)}")
+    with open(path, 'w', encoding='utf-8') as handle:
+        handle.write(source.replace(BOOT_LINE, BOOT_LINE + imports, 1))
+    return path
+
+
+def first_paint(app_path):
+    """Boot stage timings (ms) for one cold run of the app"""
+    env = dict(os.environ, PSX_PROFILE_STARTUP='1')
+    # Without credentials the app renders its setup screen and never hits the network
+    env.pop('SUPABASE_URL', None)
+    env.pop('SUPABASE_KEY', None)
+    code = RUN_APP.format(path=app_path)
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=ROOT, env=env)
+    marks = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"\[boot\] (\S+): ([\d.]+) ms", line)
+        if match:
+            marks.setdefault(match.group(1), float(match.group(2)))
+    return marks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('app', nargs='?', default='streamlit_app.py')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    print("Import-time breakdown (cumulative ms, fresh interpreter)")
+    for package, ms in import_breakdown(APP_MODULES):
+        print(f"  {package:<24}{ms:>9.1f}")
+
+    print(f"\nTime to first paint for {args.app} (median of {args.runs} cold runs)")
+    eager_path = eager_copy(args.app)
+    try:
+        variants = (("eager imports (before)", eager_path), ("lazy boot path (after)", args.app))
+        results = [(label, [first_paint(path) for _ in range(args.runs)]) for label, path in variants]
+    finally:
+        os.remove(eager_path)
+
+    for label, runs in results:
+        paint = [run['first_paint'] for run in runs if 'first_paint' in run]
+        if not paint:
+            print(f"  {label:<26}no first_paint mark recorded")
+            continue
+        print(f"  {label:<26}{statistics.median(paint):>9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
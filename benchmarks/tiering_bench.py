@@ -0,0 +1,101 @@
+"""Unbounded reads against one ever-growing hot table vs hot + archive tiers
+
+Builds N synthetic sessions in an in-memory hot backend whose queries pay
+a simulated round trip (PSX_FAULTS-style latency, as for Supabase), rolls
+every day up, then runs the retention job to move all but the last
+``--hot-days`` sessions into a compressed Parquet archive. Times the
+unbounded batch listing (every ``scraped_at``, as ``get_available_batches``
+does without a range) and a full-window read through a DataManager over
+the untiered table and over the TieredBackend, and checks both return the
+same batches and rows.
+
+Usage:
+    python benchmarks/tiering_bench.py [--days 20] [--hot-days 5] [--symbols 300] [--latency 0.01]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd  # noqa: E402
+
+from psx.data import DataManager, MemoryBackend, PKT_TZ, StockDataBackend  # noqa: E402
+from psx.data.faults import FaultInjectingBackend, FaultSettings  # noqa: E402
+from psx.data.rollup import DailyStore, RollupJob  # noqa: E402
+from psx.data.synthetic import synthetic_session  # noqa: E402
+from psx.data.tiering import RetentionJob, TieredBackend, archive_backend  # noqa: E402
+
+
+class RemoteBackend(FaultInjectingBackend):
+    """Pages every range read like Supabase, each page paying the simulated round trip"""
+
+    fetch = StockDataBackend.fetch
+
+
+def directory_mb(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names) / 1e6
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - started) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=20)
+    parser.add_argument('--hot-days', type=int, default=5)
+    parser.add_argument('--symbols', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=0.01, help="simulated seconds per hot query")
+    args = parser.parse_args()
+
+    days = pd.bdate_range(end='2025-01-17', periods=args.days)
+    rows = pd.concat([synthetic_session(day.strftime('%Y-%m-%d'), n_symbols=args.symbols, seed=i)
+                      for i, day in enumerate(days)], ignore_index=True)
+    now = PKT_TZ.localize(datetime.combine(days[-1].date(), datetime.max.time()))
+    # Calendar days covering the last ``hot_days`` sessions
+    hot_days = (days[-1] - days[-args.hot_days]).days + 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        untiered = RemoteBackend(MemoryBackend(rows), FaultSettings(latency=args.latency))
+        hot = RemoteBackend(MemoryBackend(rows), FaultSettings(latency=args.latency))
+        store = DailyStore(os.path.join(tmp, 'daily'))
+        RollupJob(DataManager(hot.backend), store, days=args.days).run_once(now=now)
+
+        archive = archive_backend(os.path.join(tmp, 'archive'))
+        results, retention_ms = timed(lambda: RetentionJob(hot, archive, store, hot_days=hot_days).run_once(now=now))
+        archived = [result for result in results if result['status'] == 'archived']
+        tiered = TieredBackend(hot, archive)
+
+        print(f"{len(rows):,} raw rows over {args.days} sessions; {len(archived)} session(s) archived in "
+              f"{retention_ms / 1000.0:.1f}s ({retention_ms / max(len(archived), 1):.0f} ms/session)")
+        print(f"hot rows {hot.backend.count_rows():,}; archive {archive.count_rows():,} rows, "
+              f"{directory_mb(archive.root):.1f} MB on disk (zstd)\n")
+
+        print(f"{'read':<22}{'backend':<10}{'hot queries':>12}{'ms':>10}")
+        outputs = {}
+        for label, read in (
+            ('batch listing', lambda manager: manager.get_available_batches()),
+            ('full window', lambda manager: manager.backend.fetch(columns=['symbol', 'scraped_at', 'current_price'])),
+        ):
+            for name, backend, counter in (('untiered', untiered, untiered), ('tiered', tiered, hot)):
+                manager = DataManager(backend)
+                before = counter.queries
+                outputs[(label, name)], ms = timed(lambda: read(manager))
+                print(f"{label:<22}{name:<10}{counter.queries - before:>12,}{ms:>10.0f}")
+
+        assert outputs[('batch listing', 'untiered')] == outputs[('batch listing', 'tiered')]
+        untiered_rows = outputs[('full window', 'untiered')]
+        tiered_rows = outputs[('full window', 'tiered')]
+        assert len(untiered_rows) == len(tiered_rows) == len(rows)
+        assert untiered_rows['scraped_at'].equals(tiered_rows['scraped_at'])
+
+
+if __name__ == '__main__':
+    main()
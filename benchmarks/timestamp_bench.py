@@ -0,0 +1,104 @@
+"""Parsing and bucketing scraped_at: pandas Timestamps vs the int64 codec
+
+Generates Supabase-style ``scraped_at`` strings (ISO-8601 with a +00:00
+offset, fractional seconds dropped when zero) and times each step on the
+read path both ways, checking they agree:
+
+- parse: ``pd.to_datetime(..., utc=True)`` vs ``psx.timestamps.to_ns``
+- bucket: ``DatetimeIndex.floor`` vs ``floor_ns`` on epoch nanoseconds
+- closest: the per-candidate ``pd.Timestamp`` lambda vs an int64 argmin
+- listing: latest timestamp per batch via Timestamp groupby vs int64
+- display: PKT conversion of the listed batches
+
+Usage:
+    python benchmarks/timestamp_bench.py [--rows 100000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from psx.data import PKT_TZ  # noqa: E402
+from psx.history import BATCH_FREQ  # noqa: E402
+from psx.timestamps import floor_ns, from_ns, to_ns  # noqa: E402
+
+
+def best_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000.0)
+    return result, min(timings)
+
+
+def scraped_at_strings(n_rows, seed=0):
+    """ISO strings as Supabase returns them, a few seconds into each 5-minute batch"""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2025-01-06 04:30', tz='UTC')
+    batch = rng.integers(0, 72 * 20, n_rows)
+    offsets = batch * 300_000_000 + rng.integers(5_000_000, 9_000_000, n_rows)
+    # Postgres drops the fraction when it is zero, so pages mix both layouts
+    whole = rng.random(n_rows) < 0.1
+    offsets[whole] = offsets[whole] // 1_000_000 * 1_000_000
+    times = start + pd.to_timedelta(np.sort(offsets), unit='us')
+    return [ts.isoformat() for ts in times]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    strings = pd.Series(scraped_at_strings(args.rows), dtype=object)
+    target = pd.Timestamp(strings.iloc[args.rows // 2]) + pd.Timedelta(seconds=40)
+    # The closest-match window: rows within two minutes of the target
+    window = strings[(pd.to_datetime(strings, utc=True, format='ISO8601') - target).abs() <= pd.Timedelta(minutes=2)].tolist()
+    rows = []
+
+    try:
+        pd.to_datetime(strings, utc=True)
+        inferred = 'ok'
+    except ValueError:
+        inferred = 'fails on mixed layouts'
+    parsed, pandas_ms = best_ms(lambda: pd.to_datetime(strings, utc=True, format='ISO8601'), args.repeat)
+    ns, codec_ms = best_ms(lambda: to_ns(strings), args.repeat)
+    assert np.array_equal(pd.DatetimeIndex(parsed).as_unit('ns').asi8, ns)
+    rows.append(('parse', pandas_ms, codec_ms))
+
+    buckets, pandas_ms = best_ms(lambda: pd.DatetimeIndex(parsed).floor(BATCH_FREQ), args.repeat)
+    bucket_ns, codec_ms = best_ms(lambda: floor_ns(ns, BATCH_FREQ), args.repeat)
+    assert np.array_equal(buckets.as_unit('ns').asi8, bucket_ns)
+    rows.append(('bucket', pandas_ms, codec_ms))
+
+    closest, pandas_ms = best_ms(lambda: min(window, key=lambda c: abs(pd.Timestamp(c) - target)), args.repeat)
+    window_ns = to_ns(window)
+    closest_ns, codec_ms = best_ms(lambda: window_ns[np.abs(window_ns - target.value).argmin()], args.repeat)
+    assert pd.Timestamp(closest).value == closest_ns
+    rows.append((f'closest ({len(window)} rows)', pandas_ms, codec_ms))
+
+    latest, pandas_ms = best_ms(lambda: parsed.groupby(buckets.to_numpy()).max(), args.repeat)
+    latest_ns, codec_ms = best_ms(lambda: pd.Series(ns).groupby(bucket_ns).max(), args.repeat)
+    assert np.array_equal(pd.DatetimeIndex(latest).as_unit('ns').asi8, latest_ns.to_numpy())
+    rows.append(('listing', pandas_ms, codec_ms))
+
+    shown, pandas_ms = best_ms(lambda: [ts.tz_convert(PKT_TZ) for ts in latest], args.repeat)
+    shown_pkt, codec_ms = best_ms(lambda: list(from_ns(latest_ns.to_numpy(), PKT_TZ)), args.repeat)
+    assert shown == shown_pkt
+    rows.append((f'display ({len(shown)} batches)', pandas_ms, codec_ms))
+
+    print(f"{args.rows:,} scraped_at strings; inferred-format pd.to_datetime: {inferred}\n")
+    print(f"{'step':<24}{'pandas ms':>11}{'codec ms':>10}{'speedup':>9}")
+    for step, pandas_ms, codec_ms in rows:
+        print(f"{step:<24}{pandas_ms:>11.2f}{codec_ms:>10.2f}{pandas_ms / max(codec_ms, 1e-6):>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
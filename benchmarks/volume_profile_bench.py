@@ -0,0 +1,90 @@
+"""Unusual-volume detection: precomputed time-of-day baselines vs scanning raw rows
+
+Builds N past synthetic sessions plus a current one and, for every batch
+of the current session, ranks symbols by cumulative volume over their
+usual volume at that time of day. 'scan' filters the past sessions' raw
+rows to the batch's time of day and averages them per symbol with pandas
+on every batch; 'baseline' builds VolumeBaseline once and gathers one
+slot per batch. Flagged symbols are checked to agree.
+
+Usage:
+    python benchmarks/volume_profile_bench.py [--days 10] [--symbols 550] [--batches 72]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from psx.data.synthetic import synthetic_session  # noqa: E402
+from psx.history import SessionHistory, batch_bucket  # noqa: E402
+from psx.volumeprofile import UNUSUAL_RATIO, VolumeBaseline, time_slots  # noqa: E402
+
+
+def scan(past, batch, batch_time, min_sessions=3, min_expected=1000):
+    """Same-time average from raw rows, recomputed for this batch"""
+    rows = past[past['slot'] <= time_slots([batch_time])[0]]
+    # Latest snapshot of each symbol and session up to this time of day
+    latest = rows.sort_values('scraped_at').groupby(['symbol', 'session'])['volume'].last()
+    usual = latest.groupby(level='symbol').agg(['mean', 'count'])
+    merged = batch[['symbol', 'volume']].merge(usual, left_on='symbol', right_index=True, how='left')
+    merged['ratio'] = merged['volume'] / merged['mean']
+    flagged = merged[(merged['ratio'] >= UNUSUAL_RATIO) & (merged['count'] >= min_sessions) & (merged['mean'] >= min_expected)]
+    return flagged.sort_values('ratio', ascending=False)['symbol'].tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=10)
+    parser.add_argument('--symbols', type=int, default=550)
+    parser.add_argument('--batches', type=int, default=72)
+    args = parser.parse_args()
+
+    days = pd.bdate_range(end='2025-01-17', periods=args.days + 1)
+    sessions = [synthetic_session(day.strftime('%Y-%m-%d'), n_symbols=args.symbols, n_batches=args.batches, seed=i)
+                for i, day in enumerate(days)]
+    today = sessions.pop()
+    # A few symbols trade several times their usual volume today
+    rng = np.random.default_rng(0)
+    spiking = rng.choice(today['symbol'].unique(), size=10, replace=False)
+    today.loc[today['symbol'].isin(spiking), 'volume'] *= rng.uniform(2.5, 6.0)
+
+    past = pd.concat(sessions, ignore_index=True)
+    past['session'] = past['scraped_at'].dt.date
+    past['slot'] = time_slots(batch_bucket(past['scraped_at']))
+
+    started = time.perf_counter()
+    histories = [SessionHistory.from_frame(session) for session in sessions]
+    history_ms = (time.perf_counter() - started) * 1000.0
+    started = time.perf_counter()
+    baseline = VolumeBaseline.from_histories(histories)
+    build_ms = (time.perf_counter() - started) * 1000.0
+
+    scan_ms, baseline_ms = [], []
+    for batch_time, batch in today.groupby('scraped_at', sort=True):
+        batch = batch.reset_index(drop=True)
+        started = time.perf_counter()
+        expected = scan(past, batch, batch_time)
+        scan_ms.append((time.perf_counter() - started) * 1000.0)
+        started = time.perf_counter()
+        flagged = baseline.unusual(batch, batch_time, top=len(batch))['symbol'].tolist()
+        baseline_ms.append((time.perf_counter() - started) * 1000.0)
+        assert flagged == expected, (batch_time, flagged, expected)
+
+    print(f"{args.days} past sessions, {args.symbols} symbols, {len(scan_ms)} batches today "
+          f"({len(spiking)} symbols with injected spikes)\n")
+    print(f"histories from rows: {history_ms:.0f} ms, baseline build: {build_ms:.1f} ms "
+          f"({baseline.mean.nbytes / 1e6:.1f} MB)\n")
+    print(f"{'method':<10}{'ms/batch':>10}{'p95 ms':>9}{'total ms':>10}")
+    for name, samples in (('scan', scan_ms), ('baseline', baseline_ms)):
+        samples = np.array(samples)
+        print(f"{name:<10}{np.median(samples):>10.2f}{np.percentile(samples, 95):>9.2f}{samples.sum():>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,19 @@
+import time as tm
+_BOOT_STARTED = tm.perf_counter()
 import streamlit as st
 import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta, time
-import time as tm
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import io
+from datetime import datetime, timedelta
 import os
-from supabase import create_client, Client
+import threading
 from dotenv import load_dotenv
-import pytz
-import streamlit.components.v1 as components
 import traceback
+from psx.data import DataManager, create_backend, resilient_backend, tiered_backend
+from psx.profiling import BootProfile
+
+# Plotly and the Supabase client are imported where they are first needed,
+# so the header paints before those modules load on a cold start
+BOOT = BootProfile(started=_BOOT_STARTED)
+BOOT.mark("imports")
 
 # Load environment variables
 load_dotenv()
@@ -64,319 +65,101 @@ st.markdown("""
 # Debug information
 DEBUG = True
 
-# Initialize Supabase client with better error handling
+# Seconds between sidebar polls while the connection check is running
+CONNECTION_POLL_SECONDS = float(os.getenv("PSX_CONNECTION_POLL_SECONDS", "1"))
+
+# Initialize the shared data manager with better error handling
 @st.cache_resource
-def init_supabase():
-    """Initialize Supabase client with detailed error handling"""
+def get_data_manager():
+    """Shared DataManager over the configured backend, with detailed error handling"""
     try:
         # Get credentials from environment variables
+        backend_kind = os.getenv("PSX_DATA_BACKEND", "supabase").lower()
         supabase_url = os.getenv("SUPABASE_URL")
         supabase_key = os.getenv("SUPABASE_KEY")
         
         if DEBUG:
             st.sidebar.write("🔍 Debug Info:")
+            st.sidebar.write(f"Data backend: {backend_kind}")
             st.sidebar.write(f"SUPABASE_URL exists: {'Yes' if supabase_url else 'No'}")
             st.sidebar.write(f"SUPABASE_KEY exists: {'Yes' if supabase_key else 'No'}")
             if supabase_url:
                 st.sidebar.write(f"URL starts with: {supabase_url[:20]}...")
         
-        if not supabase_url:
-            st.error("❌ SUPABASE_URL not found in .env file")
-            st.info("Please add: SUPABASE_URL=your_project_url")
-            return None
-        
-        if not supabase_key:
-            st.error("❌ SUPABASE_KEY not found in .env file")
-            st.info("Please add: SUPABASE_KEY=your_anon_public_key")
-            return None
-        
-        # Create client
-        client = create_client(supabase_url, supabase_key)
-        
-        # Test connection
-        try:
-            # Try to get count of records
-            response = client.table('stock_data').select("*", count="exact").limit(1).execute()
-            if DEBUG:
-                st.sidebar.success(f"✅ Connected successfully!")
-                st.sidebar.write(f"Total records: {response.count if hasattr(response, 'count') else 'N/A'}")
-        except Exception as e:
-            if DEBUG:
-                st.sidebar.warning(f"⚠️ Connection test failed: {str(e)}")
+        if backend_kind == "supabase":
+            if not supabase_url:
+                st.error("❌ SUPABASE_URL not found in .env file")
+                st.info("Please add: SUPABASE_URL=your_project_url")
+                return None
+            
+            if not supabase_key:
+                st.error("❌ SUPABASE_KEY not found in .env file")
+                st.info("Please add: SUPABASE_KEY=your_anon_public_key")
+                return None
         
-        return client
+        # Create backend (the connection test runs in the background, see below)
+        return DataManager(tiered_backend(resilient_backend(create_backend(backend_kind))), on_error=report_error)
         
     except Exception as e:
-        st.error(f"❌ Error initializing Supabase: {str(e)}")
+        st.error(f"❌ Error initializing data backend: {str(e)}")
         if DEBUG:
             st.error(f"Detailed error: {traceback.format_exc()}")
         return None
 
-# Initialize
-supabase = init_supabase()
-
-# Constants
-PKT_TZ = pytz.timezone('Asia/Karachi')
-TRADING_START = time(9, 30)
-TRADING_END = time(15, 30)
+def report_error(message):
+    """Show DataManager errors, with the traceback in debug mode"""
+    st.error(message)
+    if DEBUG:
+        st.error(traceback.format_exc())
 
-class DataManager:
-    """Manages data fetching and aggregation from Supabase"""
-    
-    @staticmethod
-    def test_connection():
-        """Test Supabase connection and data availability"""
-        if not supabase:
-            return False, "No Supabase client"
-        
-        try:
-            # Test query
-            response = supabase.table('stock_data').select("*").limit(5).execute()
-            
-            if not response.data:
-                return True, "Connection OK but no data found"
-            
-            # Check column structure
-            if response.data:
-                sample = response.data[0]
-                columns = list(sample.keys())
-                return True, f"Connection OK. Found {len(response.data)} records. Columns: {', '.join(columns[:5])}..."
-            
-            return True, "Connection OK"
-            
-        except Exception as e:
-            return False, f"Connection error: {str(e)}"
+@st.cache_resource
+def start_connection_check():
+    """Run the backend connectivity test on a background thread
     
-    @staticmethod
-    def get_all_data(limit=1000):
-        """Get all data without time filters"""
-        try:
-            if supabase is None:
-                return None
-            
-            response = supabase.table('stock_data')\
-                .select('*')\
-                .order('scraped_at', desc=True)\
-                .limit(limit)\
-                .execute()
-            
-            if not response.data:
-                return None
-            
-            df = pd.DataFrame(response.data)
-            
-            # Convert timestamp to PKT
-            if 'scraped_at' in df.columns:
-                df['scraped_at'] = pd.to_datetime(df['scraped_at']).dt.tz_convert(PKT_TZ)
-            
-            if DEBUG and not df.empty:
-                st.sidebar.write(f"📊 Got {len(df)} records")
-                st.sidebar.write(f"Latest timestamp: {df['scraped_at'].max()}")
-                st.sidebar.write(f"Columns: {', '.join(df.columns.tolist()[:10])}...")
-            
-            return df
-            
-        except Exception as e:
-            st.error(f"Error fetching all data: {str(e)}")
-            if DEBUG:
-                st.error(traceback.format_exc())
-            return None
+    Returns a status dict that the sidebar reads on each rerun; the thread
+    never touches Streamlit elements itself.
+    """
+    status = {'state': 'pending', 'count': None, 'error': None}
     
-    @staticmethod
-    def get_available_batches():
-        """Get all available data batches"""
+    def check():
         try:
-            if supabase is None:
-                return []
-            
-            # Get distinct timestamps
-            response = supabase.table('stock_data')\
-                .select('scraped_at')\
-                .order('scraped_at', desc=True)\
-                .execute()
-            
-            if not response.data:
-                # Try without order
-                response = supabase.table('stock_data')\
-                    .select('scraped_at')\
-                    .execute()
-                
-                if not response.data:
-                    return []
-            
-            # Extract unique timestamps
-            timestamps = []
-            seen = set()
-            
-            for item in response.data:
-                try:
-                    ts_str = item['scraped_at']
-                    if ts_str not in seen:
-                        seen.add(ts_str)
-                        # Parse timestamp
-                        ts = pd.to_datetime(ts_str)
-                        # Make timezone aware
-                        if ts.tzinfo is None:
-                            ts = ts.tz_localize('UTC')
-                        # Convert to PKT
-                        ts = ts.tz_convert(PKT_TZ)
-                        timestamps.append(ts)
-                except Exception as e:
-                    if DEBUG:
-                        st.sidebar.warning(f"Timestamp parsing error: {e}")
-                    continue
-            
-            # Sort descending
-            timestamps.sort(reverse=True)
-            
-            if DEBUG:
-                st.sidebar.write(f"Found {len(timestamps)} unique timestamps")
-                if timestamps:
-                    st.sidebar.write(f"Earliest: {timestamps[-1]}")
-                    st.sidebar.write(f"Latest: {timestamps[0]}")
-            
-            return timestamps[:50]  # Limit to 50 most recent
-            
-        except Exception as e:
-            st.error(f"Error fetching batches: {str(e)}")
-            if DEBUG:
-                st.error(traceback.format_exc())
-            return []
-    
-    @staticmethod
-    def get_data_by_timestamp(target_timestamp):
-        """Get data for specific timestamp"""
-        try:
-            if supabase is None:
-                return None
-            
-            # Convert to UTC for query
-            if hasattr(target_timestamp, 'tzinfo') and target_timestamp.tzinfo:
-                target_utc = target_timestamp.astimezone(pytz.UTC)
-            else:
-                # Assume it's in PKT
-                target_utc = PKT_TZ.localize(target_timestamp).astimezone(pytz.UTC)
-            
-            # Query with tolerance
-            start_time = target_utc - timedelta(minutes=5)
-            end_time = target_utc + timedelta(minutes=5)
-            
-            response = supabase.table('stock_data')\
-                .select('*')\
-                .gte('scraped_at', start_time.isoformat())\
-                .lte('scraped_at', end_time.isoformat())\
-                .execute()
-            
-            if not response.data:
-                return None
-            
-            df = pd.DataFrame(response.data)
-            
-            # Convert timestamp
-            if 'scraped_at' in df.columns:
-                df['scraped_at'] = pd.to_datetime(df['scraped_at']).dt.tz_convert(PKT_TZ)
-            
-            return df
-            
+            data_manager = get_data_manager()
+            if data_manager is None:
+                status.update(state='failed', error="No data backend")
+                return
+            # Try to get count of records
+            status.update(state='ok', count=data_manager.count_rows())
         except Exception as e:
-            st.error(f"Error fetching data by timestamp: {str(e)}")
-            return None
-    
-    @staticmethod
-    def format_data_for_display(df):
-        """Format DataFrame for display"""
-        if df is None or df.empty:
-            return df
-        
-        display_df = df.copy()
-        
-        # Column mapping
-        column_mapping = {
-            'symbol': 'Symbol',
-            'sector': 'Sector', 
-            'listed_in': 'Listed_In',
-            'ldcp': 'LDCP',
-            'open': 'Open',
-            'open_price': 'Open',
-            'high': 'High',
-            'low': 'Low',
-            'current': 'Current',
-            'current_price': 'Current',
-            'change': 'Change',
-            'change_percent': 'Change(%)',
-            'volume': 'Volume'
-        }
-        
-        # Rename columns that exist
-        rename_dict = {}
-        for old_col, new_col in column_mapping.items():
-            if old_col in display_df.columns:
-                rename_dict[old_col] = new_col
-        
-        if rename_dict:
-            display_df = display_df.rename(columns=rename_dict)
-        
-        # Define desired column order
-        desired_columns = [
-            'Symbol', 'Sector', 'Listed_In', 'LDCP', 'Open', 
-            'High', 'Low', 'Current', 'Change', 'Change(%)', 'Volume'
-        ]
-        
-        # Keep only columns that exist
-        existing_cols = [col for col in desired_columns if col in display_df.columns]
-        
-        return display_df[existing_cols] if existing_cols else display_df
+            status.update(state='failed', error=str(e))
     
-    @staticmethod
-    def calculate_metrics(df):
-        """Calculate market metrics"""
-        if df is None or df.empty:
-            return {}
-        
-        metrics = {
-            'total_stocks': len(df),
-            'gainers': 0,
-            'losers': 0,
-            'unchanged': 0,
-            'total_volume': 0,
-            'top_gainer': None,
-            'top_loser': None,
-            'most_active': None
-        }
-        
-        try:
-            # Ensure numeric columns
-            if 'change_percent' in df.columns:
-                df['change_percent'] = pd.to_numeric(df['change_percent'], errors='coerce')
-                metrics['gainers'] = (df['change_percent'] > 0).sum()
-                metrics['losers'] = (df['change_percent'] < 0).sum()
-                metrics['unchanged'] = (df['change_percent'] == 0).sum()
-            
-            if 'volume' in df.columns:
-                df['volume'] = pd.to_numeric(df['volume'], errors='coerce')
-                metrics['total_volume'] = df['volume'].sum()
-            
-            # Find top performers
-            if 'change_percent' in df.columns and not df.empty:
-                try:
-                    metrics['top_gainer'] = df.loc[df['change_percent'].idxmax()]
-                    metrics['top_loser'] = df.loc[df['change_percent'].idxmin()]
-                except:
-                    pass
-            
-            if 'volume' in df.columns and not df.empty:
-                try:
-                    metrics['most_active'] = df.loc[df['volume'].idxmax()]
-                except:
-                    pass
-        
-        except Exception as e:
-            if DEBUG:
-                st.error(f"Error calculating metrics: {e}")
-        
-        return metrics
+    threading.Thread(target=check, name="supabase-connection-check", daemon=True).start()
+    return status
+
+@st.fragment(run_every=CONNECTION_POLL_SECONDS)
+def watch_connection_check(connection):
+    """Pending banner that polls the connection check; reruns the page once it lands"""
+    if connection['state'] != 'pending':
+        st.rerun()
+    st.info("⏳ Checking connection in the background...")
+
+def show_debug_summary(df):
+    """Debug details for freshly loaded data"""
+    if DEBUG and df is not None and not df.empty:
+        st.sidebar.write(f"📊 Got {len(df)} records")
+        st.sidebar.write(f"Latest timestamp: {df['scraped_at'].max()}")
+        st.sidebar.write(f"Columns: {', '.join(df.columns.tolist()[:10])}...")
+
+def show_debug_batches(batches):
+    """Debug details for the batch listing"""
+    if DEBUG:
+        st.sidebar.write(f"Found {len(batches)} batches")
+        if batches:
+            st.sidebar.write(f"Earliest: {batches[-1]}")
+            st.sidebar.write(f"Latest: {batches[0]}")
 
 def main():
+    global DEBUG
+    
     # Header
     st.markdown("""
     <div class="header-container">
@@ -385,6 +168,12 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
+    BOOT.mark("first_paint")
+    
+    # Backend creation (and the supabase import) happens after the header is on screen
+    data_manager = get_data_manager()
+    connection = start_connection_check()
+    
     # Initialize session state
     if 'current_data' not in st.session_state:
         st.session_state.current_data = None
@@ -400,13 +189,20 @@ def main():
         st.markdown("---")
         st.subheader("🔗 Database Connection")
         
-        if supabase:
-            st.success("✅ Connected to Supabase")
+        if data_manager:
+            if connection['state'] == 'ok':
+                st.success("✅ Connected to Supabase")
+                if DEBUG:
+                    st.write(f"Total records: {connection['count'] if connection['count'] is not None else 'N/A'}")
+            elif connection['state'] == 'failed':
+                st.warning(f"⚠️ Connection test failed: {connection['error']}")
+            else:
+                watch_connection_check(connection)
             
             # Test connection button
             if st.button("Test Connection", key="test_conn"):
                 with st.spinner("Testing..."):
-                    success, message = DataManager.test_connection()
+                    success, message = data_manager.test_connection()
                     if success:
                         st.success(f"✅ {message}")
                     else:
@@ -421,7 +217,6 @@ def main():
         
         # Debug toggle
         st.markdown("---")
-        global DEBUG
         DEBUG = st.checkbox("Enable Debug Mode", value=True)
         
         # Data loading options
@@ -433,7 +228,8 @@ def main():
         with col1:
             if st.button("🔄 Load All Data", use_container_width=True):
                 with st.spinner("Loading all data..."):
-                    st.session_state.current_data = DataManager.get_all_data()
+                    st.session_state.current_data = data_manager.get_all_data()
+                    show_debug_summary(st.session_state.current_data)
                     if st.session_state.current_data is not None:
                         st.success(f"Loaded {len(st.session_state.current_data)} records")
                     else:
@@ -442,7 +238,8 @@ def main():
         with col2:
             if st.button("🕐 Load Batches", use_container_width=True):
                 with st.spinner("Fetching batches..."):
-                    st.session_state.available_batches = DataManager.get_available_batches()
+                    st.session_state.available_batches = data_manager.get_available_batches(limit=50)
+                    show_debug_batches(st.session_state.available_batches)
                     if st.session_state.available_batches:
                         st.success(f"Found {len(st.session_state.available_batches)} batches")
                     else:
@@ -478,7 +275,7 @@ def main():
                 
                 if selected_ts and st.button("📊 Load This Batch", use_container_width=True):
                     with st.spinner(f"Loading {selected_display}..."):
-                        st.session_state.current_data = DataManager.get_data_by_timestamp(selected_ts)
+                        st.session_state.current_data = data_manager.get_data_by_timestamp(selected_ts, tolerance=timedelta(minutes=5))
                         if st.session_state.current_data is not None:
                             st.success(f"Loaded {len(st.session_state.current_data)} records")
                         else:
@@ -487,7 +284,7 @@ def main():
         st.markdown('</div>', unsafe_allow_html=True)
     
     # Main content area
-    if not supabase:
+    if not data_manager:
         st.error("""
         ## Database Connection Required
         
@@ -520,7 +317,7 @@ def main():
         st.success(f"📊 Displaying {len(df)} stock records")
         
         # Calculate and show metrics
-        metrics = DataManager.calculate_metrics(df)
+        metrics = DataManager.calculate_market_metrics(df)
         
         # Metrics cards
         col1, col2, col3, col4 = st.columns(4)
@@ -579,11 +376,11 @@ def main():
         
         if 'Change(%)' in filtered_df.columns:
             if perf_filter == "Gainers Only":
-                filtered_df = filtered_df[pd.to_numeric(filtered_df['Change(%)'], errors='coerce') > 0]
+                filtered_df = filtered_df[filtered_df['Change(%)'] > 0]
             elif perf_filter == "Losers Only":
-                filtered_df = filtered_df[pd.to_numeric(filtered_df['Change(%)'], errors='coerce') < 0]
+                filtered_df = filtered_df[filtered_df['Change(%)'] < 0]
             elif perf_filter == "Unchanged":
-                filtered_df = filtered_df[pd.to_numeric(filtered_df['Change(%)'], errors='coerce') == 0]
+                filtered_df = filtered_df[filtered_df['Change(%)'] == 0]
         
         # Apply sorting
         if sort_by == "Symbol A-Z" and 'Symbol' in filtered_df.columns:
@@ -634,6 +431,8 @@ def main():
             )
             
             # Visualizations
+            import plotly.express as px
+            
             st.markdown("---")
             st.subheader("📈 Visualizations")
             
@@ -720,7 +519,7 @@ SUPABASE_KEY=your-anon-public-key
         with col1:
             if st.button("Test Database Connection", type="primary"):
                 with st.spinner("Testing..."):
-                    success, message = DataManager.test_connection()
+                    success, message = data_manager.test_connection()
                     if success:
                         st.success(f"✅ {message}")
                     else:
@@ -728,12 +527,11 @@ SUPABASE_KEY=your-anon-public-key
         
         with col2:
             if st.button("Check Table Structure"):
-                if supabase:
+                if data_manager:
                     try:
-                        response = supabase.table('stock_data').select("*").limit(1).execute()
-                        if response.data:
-                            sample = response.data[0]
-                            st.json(sample)
+                        sample = data_manager.sample_row()
+                        if sample:
+                            st.json({k: str(v) for k, v in sample.items()})
                         else:
                             st.warning("Table exists but has no data")
                     except Exception as e:
@@ -0,0 +1 @@
+"""Analytics helpers shared by the PSX Streamlit apps"""
@@ -0,0 +1,231 @@
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from psx.indicators import interval_volume, volume_ratio
+from psx.jsonfile import file_lock, write_json
+
+# Rule kinds: label, batch feature they test and comparison direction
+RULE_KINDS = {
+    'price_above': ('Price above', 'price', 1),
+    'price_below': ('Price below', 'price', -1),
+    'change_above': ('Change % above', 'change', 1),
+    'change_below': ('Change % below', 'change', -1),
+    'volume_spike': ('Volume spike (x avg)', 'volume_ratio', 1),
+}
+FEATURES = ('price', 'change', 'volume_ratio')
+
+_KIND_CODES = {kind: code for code, kind in enumerate(RULE_KINDS)}
+_KIND_FEATURE = np.array([FEATURES.index(spec[1]) for spec in RULE_KINDS.values()], dtype=np.int64)
+_KIND_DIRECTION = np.array([spec[2] for spec in RULE_KINDS.values()], dtype=np.int8)
+
+
+def volume_spike_ratio(history, window=12, upto=None):
+    """Latest interval volume over its rolling average, per symbol
+
+    Volume in each snapshot is cumulative for the day, so interval volume is
+    the batch-to-batch difference. The average covers the ``window`` intervals
+    before the latest one; ``upto`` limits the history to its first batches.
+    """
+    volume = history.matrix('volume')[:, :upto]
+    if volume.shape[1] < 3:
+        return pd.Series(np.nan, index=pd.Index(history.symbols, name='symbol'))
+
+    ratio = volume_ratio(interval_volume(volume[:, -(window + 2):]), window)[:, -1]
+    return pd.Series(ratio, index=pd.Index(history.symbols, name='symbol'))
+
+
+class CompiledRules:
+    """Flat arrays of every user's rules, expanded to one row per symbol"""
+
+    def __init__(self, rules, watchlists):
+        rule_ids, users, symbols, kinds, thresholds = [], [], [], [], []
+        for rule in rules:
+            targets = watchlists.get(rule['user'], {}).get(rule['target'], [rule['target']])
+            for symbol in targets:
+                rule_ids.append(rule['id'])
+                users.append(rule['user'])
+                symbols.append(symbol)
+                kinds.append(_KIND_CODES[rule['kind']])
+                thresholds.append(rule['threshold'])
+
+        self.rule_ids = np.array(rule_ids, dtype=np.int64)
+        self.users = np.array(users, dtype=object)
+        self.symbols = pd.Index(symbols, dtype=object)
+        self.kinds = np.array(kinds, dtype=np.int64)
+        self.thresholds = np.array(thresholds, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.rule_ids)
+
+    def evaluate(self, features):
+        """Evaluate all rules against a (symbol-indexed) feature frame at once
+
+        Returns the tested value for each rule row and a mask of rules whose
+        condition currently holds.
+        """
+        if len(self) == 0:
+            return np.empty(0), np.zeros(0, dtype=bool)
+
+        matrix = features.reindex(columns=list(FEATURES)).to_numpy(dtype=np.float64)
+        positions = features.index.get_indexer(self.symbols)
+        found = positions >= 0
+
+        values = np.full(len(self), np.nan)
+        values[found] = matrix[positions[found], _KIND_FEATURE[self.kinds[found]]]
+
+        direction = _KIND_DIRECTION[self.kinds]
+        with np.errstate(invalid='ignore'):
+            active = np.where(direction > 0, values > self.thresholds, values < self.thresholds)
+        return values, active & ~np.isnan(values)
+
+
+class AlertBook:
+    """Watchlists and alert rules for every user, persisted as JSON"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.watchlists = {}
+        self.rules = []
+        self._next_id = 1
+        self._compiled = None
+        self.lock = threading.RLock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def load(self):
+        """Read watchlists and rules from the JSON file"""
+        with open(self.path, 'r', encoding='utf-8') as handle:
+            data = json.load(handle)
+        self.watchlists = data.get('watchlists', {})
+        self.rules = data.get('rules', [])
+        self._next_id = max([rule['id'] for rule in self.rules], default=0) + 1
+        self._compiled = None
+
+    def save(self):
+        """Write watchlists and rules to the JSON file (if configured)"""
+        if not self.path:
+            return
+        write_json(self.path, {'watchlists': self.watchlists, 'rules': self.rules})
+
+    @contextmanager
+    def _editing(self):
+        """Change the book on top of the file's latest contents, then save
+
+        Other processes share the file, so it is re-read under a file lock
+        first and their changes are kept.
+        """
+        with self.lock, file_lock(self.path):
+            if self.path and os.path.exists(self.path):
+                self.load()
+            yield
+            self._compiled = None
+            self.save()
+
+    def set_watchlist(self, user, name, symbols):
+        """Create or replace a user's watchlist"""
+        with self._editing():
+            self.watchlists.setdefault(user, {})[name] = sorted(set(symbols))
+
+    def remove_watchlist(self, user, name):
+        with self._editing():
+            self.watchlists.get(user, {}).pop(name, None)
+
+    def add_rule(self, user, target, kind, threshold):
+        """Add a rule on a symbol or one of the user's watchlists"""
+        if kind not in RULE_KINDS:
+            raise ValueError(f"Unknown alert rule kind: {kind}")
+        with self._editing():
+            rule = {
+                'id': self._next_id,
+                'user': user,
+                'target': target,
+                'kind': kind,
+                'threshold': float(threshold),
+            }
+            self._next_id += 1
+            self.rules.append(rule)
+        return rule['id']
+
+    def remove_rule(self, rule_id):
+        with self._editing():
+            self.rules = [rule for rule in self.rules if rule['id'] != rule_id]
+
+    def rules_for(self, user):
+        return [rule for rule in self.rules if rule['user'] == user]
+
+    def compiled(self):
+        """Compiled rule arrays, rebuilt only after rules or watchlists change"""
+        with self.lock:
+            if self._compiled is None:
+                self._compiled = CompiledRules(self.rules, self.watchlists)
+            return self._compiled
+
+
+class AlertMonitor:
+    """Evaluates the alert book once per batch and keeps recent triggers"""
+
+    def __init__(self, book, max_events=500):
+        self.book = book
+        self.events = deque(maxlen=max_events)
+        self.last_batch = None
+        self.active = pd.DataFrame(columns=['rule_id', 'user', 'symbol', 'kind', 'threshold', 'value'])
+        self._previous = pd.MultiIndex.from_arrays([[], []])
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def batch_features(df, volume_ratio=None):
+        """Symbol-indexed price / change / volume-ratio frame for a batch"""
+        features = pd.DataFrame({
+            'price': pd.to_numeric(df['current_price'], errors='coerce').to_numpy() if 'current_price' in df.columns else np.nan,
+            'change': pd.to_numeric(df['change_percent'], errors='coerce').to_numpy() if 'change_percent' in df.columns else np.nan,
+        }, index=pd.Index(df['symbol'], name='symbol'))
+        features = features[~features.index.duplicated(keep='last')]
+        if volume_ratio is not None:
+            features['volume_ratio'] = volume_ratio.reindex(features.index).to_numpy()
+        else:
+            features['volume_ratio'] = np.nan
+        return features
+
+    def process(self, batch_key, df, volume_ratio=None):
+        """Evaluate all rules for a batch newer than the last one processed
+
+        Sessions browsing older batches must not replay triggers, so repeated
+        or older batch keys are no-ops.
+        """
+        with self.lock:
+            if self.last_batch is not None and batch_key <= self.last_batch:
+                return []
+
+            compiled = self.book.compiled()
+            values, active = compiled.evaluate(self.batch_features(df, volume_ratio))
+
+            rows = np.flatnonzero(active)
+            active_frame = pd.DataFrame({
+                'rule_id': compiled.rule_ids[rows],
+                'user': compiled.users[rows],
+                'symbol': np.asarray(compiled.symbols)[rows],
+                'kind': np.array(list(RULE_KINDS), dtype=object)[compiled.kinds[rows]],
+                'threshold': compiled.thresholds[rows],
+                'value': values[rows],
+            })
+
+            # Only conditions that were not already true on the last batch fire
+            keys = pd.MultiIndex.from_arrays([active_frame['rule_id'], active_frame['symbol']])
+            fresh = ~keys.isin(self._previous)
+            triggered = active_frame[fresh].assign(batch=batch_key)
+            self.events.extend(triggered.to_dict('records'))
+
+            self._previous = keys
+            self.active = active_frame
+            self.last_batch = batch_key
+            return triggered.to_dict('records')
+
+    def events_for(self, user):
+        """Most recent triggered alerts for a user, newest first"""
+        return [event for event in reversed(self.events) if event['user'] == user]
@@ -0,0 +1,291 @@
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from psx.correlation import CorrelationEngine, batch_returns, cluster_order
+from psx.indicators import forward_fill, macd_histogram, rsi
+
+# Worker processes for heavy analytics (correlations, multi-day summaries)
+ANALYTICS_WORKERS = int(os.getenv("PSX_ANALYTICS_WORKERS", "2"))
+
+# Finished jobs kept for identical requests from any session
+ANALYTICS_RESULTS = 32
+
+# Summary columns written by summary_job, in order
+SUMMARY_COLUMNS = ('return_pct', 'volatility_pct', 'range_pct', 'volume', 'up_days', 'rsi', 'macd_hist')
+
+
+def share_arrays(arrays):
+    """Copy named arrays into one new shared-memory block
+
+    Returns the block and a picklable spec (block name plus the offset,
+    shape and dtype of each array) from which ``attach_arrays`` rebuilds
+    the arrays in another process without copying them.
+    """
+    layout = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.asarray(array)
+        offset = (offset + 63) // 64 * 64
+        layout.append((name, offset, array.shape, array.dtype.str))
+        offset += array.nbytes
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for view, array in zip(_views(block, layout).values(), arrays.values()):
+        view[...] = array
+    return block, (block.name, layout)
+
+
+def _views(block, layout):
+    return {name: np.ndarray(shape, dtype, buffer=block.buf, offset=start) for name, start, shape, dtype in layout}
+
+
+def attach_arrays(spec):
+    """Open a block made by ``share_arrays``: (block, {name: view})"""
+    name, layout = spec
+    block = shared_memory.SharedMemory(name=name)
+    return block, _views(block, layout)
+
+
+def _run(func, spec, params):
+    """Worker entry point: run a job over the shared arrays it was given"""
+    block, arrays = attach_arrays(spec)
+    try:
+        return func(arrays, **params)
+    finally:
+        arrays.clear()
+        try:
+            block.close()
+        except BufferError:
+            # A job kept a view alive; the mapping goes with the worker
+            pass
+
+
+def _report(arrays, done, total):
+    progress = arrays['progress']
+    progress[1] = total
+    progress[0] = done
+
+
+def correlation_job(arrays, n_sessions, base_obs=0, block_size=128):
+    """Correlation of intraday returns over a window, clustered
+
+    Inputs are ``prices_<i>`` (symbols x batches) per session with one
+    row per requested symbol. When the window extends an earlier job, its
+    statistics come in as ``base_sum`` and ``base_cross`` (over ``base_obs``
+    returns) and the sessions hold only the batches added since. The
+    estimate so far is written to ``corr`` after each session, so callers
+    can show it while the job runs.
+    """
+    n = arrays['corr'].shape[0]
+    engine = CorrelationEngine(block_size=block_size)
+    symbols = list(range(n))
+    if 'base_sum' in arrays:
+        engine.add_statistics(symbols, base_obs, arrays['base_sum'], arrays['base_cross'])
+    for i in range(n_sessions):
+        engine.add_returns(symbols, batch_returns(arrays[f'prices_{i}']))
+        _, corr = engine.correlation(symbols)
+        arrays['corr'][...] = corr
+        _report(arrays, i + 1, n_sessions + 1)
+
+    _, corr = engine.correlation(symbols)
+    order = cluster_order(corr)
+    n_obs, sums, cross = engine.statistics(symbols)
+    _report(arrays, n_sessions + 1, n_sessions + 1)
+    return {'corr': corr, 'order': order, 'n_obs': n_obs, 'sum': sums, 'cross': cross}
+
+
+def summary_job(arrays, n_sessions):
+    """Multi-day aggregates and indicators per symbol over a window
+
+    Inputs per session are ``price_<i>``, ``high_<i>``, ``low_<i>`` and
+    ``volume_<i>`` (symbols x batches, cumulative daily volume). Daily
+    open/close/high/low/volume are aggregated into window return, intraday
+    volatility, average daily range, total volume and up days; RSI(14) and
+    the MACD histogram are recomputed over the window's batch closes.
+    """
+    n = arrays['price_0'].shape[0]
+    total = n_sessions + 1
+    closes = []
+    moves = []
+    opens = np.full((n, n_sessions), np.nan)
+    last = np.full((n, n_sessions), np.nan)
+    ranges = np.full((n, n_sessions), np.nan)
+    volumes = np.zeros((n, n_sessions))
+    for i in range(n_sessions):
+        prices = forward_fill(arrays[f'price_{i}'])
+        # First finite price of the day: leading NaNs are skipped by a reverse fill
+        opens[:, i] = forward_fill(prices[:, ::-1])[:, -1] if prices.shape[1] else np.nan
+        last[:, i] = prices[:, -1] if prices.shape[1] else np.nan
+        with np.errstate(all='ignore'):
+            high = np.nanmax(arrays[f'high_{i}'], axis=1, initial=-np.inf)
+            low = np.nanmin(arrays[f'low_{i}'], axis=1, initial=np.inf)
+            ranges[:, i] = np.where(np.isfinite(high - low) & (last[:, i] > 0), (high - low) / last[:, i] * 100.0, np.nan)
+        day_volume = forward_fill(arrays[f'volume_{i}'])
+        volumes[:, i] = np.nan_to_num(day_volume[:, -1]) if day_volume.shape[1] else 0.0
+        closes.append(prices)
+        moves.append(batch_returns(prices))
+        _report(arrays, i + 1, total)
+
+    series = forward_fill(np.concatenate(closes, axis=1)) if closes else np.full((n, 0), np.nan)
+    with np.errstate(all='ignore'):
+        first_open = forward_fill(opens[:, ::-1])[:, -1]
+        close = forward_fill(last)[:, -1]
+        result = {
+            'return_pct': (close / first_open - 1.0) * 100.0,
+            # Overnight gaps are left out of intraday volatility
+            'volatility_pct': np.std(np.concatenate(moves, axis=1), axis=1) * 100.0 if series.shape[1] > n_sessions else np.full(n, np.nan),
+            'range_pct': np.nanmean(ranges, axis=1),
+            'volume': volumes.sum(axis=1),
+            'up_days': (last > opens).sum(axis=1).astype(np.float64),
+            'rsi': rsi(series),
+            'macd_hist': macd_histogram(series) if series.shape[1] else np.full(n, np.nan),
+        }
+    _report(arrays, total, total)
+    return result
+
+
+class AnalyticsJob:
+    """Handle on one analytics job running in the process pool
+
+    The job's inputs and outputs live in a shared-memory block the pool
+    process maps directly; ``progress`` and ``partial`` read it while the
+    job runs, and the block is released as soon as the job finishes.
+    """
+
+    def __init__(self, key, family, future=None, block=None, views=None):
+        self.key = key
+        self.family = family
+        self.future = future or Future()
+        self._block = block
+        self._views = views or {}
+        self._lock = threading.Lock()
+
+    def done(self):
+        return self.future.done()
+
+    def failed(self):
+        return self.done() and not self.future.cancelled() and self.future.exception() is not None
+
+    def progress(self):
+        """Fraction of the job completed (0-1)"""
+        if self.done():
+            return 1.0
+        with self._lock:
+            progress = self._views.get('progress')
+            if progress is None or progress[1] <= 0:
+                return 0.0
+            return float(progress[0] / progress[1])
+
+    def partial(self, name):
+        """Copy of an output array as the job has filled it so far"""
+        with self._lock:
+            view = self._views.get(name)
+            return None if view is None else view.copy()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+    def _release(self):
+        with self._lock:
+            self._views = {}
+            if self._block is not None:
+                try:
+                    self._block.close()
+                except BufferError:
+                    pass
+                self._block.unlink()
+                self._block = None
+
+
+class AnalyticsExecutor:
+    """Runs heavy analytics in a process pool, off the Streamlit script thread
+
+    ``submit`` copies a job's input arrays once into shared memory (pool
+    processes map them without pickling) and returns an ``AnalyticsJob``.
+    Jobs are keyed: an identical request from any session while one is in
+    flight, or after it finished, gets the same job. A newer job of the same
+    ``family`` (same analysis, more batches) cancels older ones still queued,
+    and ``latest`` returns the family's last finished result to show while
+    the newer one runs.
+    """
+
+    def __init__(self, max_workers=ANALYTICS_WORKERS, max_results=ANALYTICS_RESULTS):
+        self.max_workers = max_workers
+        self.pool = self._create_pool()
+        self.max_results = max_results
+        self._jobs = OrderedDict()
+        self._latest = {}
+        self._lock = threading.Lock()
+        self.counters = {'submitted': 0, 'deduplicated': 0, 'cancelled': 0}
+
+    def _create_pool(self):
+        # Spawned workers do not inherit the server's threads or sockets
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def submit(self, key, func, arrays, params=None, outputs=None, family=None):
+        """Job for ``func(arrays, **params)`` in a pool process, reusing any identical one
+
+        ``outputs`` maps names to (shape, dtype) of arrays the job fills in
+        shared memory; a two-slot ``progress`` array is always added.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job.future.cancelled():
+                self._jobs.move_to_end(key)
+                self.counters['deduplicated'] += 1
+                return job
+
+            for stale in list(self._jobs.values()):
+                # Its done callback releases the shared block
+                if family is not None and stale.family == family and stale.future.cancel():
+                    del self._jobs[stale.key]
+                    self.counters['cancelled'] += 1
+
+            shared = dict(arrays)
+            for name, (shape, dtype) in (outputs or {}).items():
+                shared[name] = np.full(shape, np.nan, dtype=dtype)
+            shared['progress'] = np.zeros(2)
+            block, spec = share_arrays(shared)
+            views = _views(block, spec[1])
+            job = AnalyticsJob(key, family, block=block, views={
+                name: views[name] for name in list(outputs or {}) + ['progress']
+            })
+            try:
+                job.future = self.pool.submit(_run, func, spec, params or {})
+            except BrokenProcessPool:
+                # A worker died (e.g. out of memory); start a fresh pool
+                self.pool = self._create_pool()
+                job.future = self.pool.submit(_run, func, spec, params or {})
+            self._jobs[key] = job
+            self.counters['submitted'] += 1
+            while len(self._jobs) > self.max_results:
+                oldest = next(iter(self._jobs.values()))
+                if not oldest.done():
+                    break
+                self._jobs.popitem(last=False)
+        job.future.add_done_callback(lambda _: self._finish(job))
+        return job
+
+    def _finish(self, job):
+        job._release()
+        if job.family is not None and not job.future.cancelled() and job.future.exception() is None:
+            with self._lock:
+                self._latest[job.family] = job
+
+    def latest(self, family):
+        """Most recent successfully finished job of a family, or None"""
+        with self._lock:
+            return self._latest.get(family)
+
+    def pending(self):
+        with self._lock:
+            return sum(not job.done() for job in self._jobs.values())
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,418 @@
+"""Headless HTTP API over the shared DataManager caches
+
+Serves batches, metrics and per-symbol history as JSON or Arrow IPC for
+downstream scripts, so they need neither Supabase credentials nor the
+Streamlit page. Settled batches never change, so their responses carry a
+strong ETag and long-lived Cache-Control; clients sending If-None-Match
+get a 304 without the batch being encoded again.
+
+Endpoints (timestamps are ISO 8601; naive ones are taken as PKT; frames
+are returned with UTC timestamps):
+    GET /batches[?date=YYYY-MM-DD][&limit=N]
+    GET /batch/{ts}[?format=json|arrow][&columns=a,b]
+    GET /metrics/{ts}
+    GET /history/{symbol}[?date=YYYY-MM-DD][&format=json|arrow]
+    GET /daily[?start=YYYY-MM-DD][&end=YYYY-MM-DD][&symbols=A,B][&format=json|arrow]
+    GET /breadth/daily[?start=YYYY-MM-DD][&end=YYYY-MM-DD]
+
+Daily endpoints read the end-of-day rollups written by ``psx.data.rollup``.
+
+Run standalone with ``python -m psx.api`` (same PSX_DATA_BACKEND settings
+as the apps), or set PSX_API_PORT to serve from inside the Streamlit
+process and share its DataManager.
+
+Usage:
+    python -m psx.api [--host 127.0.0.1] [--port 8502]
+"""
+import argparse
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from psx.data.manager import BATCH_SETTLE, PKT_TZ, DataManager
+from psx.history import BATCH_FREQ, HISTORY_FIELDS, SessionHistory, batch_bucket
+
+ARROW_TYPE = 'application/vnd.apache.arrow.stream'
+JSON_TYPE = 'application/json'
+
+# Encoded batch responses kept per (batch, format, columns)
+RESPONSE_CACHE_ENTRIES = 256
+
+
+class ApiError(Exception):
+    """Request failure reported to the client as a JSON error with a status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _jsonable(value):
+    """JSON-safe version of NumPy, pandas and datetime values"""
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def frame_json(df):
+    """Frame as {"columns": [...], "data": [[...], ...]} with ISO timestamps"""
+    return df.to_json(orient='split', index=False, date_format='iso', date_unit='s').encode()
+
+
+def frame_arrow(df):
+    """Frame as an uncompressed Arrow IPC stream"""
+    import pyarrow as pa
+
+    plain = df.copy(deep=False)
+    plain.attrs = {}
+    table = pa.Table.from_pandas(plain, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _etag(body):
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+class ApiService:
+    """Request handling independent of the HTTP server, over one DataManager
+
+    Encoded responses of settled (immutable) batches are kept in a small
+    LRU so repeated requests and conditional requests skip validation and
+    encoding. Session histories are cached per date and extended with new
+    batches, as in the app.
+    """
+
+    def __init__(self, data_manager, max_responses=RESPONSE_CACHE_ENTRIES, daily_store=None):
+        self.data_manager = data_manager
+        self.daily_store = daily_store
+        self.max_responses = max_responses
+        self.counters = {'requests': 0, 'not_modified': 0, 'cached_bodies': 0, 'errors': 0}
+        self._responses = OrderedDict()
+        self._histories = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Parsing helpers
+
+    @staticmethod
+    def _timestamp(text):
+        try:
+            return DataManager._localize(unquote(text))
+        except (ValueError, TypeError):
+            raise ApiError(400, f"Invalid timestamp: {text}")
+
+    @staticmethod
+    def _date(query):
+        text = query.get('date', [None])[0]
+        if text is None:
+            return None
+        try:
+            return pd.Timestamp(text).date()
+        except ValueError:
+            raise ApiError(400, f"Invalid date: {text}")
+
+    @staticmethod
+    def _day(query, name):
+        text = query.get(name, [None])[0]
+        if text is None:
+            return None
+        try:
+            return pd.Timestamp(text).strftime('%Y-%m-%d')
+        except ValueError:
+            raise ApiError(400, f"Invalid {name}: {text}")
+
+    @staticmethod
+    def _format(query, accept):
+        fmt = query.get('format', [None])[0]
+        if fmt is None:
+            fmt = 'arrow' if accept and ARROW_TYPE in accept else 'json'
+        if fmt not in ('json', 'arrow'):
+            raise ApiError(400, f"Unknown format: {fmt}")
+        return fmt
+
+    @staticmethod
+    def _settled(bucket):
+        return pd.Timestamp.now(tz='UTC') >= bucket + BATCH_SETTLE
+
+    def _cached(self, key):
+        with self._lock:
+            cached = self._responses.get(key)
+            if cached is not None:
+                self._responses.move_to_end(key)
+                self.counters['cached_bodies'] += 1
+        return cached
+
+    def count(self, name):
+        """Bump a request counter (handler threads share the service)"""
+        with self._lock:
+            self.counters[name] += 1
+
+    def _remember(self, key, response):
+        with self._lock:
+            self._responses[key] = response
+            self._responses.move_to_end(key)
+            while len(self._responses) > self.max_responses:
+                self._responses.popitem(last=False)
+
+    # Endpoints
+
+    def handle(self, path, query, accept=None):
+        """(status, content type, body, headers) for a GET request"""
+        parts = [unquote(part) for part in path.strip('/').split('/') if part]
+        if parts == ['batches']:
+            return self.batches(query)
+        if len(parts) == 2 and parts[0] == 'batch':
+            return self.batch(parts[1], query, accept)
+        if len(parts) == 2 and parts[0] == 'metrics':
+            return self.metrics(parts[1])
+        if len(parts) == 2 and parts[0] == 'history':
+            return self.history(parts[1], query, accept)
+        if parts == ['daily']:
+            return self.daily(query, accept)
+        if parts == ['breadth', 'daily']:
+            return self.daily_breadth(query)
+        raise ApiError(404, f"Unknown endpoint: {path}")
+
+    def batches(self, query):
+        limit = query.get('limit', [None])[0]
+        limit = int(limit) if limit and limit.isdigit() else None
+        session_date = self._date(query)
+        if session_date is not None:
+            batches = self.data_manager.get_session_batches(session_date)
+        else:
+            batches = self.data_manager.get_available_batches(limit=limit or 50)
+        body = json.dumps([ts.isoformat() for ts in batches[:limit] if ts is not None]).encode()
+        return 200, JSON_TYPE, body, {'Cache-Control': 'no-cache'}
+
+    def _load(self, text, columns=None):
+        """Validated batch nearest a timestamp, and its bucket"""
+        target = self._timestamp(text)
+        df = self.data_manager.get_data_by_timestamp(target)
+        if df is None or df.empty:
+            raise ApiError(404, f"No batch near {target.isoformat()}")
+        bucket = batch_bucket([df['scraped_at'].max()])[0]
+        if columns:
+            missing = [col for col in columns if col not in df.columns]
+            if missing:
+                raise ApiError(400, f"Unknown columns: {', '.join(missing)}")
+            df = df[columns]
+        return df, bucket
+
+    def batch(self, text, query, accept):
+        fmt = self._format(query, accept)
+        columns = [col for col in query.get('columns', [''])[0].split(',') if col] or None
+        # Settled batches are looked up as requested, before any parsing
+        key = ('batch', text, fmt, tuple(columns or ()))
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        requested = batch_bucket([self._timestamp(text)])[0]
+        df, bucket = self._load(text, columns)
+        body = frame_arrow(df) if fmt == 'arrow' else frame_json(df)
+        response = self._response(body, ARROW_TYPE if fmt == 'arrow' else JSON_TYPE, bucket)
+        # Timestamps near a bucket edge may resolve to the neighbouring batch
+        if bucket == requested and self._settled(bucket):
+            self._remember(key, response)
+        return response
+
+    def _response(self, body, content_type, bucket):
+        headers = {'ETag': _etag(body), 'X-Batch-Time': bucket.tz_convert(PKT_TZ).isoformat()}
+        headers['Cache-Control'] = 'public, max-age=31536000, immutable' if self._settled(bucket) else 'no-cache'
+        return 200, content_type, body, headers
+
+    def metrics(self, text):
+        key = ('metrics', text)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        requested = batch_bucket([self._timestamp(text)])[0]
+        df, bucket = self._load(text)
+        metrics = DataManager.calculate_market_metrics(df)
+        for leader in ('top_gainer', 'top_loser', 'most_active'):
+            row = metrics.get(leader)
+            if row is not None:
+                metrics[leader] = {col: row.get(col) for col in ('symbol', 'sector', 'current_price', 'change_percent', 'volume')}
+        metrics['batch_time'] = bucket.tz_convert(PKT_TZ)
+        response = self._response(json.dumps(_jsonable(metrics)).encode(), JSON_TYPE, bucket)
+        if bucket == requested and self._settled(bucket):
+            self._remember(key, response)
+        return response
+
+    def _history(self, session_date):
+        """Session history for a date, extended with batches that landed since"""
+        with self._lock:
+            history = self._histories.get(session_date)
+            if history is None:
+                history = SessionHistory()
+                self._histories[session_date] = history
+                while len(self._histories) > 4:
+                    self._histories.popitem(last=False)
+            self._histories.move_to_end(session_date)
+
+        with history.lock:
+            if history.batch_times and session_date < datetime.now(PKT_TZ).date():
+                return history
+            # Open sessions only query for rows once the (TTL-cached) listing shows a newer, settled batch
+            latest = self.data_manager.get_available_batches(limit=1) if history.batch_times else None
+            if history.needs_extend(latest[0] if latest else None):
+                since = history.batch_times[-1] + pd.Timedelta(BATCH_FREQ) if history.batch_times else None
+                history.extend_frame(self.data_manager.get_session_data(session_date, since=since))
+        return history
+
+    def history(self, symbol, query, accept):
+        fmt = self._format(query, accept)
+        session_date = self._date(query)
+        if session_date is None:
+            batches = self.data_manager.get_available_batches(limit=1)
+            if not batches:
+                raise ApiError(404, "No batches available")
+            session_date = batches[0].tz_convert(PKT_TZ).date()
+
+        history = self._history(session_date)
+        with history.lock:
+            row = history.symbol_index.get(symbol.upper())
+            if row is None:
+                raise ApiError(404, f"Unknown symbol on {session_date}: {symbol}")
+            # A symbol's history up to a given batch never changes
+            key = ('history', row, session_date, history.n_batches, fmt)
+            cached = self._cached(key)
+            if cached is not None:
+                return cached
+            columns = {'batch_time': pd.DatetimeIndex(history.batch_times).tz_convert(PKT_TZ)}
+            columns.update((field, history.matrix(field)[row]) for field in HISTORY_FIELDS if field in history.fields)
+            last_batch = history.batch_times[-1]
+
+        frame = pd.DataFrame(columns)
+        frame = frame[frame.drop(columns='batch_time').notna().any(axis=1).to_numpy()]
+        body = frame_arrow(frame) if fmt == 'arrow' else frame_json(frame)
+        headers = {'ETag': _etag(body), 'Cache-Control': 'no-cache', 'X-Batch-Time': last_batch.tz_convert(PKT_TZ).isoformat()}
+        response = (200, ARROW_TYPE if fmt == 'arrow' else JSON_TYPE, body, headers)
+        self._remember(key, response)
+        return response
+
+    def _daily_store(self):
+        if self.daily_store is None:
+            raise ApiError(404, "No daily rollup store configured")
+        return self.daily_store
+
+    def daily(self, query, accept):
+        """One row per symbol per rolled-up session"""
+        fmt = self._format(query, accept)
+        start, end = self._day(query, 'start'), self._day(query, 'end')
+        symbols = [symbol for text in query.get('symbols', []) for symbol in text.split(',') if symbol]
+        frame = self._daily_store().read(start, end, symbols=symbols or None)
+        body = frame_arrow(frame) if fmt == 'arrow' else frame_json(frame)
+        return 200, ARROW_TYPE if fmt == 'arrow' else JSON_TYPE, body, {'ETag': _etag(body), 'Cache-Control': 'no-cache'}
+
+    def daily_breadth(self, query):
+        frame = self._daily_store().breadth(self._day(query, 'start'), self._day(query, 'end'))
+        body = frame_json(frame)
+        return 200, JSON_TYPE, body, {'ETag': _etag(body), 'Cache-Control': 'no-cache'}
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """HTTP/1.1 keep-alive handler delegating to the server's ApiService"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'PSXApi/1.0'
+    # Headers and body are separate writes; without this, small responses
+    # on keep-alive connections stall ~40 ms on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        service = self.server.service
+        url = urlsplit(self.path)
+        service.count('requests')
+        try:
+            status, content_type, body, headers = service.handle(url.path, parse_qs(url.query), self.headers.get('Accept'))
+        except ApiError as e:
+            service.count('errors')
+            status, content_type, headers = e.status, JSON_TYPE, {}
+            body = json.dumps({'error': str(e)}).encode()
+        except Exception as e:
+            service.count('errors')
+            status, content_type, headers = 500, JSON_TYPE, {}
+            body = json.dumps({'error': f"Internal error: {str(e)}"}).encode()
+
+        # Conditional request for content the client already holds
+        etag = headers.get('ETag')
+        if status == 200 and etag and etag in (self.headers.get('If-None-Match') or ''):
+            service.count('not_modified')
+            status, body = 304, b''
+
+        self.send_response(status)
+        if status != 304:
+            self.send_header('Content-Type', content_type)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep the console quiet under load; errors are counted instead
+        pass
+
+
+def make_server(data_manager, host='127.0.0.1', port=8502, daily_store=None):
+    """Threaded HTTP server answering API requests from ``data_manager``"""
+    server = ThreadingHTTPServer((host, port), ApiRequestHandler)
+    server.daemon_threads = True
+    server.service = ApiService(data_manager, daily_store=daily_store)
+    return server
+
+
+def start_api_server(data_manager, host='127.0.0.1', port=8502, daily_store=None):
+    """Serve the API on a daemon thread; returns the server (``shutdown()`` stops it)"""
+    server = make_server(data_manager, host, port, daily_store)
+    threading.Thread(target=server.serve_forever, name="psx-api", daemon=True).start()
+    return server
+
+
+def main():
+    from dotenv import load_dotenv
+
+    from psx.data import create_backend, resilient_backend, tiered_backend
+    from psx.data.rollup import ROLLUP_PATH, DailyStore
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    args = parser.parse_args()
+
+    load_dotenv()
+    backend = tiered_backend(resilient_backend(create_backend()))
+    if backend is None:
+        raise SystemExit("Data backend not configured (set SUPABASE_URL/SUPABASE_KEY or PSX_DATA_BACKEND)")
+    server = make_server(DataManager(backend, on_error=print), args.host, args.port, DailyStore(ROLLUP_PATH))
+    print(f"PSX API on http://{args.host}:{args.port} ({backend.name} backend)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
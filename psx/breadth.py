@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+BREADTH_COLUMNS = [
+    'batch_time', 'advances', 'declines', 'unchanged', 'net_advances', 'ad_line',
+    'up_volume', 'down_volume', 'up_down_volume_ratio', 'new_highs', 'new_lows'
+]
+
+
+def compute_breadth(change_pct, volume, price, prior_high=None, prior_low=None, prior_ad=0.0,
+                    high=None, low=None, open_price=None):
+    """Breadth statistics for every batch column in one vectorized pass
+
+    All inputs are (symbols, batches) matrices. New highs and lows are
+    taken from the reported ``high``/``low`` (the day's extremes so far,
+    falling back to ``price``); a symbol's first batch of the day is
+    compared with its ``open_price``. ``prior_high``/``prior_low`` carry
+    each symbol's running extremes from earlier batches and ``prior_ad``
+    the last advance/decline line value, so a tail of new batches can be
+    processed without revisiting the whole session.
+
+    Returns the per-batch statistics plus the updated running state.
+    """
+    n_symbols = change_pct.shape[0]
+    if prior_high is None:
+        prior_high = np.full(n_symbols, np.nan)
+    if prior_low is None:
+        prior_low = np.full(n_symbols, np.nan)
+
+    advancing = change_pct > 0
+    declining = change_pct < 0
+    unchanged = change_pct == 0
+
+    advances = advancing.sum(axis=0)
+    declines = declining.sum(axis=0)
+    net = advances - declines
+
+    # Volume is cumulative for the day, so it is summed per side as reported
+    filled_volume = np.nan_to_num(volume, nan=0.0)
+    up_volume = np.where(advancing, filled_volume, 0.0).sum(axis=0)
+    down_volume = np.where(declining, filled_volume, 0.0).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(down_volume > 0, up_volume / down_volume, np.nan)
+
+    # The day's extremes as of each batch
+    day_high = price if high is None else np.fmax(high, price)
+    day_low = price if low is None else np.fmin(low, price)
+
+    # Running extremes up to (but excluding) each batch
+    running_high = np.fmax.accumulate(np.column_stack([prior_high, day_high]), axis=1)
+    running_low = np.fmin.accumulate(np.column_stack([prior_low, day_low]), axis=1)
+    previous_high = running_high[:, :-1]
+    previous_low = running_low[:, :-1]
+    if open_price is not None:
+        # Before a symbol's first batch, its extremes are the opening price
+        previous_high = np.where(np.isnan(previous_high), open_price, previous_high)
+        previous_low = np.where(np.isnan(previous_low), open_price, previous_low)
+    with np.errstate(invalid='ignore'):
+        new_highs = (day_high > previous_high).sum(axis=0)
+        new_lows = (day_low < previous_low).sum(axis=0)
+
+    stats = {
+        'advances': advances,
+        'declines': declines,
+        'unchanged': unchanged.sum(axis=0),
+        'net_advances': net,
+        'ad_line': prior_ad + np.cumsum(net),
+        'up_volume': up_volume,
+        'down_volume': down_volume,
+        'up_down_volume_ratio': ratio,
+        'new_highs': new_highs,
+        'new_lows': new_lows,
+    }
+    return stats, running_high[:, -1], running_low[:, -1]
+
+
+class BreadthTracker:
+    """Incrementally maintained market breadth series for a session history"""
+
+    def __init__(self, history):
+        self.history = history
+        self.frame = pd.DataFrame(columns=BREADTH_COLUMNS)
+        self._processed = 0
+        self._high = np.empty(0)
+        self._low = np.empty(0)
+
+    def _carry(self, state, n_symbols):
+        """Pad running state for symbols that joined after it was computed"""
+        if len(state) < n_symbols:
+            state = np.concatenate([state, np.full(n_symbols - len(state), np.nan)])
+        return state
+
+    def update(self):
+        """Compute breadth for batches appended since the last update"""
+        history = self.history
+        start = self._processed
+        if history.n_batches <= start:
+            return self.frame
+
+        n_symbols = history.n_symbols
+        columns = slice(start, history.n_batches)
+        prior_ad = float(self.frame['ad_line'].iloc[-1]) if len(self.frame) else 0.0
+
+        stats, self._high, self._low = compute_breadth(
+            history.matrix('change_percent')[:, columns],
+            history.matrix('volume')[:, columns],
+            history.matrix('current_price')[:, columns],
+            prior_high=self._carry(self._high, n_symbols),
+            prior_low=self._carry(self._low, n_symbols),
+            prior_ad=prior_ad,
+            **{field: history.matrix(field)[:, columns] for field in ('high', 'low', 'open_price') if field in history.fields},
+        )
+
+        tail = pd.DataFrame(stats)
+        tail.insert(0, 'batch_time', history.batch_times[start:history.n_batches])
+        self.frame = tail if self.frame.empty else pd.concat([self.frame, tail], ignore_index=True)
+        self._processed = history.n_batches
+        return self.frame
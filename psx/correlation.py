@@ -0,0 +1,148 @@
+import numpy as np
+
+
+def batch_returns(prices):
+    """Batch-to-batch simple returns for a (symbols, batches) price matrix
+
+    Missing or non-positive prices give a zero return (no trade, no move).
+    """
+    if prices.shape[1] < 2:
+        return np.zeros((prices.shape[0], 0))
+    previous = prices[:, :-1]
+    current = prices[:, 1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = current / previous - 1.0
+    returns[~np.isfinite(returns) | (previous <= 0)] = 0.0
+    return returns
+
+
+class CorrelationEngine:
+    """Running correlation of intraday returns across a window of sessions
+
+    The engine keeps sufficient statistics (observation count, per-symbol sums
+    and the symbols x symbols cross-product matrix) rather than the returns
+    themselves. Cross products are accumulated in row blocks so memory stays
+    bounded by ``block_size`` x observations, and a new batch only touches the
+    rows and columns of symbols whose price actually moved. The statistics
+    are additive, so a window is extended by folding the returns of new
+    batches into the statistics of an earlier run.
+    """
+
+    def __init__(self, block_size=128):
+        self.block_size = block_size
+        self.symbols = []
+        self.symbol_index = {}
+        self.n_obs = 0
+        self._sum = np.zeros(0)
+        self._cross = np.zeros((0, 0))
+
+    def _rows_for(self, symbols):
+        """Engine row for each symbol, growing the statistics for new ones"""
+        rows = np.empty(len(symbols), dtype=np.int64)
+        for i, symbol in enumerate(symbols):
+            row = self.symbol_index.get(symbol)
+            if row is None:
+                row = len(self.symbols)
+                self.symbol_index[symbol] = row
+                self.symbols.append(symbol)
+            rows[i] = row
+
+        size = len(self.symbols)
+        if size > len(self._sum):
+            capacity = max(size, 2 * len(self._sum), 64)
+            grown_sum = np.zeros(capacity)
+            grown_sum[:len(self._sum)] = self._sum
+            grown_cross = np.zeros((capacity, capacity))
+            grown_cross[:len(self._sum), :len(self._sum)] = self._cross
+            self._sum, self._cross = grown_sum, grown_cross
+        return rows
+
+    def add_returns(self, symbols, returns):
+        """Accumulate a (symbols, observations) block of returns"""
+        if returns.size == 0:
+            return
+        rows = self._rows_for(symbols)
+
+        # Symbols that never moved contribute nothing to sums or cross products
+        active = np.flatnonzero(np.any(returns != 0, axis=1))
+        self.n_obs += returns.shape[1]
+        if len(active) == 0:
+            return
+
+        block = returns[active]
+        target = rows[active]
+        self._sum[target] += block.sum(axis=1)
+        for start in range(0, len(active), self.block_size):
+            stop = start + self.block_size
+            product = block[start:stop] @ block.T
+            self._cross[np.ix_(target[start:stop], target)] += product
+
+    def statistics(self, symbols):
+        """(n_obs, sums, cross products) for the given symbols, to carry into another engine"""
+        rows = self._rows_for(symbols)
+        return self.n_obs, self._sum[rows].copy(), self._cross[np.ix_(rows, rows)].copy()
+
+    def add_statistics(self, symbols, n_obs, sums, cross):
+        """Fold in statistics taken from another engine over the same symbols"""
+        rows = self._rows_for(symbols)
+        self.n_obs += n_obs
+        self._sum[rows] += sums
+        self._cross[np.ix_(rows, rows)] += cross
+
+    def correlation(self, symbols=None):
+        """Correlation matrix for the given symbols (default: all known)"""
+        if symbols is None:
+            symbols = list(self.symbols)
+        symbols = [symbol for symbol in symbols if symbol in self.symbol_index]
+        if self.n_obs < 2 or not symbols:
+            return symbols, np.full((len(symbols), len(symbols)), np.nan)
+
+        rows = np.array([self.symbol_index[symbol] for symbol in symbols], dtype=np.int64)
+        mean = self._sum[rows] / self.n_obs
+        covariance = self._cross[np.ix_(rows, rows)] / self.n_obs - np.outer(mean, mean)
+        std = np.sqrt(np.clip(np.diag(covariance), 0.0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = covariance / np.outer(std, std)
+        corr[~np.isfinite(corr)] = np.nan
+        np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+        return symbols, np.clip(corr, -1.0, 1.0)
+
+
+def cluster_order(corr):
+    """Leaf order of an average-linkage clustering on 1 - correlation
+
+    Plain NumPy implementation of agglomerative clustering using the
+    Lance-Williams update; each merge is one vectorized pass over the
+    distance matrix, which is fast enough for the ~550 listed symbols.
+    """
+    n = corr.shape[0]
+    if n <= 2:
+        return list(range(n))
+
+    distance = 1.0 - np.nan_to_num(corr, nan=0.0)
+    np.fill_diagonal(distance, np.inf)
+    sizes = np.ones(n)
+    members = [[i] for i in range(n)]
+    alive = np.ones(n, dtype=bool)
+
+    for _ in range(n - 1):
+        flat = np.argmin(distance)
+        i, j = divmod(flat, n)
+        if i > j:
+            i, j = j, i
+
+        # Average linkage: size-weighted mean of the two merged rows
+        merged = (sizes[i] * distance[i] + sizes[j] * distance[j]) / (sizes[i] + sizes[j])
+        merged[~alive] = np.inf
+        merged[i] = np.inf
+        distance[i, :] = merged
+        distance[:, i] = merged
+        distance[j, :] = np.inf
+        distance[:, j] = np.inf
+
+        sizes[i] += sizes[j]
+        members[i] = members[i] + members[j]
+        members[j] = []
+        alive[j] = False
+
+    return members[int(np.flatnonzero(alive)[0])]
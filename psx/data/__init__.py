@@ -0,0 +1,14 @@
+"""Shared data access for the PSX apps: backends plus a caching DataManager"""
+from psx.data.backends import (
+    StockDataBackend,
+    SupabaseBackend,
+    MemoryBackend,
+    ParquetBackend,
+    create_backend,
+)
+from psx.data.store import CompressedBatchStore
+from psx.data.resilience import CircuitBreaker, CircuitOpenError, QueryTimeout, ResilientBackend, resilient_backend
+from psx.data.shared import SharedBatchStore, SharedCacheBackend
+from psx.data.preload import BatchPreloader
+from psx.data.manager import DataManager, PKT_TZ, TRADING_START, TRADING_END
+from psx.data.tiering import RetentionJob, TieredBackend, tiered_backend
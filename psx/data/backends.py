@@ -0,0 +1,356 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from psx.timestamps import from_ns, to_ns, utc_series
+
+# Default Supabase table written by the scraper
+TABLE_NAME = 'stock_data'
+
+
+def _utc(value):
+    """Timestamp-like value as a UTC pandas Timestamp (naive values are UTC)"""
+    if value is None:
+        return None
+    value = pd.Timestamp(value)
+    return value.tz_localize('UTC') if value.tzinfo is None else value.tz_convert('UTC')
+
+
+def _parse_scraped_at(df):
+    """Parse the scraped_at column into tz-aware UTC timestamps"""
+    if 'scraped_at' in df.columns:
+        df['scraped_at'] = utc_series(df['scraped_at'])
+    return df
+
+
+class StockDataBackend:
+    """Source of raw ``stock_data`` rows
+
+    Backends return DataFrames of raw rows with ``scraped_at`` parsed to UTC.
+    Subclasses implement ``fetch_page``; paging over a time range is shared
+    here so every backend honours the same ``limit``/ordering semantics.
+    """
+
+    name = 'base'
+    page_size = 1000
+    # Store of validated batches shared with other processes, if the backend has one
+    batch_store = None
+
+    def fetch_page(self, start=None, end=None, columns=None, descending=False, offset=0, limit=None):
+        """One page of rows with start <= scraped_at <= end, ordered by scraped_at"""
+        raise NotImplementedError
+
+    def iter_pages(self, start=None, end=None, columns=None, descending=False, page_size=None):
+        """Yield successive pages until the range is exhausted"""
+        page_size = page_size or self.page_size
+        offset = 0
+        while True:
+            page = self.fetch_page(start, end, columns, descending, offset, page_size)
+            if page is None or page.empty:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            offset += len(page)
+
+    def fetch(self, start=None, end=None, columns=None, descending=False, limit=None):
+        """All rows in a range (optionally the first ``limit``), paging as needed"""
+        page_size = min(self.page_size, limit) if limit else self.page_size
+        frames = []
+        total = 0
+        for page in self.iter_pages(start, end, columns, descending, page_size):
+            frames.append(page)
+            total += len(page)
+            if limit and total >= limit:
+                break
+        if not frames:
+            return pd.DataFrame(columns=columns or [])
+        df = pd.concat(frames, ignore_index=True)
+        return df.head(limit) if limit else df
+
+    def count_rows(self):
+        """Total number of stored rows (None when the backend cannot tell cheaply)"""
+        return None
+
+    def ingest(self, df):
+        """Record rows pushed by the realtime listener
+
+        The database already holds inserted rows, so this is a no-op except
+        for local stores that mirror it.
+        """
+        return 0
+
+    def delete_range(self, start, end):
+        """Delete rows with start <= scraped_at <= end (used by the retention job)"""
+        raise NotImplementedError(f"{self.name} backend does not support deleting rows")
+
+    def ping(self):
+        """(ok, message) describing connectivity and the row layout"""
+        try:
+            sample = self.fetch(limit=5)
+        except Exception as e:
+            return False, f"Connection error: {str(e)}"
+        if sample.empty:
+            return True, "Connection OK but no data found"
+        columns = list(sample.columns)
+        return True, f"Connection OK. Found {len(sample)} records. Columns: {', '.join(columns[:5])}..."
+
+
+class SupabaseBackend(StockDataBackend):
+    """Rows from the Supabase ``stock_data`` table"""
+
+    name = 'supabase'
+
+    def __init__(self, client, table=TABLE_NAME):
+        self.client = client
+        self.table = table
+
+    @classmethod
+    def from_env(cls):
+        """Client from SUPABASE_URL / SUPABASE_KEY, or None when not configured"""
+        supabase_url = os.getenv("SUPABASE_URL")
+        supabase_key = os.getenv("SUPABASE_KEY")
+        if not supabase_url or not supabase_key:
+            return None
+
+        # Imported lazily; the client library is slow to import
+        from supabase import create_client
+        return cls(create_client(supabase_url, supabase_key))
+
+    def count_rows(self):
+        response = self.client.table(self.table).select("*", count="exact").limit(1).execute()
+        return getattr(response, 'count', None)
+
+    def fetch_page(self, start=None, end=None, columns=None, descending=False, offset=0, limit=None):
+        query = self.client.table(self.table).select(','.join(columns) if columns else '*')
+        if start is not None:
+            query = query.gte('scraped_at', _utc(start).isoformat())
+        if end is not None:
+            query = query.lte('scraped_at', _utc(end).isoformat())
+        # Secondary key keeps paging stable across rows sharing a timestamp
+        query = query.order('scraped_at', desc=descending)
+        if not columns or 'symbol' in columns:
+            query = query.order('symbol')
+        if limit:
+            query = query.range(offset, offset + limit - 1)
+
+        response = query.execute()
+        return _parse_scraped_at(pd.DataFrame(response.data or []))
+
+    def delete_range(self, start, end):
+        query = self.client.table(self.table).delete()
+        query = query.gte('scraped_at', _utc(start).isoformat()).lte('scraped_at', _utc(end).isoformat())
+        response = query.execute()
+        return len(response.data or [])
+
+
+class MemoryBackend(StockDataBackend):
+    """In-memory fake backed by a DataFrame (tests, benchmarks, offline demos)"""
+
+    name = 'memory'
+
+    def __init__(self, df=None):
+        self.df = pd.DataFrame() if df is None else _parse_scraped_at(df.copy())
+        self._sort()
+
+    def _sort(self):
+        if 'scraped_at' in self.df.columns:
+            self.df = self.df.sort_values('scraped_at', kind='stable').reset_index(drop=True)
+
+    def count_rows(self):
+        return len(self.df)
+
+    def append(self, df):
+        """Add rows as if the scraper had inserted them"""
+        self.df = pd.concat([self.df, _parse_scraped_at(df.copy())], ignore_index=True)
+        self._sort()
+
+    def ingest(self, df):
+        # Stands in for the database, so pushed rows are stored here
+        self.append(df)
+        return len(df)
+
+    def _range(self, start, end):
+        """Positions of rows inside the range (rows are kept sorted by time)"""
+        if self.df.empty or 'scraped_at' not in self.df.columns:
+            return np.arange(0)
+        times = to_ns(self.df['scraped_at'])
+        lo = 0 if start is None else np.searchsorted(times, _utc(start).value, side='left')
+        hi = len(times) if end is None else np.searchsorted(times, _utc(end).value, side='right')
+        return np.arange(lo, hi)
+
+    def fetch_page(self, start=None, end=None, columns=None, descending=False, offset=0, limit=None):
+        positions = self._range(start, end)
+        if descending:
+            positions = positions[::-1]
+        positions = positions[offset:offset + limit if limit else None]
+        page = self.df.iloc[positions]
+        if columns:
+            page = page[[col for col in columns if col in page.columns]]
+        return page.reset_index(drop=True)
+
+    def delete_range(self, start, end):
+        positions = self._range(start, end)
+        self.df = self.df.drop(index=positions).reset_index(drop=True)
+        return len(positions)
+
+
+class ParquetBackend(StockDataBackend):
+    """Local Parquet mirror partitioned by trading session date
+
+    Layout: ``<root>/session_date=YYYY-MM-DD/*.parquet``. Range reads prune
+    partitions by date before filtering rows on ``scraped_at``. Files are
+    written under a dot-prefixed name and renamed into place, so readers
+    never see a partial file.
+    """
+
+    name = 'parquet'
+    page_size = 100000
+
+    def __init__(self, root, compression='snappy'):
+        self.root = root
+        self.compression = compression
+
+    @staticmethod
+    def session_date(timestamps):
+        """Trading session (PKT calendar date) of each timestamp, as strings"""
+        # Formats each distinct day once rather than every row
+        codes, days = pd.factorize(from_ns(to_ns(timestamps), 'Asia/Karachi').normalize())
+        return pd.Series(days.strftime('%Y-%m-%d').to_numpy(dtype=object)[codes], index=timestamps.index)
+
+    def write(self, df, name=None):
+        """Append rows to the mirror, one file per session date"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if df is None or df.empty:
+            return 0
+        df = _parse_scraped_at(df.copy())
+        sessions = self.session_date(df['scraped_at'])
+        written = 0
+        for session, rows in df.groupby(sessions.to_numpy()):
+            directory = os.path.join(self.root, f"session_date={session}")
+            os.makedirs(directory, exist_ok=True)
+            stem = name or f"part-{pd.Timestamp.now(tz='UTC').strftime('%Y%m%dT%H%M%S%f')}"
+            temporary = os.path.join(directory, f".{stem}.parquet.tmp")
+            pq.write_table(pa.Table.from_pandas(rows, preserve_index=False), temporary, compression=self.compression)
+            os.replace(temporary, os.path.join(directory, f"{stem}.parquet"))
+            written += len(rows)
+        return written
+
+    def ingest(self, df):
+        # Keeps the mirror current while the app is subscribed to inserts
+        return self.write(df)
+
+    def sessions(self):
+        """Session dates present in the mirror"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            entry.split('=', 1)[1] for entry in os.listdir(self.root)
+            if entry.startswith('session_date=')
+        )
+
+    def partition(self, session_date):
+        """Directory holding one session's files"""
+        return os.path.join(self.root, f"session_date={pd.Timestamp(session_date).strftime('%Y-%m-%d')}")
+
+    def has_session(self, session_date):
+        """Whether a session has at least one complete file"""
+        directory = self.partition(session_date)
+        return os.path.isdir(directory) and any(
+            entry.endswith('.parquet') and not entry.startswith('.') for entry in os.listdir(directory)
+        )
+
+    def count_rows(self):
+        import pyarrow.dataset as ds
+
+        if not self.sessions():
+            return 0
+        return ds.dataset(self.root, format='parquet', partitioning='hive').count_rows()
+
+    def _read(self, start, end, columns):
+        import pyarrow.dataset as ds
+
+        if not self.sessions():
+            return pd.DataFrame(columns=columns or [])
+
+        import pyarrow as pa
+        partitioning = ds.partitioning(pa.schema([('session_date', pa.string())]), flavor='hive')
+        dataset = ds.dataset(self.root, format='parquet', partitioning=partitioning)
+        condition = None
+        if start is not None:
+            start = _utc(start)
+            condition = ds.field('session_date') >= (start - pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+            condition &= ds.field('scraped_at') >= start
+        if end is not None:
+            end = _utc(end)
+            upper = (ds.field('session_date') <= (end + pd.Timedelta(days=1)).strftime('%Y-%m-%d')) & (ds.field('scraped_at') <= end)
+            condition = upper if condition is None else condition & upper
+
+        wanted = None
+        if columns:
+            wanted = [col for col in dict.fromkeys(list(columns) + ['scraped_at']) if col in dataset.schema.names]
+        table = dataset.to_table(columns=wanted, filter=condition)
+        df = table.to_pandas()
+        if 'session_date' in df.columns and (not columns or 'session_date' not in columns):
+            df = df.drop(columns='session_date')
+        df = _parse_scraped_at(df).sort_values('scraped_at', kind='stable').reset_index(drop=True)
+        return df[[col for col in columns if col in df.columns]] if columns else df
+
+    def fetch(self, start=None, end=None, columns=None, descending=False, limit=None):
+        # One columnar read covers the whole range; no paging round trips needed
+        df = self._read(start, end, columns)
+        if descending:
+            df = df.iloc[::-1].reset_index(drop=True)
+        return df.head(limit) if limit else df
+
+    def fetch_page(self, start=None, end=None, columns=None, descending=False, offset=0, limit=None):
+        df = self.fetch(start, end, columns, descending)
+        return df.iloc[offset:offset + limit if limit else None].reset_index(drop=True)
+
+    def delete_range(self, start, end):
+        # Sessions touched by the range are rewritten without the deleted rows
+        start, end = _utc(start), _utc(end)
+        deleted = 0
+        for session in self.sessions():
+            if not (start - pd.Timedelta(days=1)).strftime('%Y-%m-%d') <= session <= (end + pd.Timedelta(days=1)).strftime('%Y-%m-%d'):
+                continue
+            directory = self.partition(session)
+            files = [os.path.join(directory, entry) for entry in os.listdir(directory)
+                     if entry.endswith('.parquet') and not entry.startswith('.')]
+            rows = _parse_scraped_at(pd.concat([pd.read_parquet(path) for path in files], ignore_index=True)) if files else pd.DataFrame()
+            inside = rows['scraped_at'].between(start, end).to_numpy() if 'scraped_at' in rows.columns else np.zeros(len(rows), dtype=bool)
+            if not inside.any():
+                continue
+            # Kept rows land in place before the old files go
+            kept = os.path.join(directory, 'compacted.parquet')
+            if not inside.all():
+                self.write(rows[~inside], name='compacted')
+            for path in files:
+                if inside.all() or path != kept:
+                    os.remove(path)
+            if inside.all() and not os.listdir(directory):
+                os.rmdir(directory)
+            deleted += int(inside.sum())
+        return deleted
+
+
+def create_backend(kind=None):
+    """Backend selected by PSX_DATA_BACKEND (supabase, parquet, memory or shared)
+
+    Returns None when the chosen backend is not configured.
+    """
+    kind = (kind or os.getenv("PSX_DATA_BACKEND", "supabase")).lower()
+    if kind == 'supabase':
+        return SupabaseBackend.from_env()
+    if kind == 'parquet':
+        return ParquetBackend(os.getenv("PSX_PARQUET_PATH", "data/stock_data"))
+    if kind == 'memory':
+        return MemoryBackend()
+    if kind == 'shared':
+        # Worker processes of the multi-process deployment (see psx.data.loader)
+        from psx.data.shared import SHARED_CACHE_DIR, SharedCacheBackend
+        return SharedCacheBackend(SHARED_CACHE_DIR)
+    raise ValueError(f"Unknown data backend: {kind}")
@@ -0,0 +1,108 @@
+"""Fault-injecting backend for trying the resilience layer locally
+
+Wraps any backend and adds latency, random failures or a full outage to
+every query. Set PSX_FAULTS to enable it in the app, e.g.
+
+    PSX_DATA_BACKEND=memory PSX_FAULTS="latency=3,failure_rate=0.3" streamlit run streamlit_app.py
+
+Keys: latency (seconds added per query), jitter (extra random seconds),
+failure_rate (0-1), outage (1 to fail every query), seed. The settings
+can also be changed on a live instance (``backend.faults.outage = True``).
+"""
+import os
+import random
+import threading
+import time as tm
+
+from psx.data.backends import StockDataBackend
+
+
+class InjectedFault(ConnectionError):
+    """Failure raised on purpose by FaultInjectingBackend"""
+
+
+class FaultSettings:
+    """Mutable fault knobs shared by the wrapper and whoever drives a test"""
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, outage=False, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.outage = outage
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec):
+        """Settings from a "key=value,..." string such as PSX_FAULTS"""
+        values = {}
+        for item in filter(None, (part.strip() for part in spec.split(','))):
+            key, _, value = item.partition('=')
+            key = key.strip()
+            if key not in ('latency', 'jitter', 'failure_rate', 'outage', 'seed'):
+                raise ValueError(f"Unknown fault setting: {key}")
+            if key == 'outage':
+                values[key] = value.strip().lower() in ('1', 'true', 'yes', 'on', '')
+            elif key == 'seed':
+                values[key] = int(value)
+            else:
+                values[key] = float(value)
+        return cls(**values)
+
+    def delay(self):
+        with self._lock:
+            return self.latency + (self.random.uniform(0.0, self.jitter) if self.jitter else 0.0)
+
+    def fails(self):
+        with self._lock:
+            return self.outage or (self.failure_rate > 0 and self.random.random() < self.failure_rate)
+
+
+class FaultInjectingBackend(StockDataBackend):
+    """Backend whose queries are slowed down or fail according to ``faults``"""
+
+    def __init__(self, backend, faults=None):
+        self.backend = backend
+        self.faults = faults or FaultSettings()
+        self.name = backend.name
+        self.page_size = backend.page_size
+        self.batch_store = backend.batch_store
+        self.queries = 0
+        self.injected = 0
+
+    def _inject(self):
+        self.queries += 1
+        delay = self.faults.delay()
+        if delay > 0:
+            tm.sleep(delay)
+        if self.faults.fails():
+            self.injected += 1
+            raise InjectedFault(f"Injected fault in {self.name} query")
+
+    def fetch_page(self, start=None, end=None, columns=None, descending=False, offset=0, limit=None):
+        self._inject()
+        return self.backend.fetch_page(start, end, columns, descending, offset, limit)
+
+    def fetch(self, start=None, end=None, columns=None, descending=False, limit=None):
+        # One fault per range read, however many pages it takes
+        self._inject()
+        return self.backend.fetch(start, end, columns, descending, limit)
+
+    def count_rows(self):
+        self._inject()
+        return self.backend.count_rows()
+
+    def ingest(self, df):
+        return self.backend.ingest(df)
+
+    def delete_range(self, start, end):
+        self._inject()
+        return self.backend.delete_range(start, end)
+
+
+def inject_faults(backend, spec=None):
+    """Wrap a backend when PSX_FAULTS (or ``spec``) is set, else return it unchanged"""
+    spec = spec if spec is not None else os.getenv("PSX_FAULTS", "")
+    if backend is None or not spec.strip():
+        return backend
+    return FaultInjectingBackend(backend, FaultSettings.parse(spec))
@@ -0,0 +1,141 @@
+"""Loader process for the multi-process deployment
+
+The only process that talks to the database. It keeps the newest trading
+sessions in a shared directory of Arrow batch files (``SharedBatchStore``,
+tmpfs by default) and publishes the batch listing there. Streamlit workers
+started with PSX_DATA_BACKEND=shared read batches from those files and
+never query Supabase themselves.
+
+Usage:
+    python -m psx.data.loader [--sessions 3] [--interval 15] [--root /dev/shm/psx-batches]
+
+Then start any number of workers, e.g.
+    PSX_DATA_BACKEND=shared streamlit run streamlit_app.py --server.port 8501
+    PSX_DATA_BACKEND=shared streamlit run streamlit_app.py --server.port 8502
+behind a load balancer with sticky sessions.
+"""
+import argparse
+import threading
+
+import pandas as pd
+
+from psx.data.manager import BATCH_SETTLE, PKT_TZ, DataManager
+from psx.data.projection import BATCH_VIEWS
+from psx.data.shared import SHARED_CACHE_DIR, SharedBatchStore
+from psx.history import batch_bucket
+
+# A trading session is 72 five-minute batches; listings fetch a little more
+SESSION_BATCHES = 80
+
+
+class SharedCacheLoader:
+    """Mirror the newest ``sessions`` trading days into a shared batch store
+
+    Each ``sync`` lists recent batches, loads any session with missing
+    batches with one query (``DataManager.cache_session`` writes settled
+    batches straight into the shared store), publishes batches that are
+    still open as uncovered snapshots and refreshes them until they
+    settle, drops sessions beyond the retention and writes the listing
+    for workers.
+    """
+
+    def __init__(self, data_manager, store, sessions=3):
+        self.data_manager = data_manager
+        self.store = store
+        self.sessions = sessions
+        self._open = set()
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """One pass; returns counts of written and dropped batches"""
+        with self._lock:
+            written = 0
+            batches = self.data_manager.get_available_batches(limit=SESSION_BATCHES * self.sessions)
+            by_session = {}
+            for ts in batches:
+                by_session.setdefault(ts.tz_convert(PKT_TZ).date(), []).append(ts)
+            kept = sorted(by_session, reverse=True)[:self.sessions]
+
+            now = pd.Timestamp.now(tz='UTC')
+            for session_date in kept:
+                buckets = {batch_bucket([ts])[0]: ts for ts in by_session[session_date]}
+                missing = [bucket for bucket in buckets if bucket not in self.store or bucket in self._open]
+                if len(missing) > 2:
+                    written += self.data_manager.cache_session(session_date, views=BATCH_VIEWS)
+                    missing = [bucket for bucket in missing if bucket not in self.store or bucket in self._open]
+
+                for bucket in missing:
+                    df = self.data_manager.get_data_by_timestamp(buckets[bucket], views=BATCH_VIEWS)
+                    if df is None:
+                        continue
+                    written += 1
+                    if now >= bucket + BATCH_SETTLE:
+                        # The manager cached it in the shared store itself
+                        self._open.discard(bucket)
+                        continue
+                    # Open batches are published with no column coverage, so the
+                    # loader and workers treat them as misses and re-read them
+                    self.store.put(bucket, df, frozenset())
+                    self._open.add(bucket)
+
+            keep = {batch_bucket([ts])[0] for session_date in kept for ts in by_session[session_date]}
+            dropped = 0
+            for key in self.store.keys():
+                if key not in keep:
+                    self.store.remove(key)
+                    dropped += 1
+
+            self.store.write_manifest([ts for session_date in kept for ts in by_session[session_date]])
+            return {'written': written, 'dropped': dropped, 'sessions': len(kept)}
+
+    def run(self, interval=15.0, stop=None):
+        """Sync every ``interval`` seconds until ``stop`` is set"""
+        stop = stop or threading.Event()
+        while True:
+            try:
+                result = self.sync()
+                print(f"sync: {result['written']} written, {result['dropped']} dropped, {result['sessions']} session(s)")
+            except Exception as e:
+                print(f"sync failed: {str(e)}")
+            if stop.wait(interval):
+                return
+
+
+def main():
+    from dotenv import load_dotenv
+
+    from psx.data.backends import create_backend
+    from psx.data.resilience import resilient_backend
+    from psx.data.tiering import tiered_backend
+    from psx.realtime import RealtimeListener, create_source
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', default=SHARED_CACHE_DIR)
+    parser.add_argument('--sessions', type=int, default=3)
+    parser.add_argument('--interval', type=float, default=15.0)
+    args = parser.parse_args()
+
+    load_dotenv()
+    backend = tiered_backend(resilient_backend(create_backend()))
+    if backend is None or backend.name == 'shared':
+        raise SystemExit("The loader needs an upstream backend (supabase, parquet or memory), not 'shared'")
+
+    store = SharedBatchStore(args.root, writable=True)
+    data_manager = DataManager(backend, on_error=print, batch_store=store)
+    loader = SharedCacheLoader(data_manager, store, sessions=args.sessions)
+
+    # Pushed batches land in the shared store via ingest_batch; republish the listing
+    source = create_source()
+    if source is not None:
+        listener = RealtimeListener(data_manager, source).start()
+        listener.subscribe(lambda batch_time, df: loader.sync())
+
+    print(f"Loading {args.sessions} session(s) from {backend.name} into {args.root} every {args.interval:g}s")
+    try:
+        loader.run(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,564 @@
+import threading
+import time as tm
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from contextlib import contextmanager
+from datetime import datetime, timedelta, time
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from psx.data.projection import (
+    BATCH_VIEWS,
+    DISPLAY_COLUMNS,
+    payload_bytes,
+    stored_columns,
+    view_columns,
+)
+from psx.data.resilience import CircuitOpenError
+from psx.data.store import CompressedBatchStore
+from psx.history import BATCH_FREQ, BATCH_SETTLE, batch_bucket
+from psx.quality import validate_batch
+from psx.timestamps import PKT_TZ, floor_ns, from_ns, to_ns, utc_series
+from psx.topk import TopKEngine
+
+# Constants
+TRADING_START = time(9, 30)  # 9:30 AM
+TRADING_END = time(15, 30)   # 3:30 PM
+
+# Open (unsettled) batches kept as the last good copy while they refresh
+RECENT_BATCHES = 8
+
+
+def _parse_rows(rows):
+    """Pushed rows (dicts or a frame) with scraped_at as UTC timestamps"""
+    df = rows.copy() if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+    if 'scraped_at' in df.columns:
+        df['scraped_at'] = utc_series(df['scraped_at'])
+    return df
+
+
+class DataManager:
+    """Fetches, validates and caches PSX batches from a pluggable backend
+
+    One instance is shared by all sessions of an app. Completed batches are
+    kept in a ``CompressedBatchStore`` (recent ones as DataFrames, older ones
+    compressed), batch listings in a short TTL cache, and every
+    operation is timed so the apps and benchmarks can report on it.
+    Queries request only the columns of the views being rendered (see
+    ``psx.data.projection``) rather than every stored column.
+    Backends that come with a shared batch store (the multi-process
+    deployment) supply it as the cache.
+    ``on_error`` receives user-facing error messages (the apps pass
+    ``st.error``); failed calls return None or an empty list.
+
+    Batch listings and open batches are served stale-while-revalidate:
+    once a listing expires (or an open batch has been fetched before) the
+    last good copy is returned and refreshed in the background, waiting at
+    most ``revalidate_wait`` seconds for a fresher answer. During an outage
+    (see ``psx.data.resilience``) pages keep rendering from these copies
+    and ``health`` reports how old the data is.
+    """
+
+    def __init__(self, backend, on_error=None, batch_store=None, list_ttl=30.0, revalidate_wait=0.25):
+        self.backend = backend
+        self.on_error = on_error
+        if batch_store is None:
+            batch_store = getattr(backend, 'batch_store', None) or CompressedBatchStore(max_cold=1024)
+        self.batches = batch_store
+        self.list_ttl = list_ttl
+        self.revalidate_wait = revalidate_wait
+        self.stats = {}
+        self.last_success = None
+        self.last_failure = None
+        self._lists = {}
+        self._recent = OrderedDict()
+        self._refreshing = {}
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='revalidate')
+        self._schema = None
+        self._lock = threading.RLock()
+
+    def _report(self, message):
+        if self.on_error is not None:
+            self.on_error(message)
+
+    def _failure(self, message, error):
+        """Report a failed call, except refusals by an open circuit breaker
+
+        Those are shown once by the data-age indicator rather than as an
+        error per call.
+        """
+        if not isinstance(error, CircuitOpenError):
+            self._report(f"{message}: {str(error)}")
+
+    @contextmanager
+    def _timed(self, operation):
+        """Record calls, rows returned and wall time for an operation"""
+        record = {'rows': 0, 'cache_hit': False}
+        started = tm.perf_counter()
+        try:
+            yield record
+            if not record['cache_hit']:
+                self.last_success = tm.time()
+        except Exception as e:
+            self.last_failure = (tm.time(), str(e))
+            raise
+        finally:
+            elapsed = tm.perf_counter() - started
+            with self._lock:
+                stats = self.stats.setdefault(operation, {'calls': 0, 'cache_hits': 0, 'rows': 0, 'seconds': 0.0})
+                stats['calls'] += 1
+                stats['cache_hits'] += int(record['cache_hit'])
+                stats['rows'] += record['rows']
+                stats['seconds'] += elapsed
+
+    def instrumentation(self):
+        """Per-operation call counts, cache hits, rows and timings"""
+        with self._lock:
+            frame = pd.DataFrame.from_dict(self.stats, orient='index')
+        if not frame.empty:
+            frame['avg_ms'] = frame['seconds'] / frame['calls'] * 1000.0
+        return frame
+
+    @staticmethod
+    def _to_pkt(df):
+        """Convert scraped_at to PKT for display code"""
+        if df is not None and 'scraped_at' in df.columns:
+            df['scraped_at'] = df['scraped_at'].dt.tz_convert(PKT_TZ)
+        return df
+
+    @staticmethod
+    def session_bounds(session_date):
+        """UTC start and end of the trading session on a date"""
+        trading_start = PKT_TZ.localize(datetime.combine(session_date, TRADING_START))
+        trading_end = PKT_TZ.localize(datetime.combine(session_date, TRADING_END))
+        return trading_start.astimezone(pytz.UTC), trading_end.astimezone(pytz.UTC)
+
+    def test_connection(self):
+        """Test backend connectivity and data availability"""
+        if self.backend is None:
+            return False, "No data backend configured"
+        with self._timed('test_connection'):
+            return self.backend.ping()
+
+    def count_rows(self):
+        """Total stored rows according to the backend"""
+        with self._timed('count_rows'):
+            return self.backend.count_rows()
+
+    def sample_row(self):
+        """One raw row, for inspecting the table layout"""
+        try:
+            with self._timed('sample_row') as record:
+                df = self.backend.fetch(limit=1)
+                record['rows'] = len(df)
+            return None if df.empty else df.iloc[0].to_dict()
+        except Exception as e:
+            self._failure("Error", e)
+            return None
+
+    def table_columns(self):
+        """Column names stored by the backend (from one sample row, cached)"""
+        with self._lock:
+            if self._schema is not None:
+                return self._schema
+        sample = self.backend.fetch(limit=1)
+        if sample.empty:
+            return None
+        with self._lock:
+            self._schema = list(sample.columns)
+            return self._schema
+
+    def query_columns(self, views=BATCH_VIEWS, ingest=True):
+        """Stored columns to request for a set of views"""
+        return stored_columns(view_columns(views, ingest), self.table_columns())
+
+    def projection_report(self, target_timestamp, views=None, tolerance=timedelta(minutes=2)):
+        """Bytes transferred for one batch with every column vs per view
+
+        Fetches the batch around ``target_timestamp`` once with all columns
+        and once per view (and for the combined batch page), reporting the
+        JSON payload size of each.
+        """
+        target = self._localize(target_timestamp)
+        start, end = target - tolerance, target + tolerance
+        full = self.backend.fetch(start, end)
+        full_bytes = payload_bytes(full)
+
+        views = views or list(BATCH_VIEWS) + ['history']
+        rows = [{'view': 'all columns', 'columns': len(full.columns), 'rows': len(full), 'bytes': full_bytes}]
+        for label, selection in [(view, (view,)) for view in views] + [('batch page', BATCH_VIEWS)]:
+            columns = self.query_columns(selection)
+            projected = self.backend.fetch(start, end, columns=columns)
+            rows.append({'view': label, 'columns': len(columns), 'rows': len(projected), 'bytes': payload_bytes(projected)})
+
+        report = pd.DataFrame(rows)
+        report['bytes_per_row'] = report['bytes'] / report['rows'].clip(lower=1)
+        report['vs_all'] = report['bytes'] / max(full_bytes, 1)
+        return report
+
+    def get_all_data(self, limit=1000, views=BATCH_VIEWS):
+        """Get the most recent rows without time filters"""
+        try:
+            with self._timed('get_all_data') as record:
+                df = self.backend.fetch(columns=self.query_columns(views), descending=True, limit=limit)
+                record['rows'] = len(df)
+            if df.empty:
+                return None
+            # Validate once at ingest (several batches may be present)
+            return self._validate_batches(df)
+        except Exception as e:
+            self._failure("Error fetching all data", e)
+            return None
+
+    def get_latest_trading_data(self, limit=1000, views=BATCH_VIEWS):
+        """Get the latest data within trading hours (9:30 AM - 3:30 PM PKT)"""
+        try:
+            now_pkt = datetime.now(PKT_TZ)
+            current_time = now_pkt.time()
+
+            # If outside trading hours, use the last trading day's data
+            if current_time < TRADING_START or current_time > TRADING_END:
+                target_date = (now_pkt - timedelta(days=1)).date()
+            else:
+                target_date = now_pkt.date()
+
+            start, end = self.session_bounds(target_date)
+            with self._timed('get_latest_trading_data') as record:
+                df = self.backend.fetch(start, end, columns=self.query_columns(views), descending=True, limit=limit)
+                record['rows'] = len(df)
+            if df.empty:
+                return None
+            return self._validate_batches(df)
+        except Exception as e:
+            self._failure("Error fetching trading data", e)
+            return None
+
+    def get_available_batches(self, start=None, end=None, limit=None):
+        """Batch timestamps (PKT, newest first) on the 5-minute scraper grid
+
+        Rows are grouped by 5-minute bucket and each batch is represented by
+        its latest ``scraped_at``. Timestamps are paged newest-first and
+        paging stops once ``limit`` batches are known. An expired listing is
+        served stale while it refreshes.
+        """
+        key = ('batches', start, end, limit)
+        with self._lock:
+            cached = self._lists.get(key)
+        if cached is not None:
+            self._timed_hit('get_available_batches')
+            if cached[0] > tm.monotonic():
+                return list(cached[1])
+            fresh = self._revalidate(key, self._list_batches, start, end, limit)
+            return list(fresh if fresh is not None else cached[1])
+
+        try:
+            return list(self._list_batches(start, end, limit))
+        except Exception as e:
+            self._failure("Error fetching available batches", e)
+            return []
+
+    def _list_batches(self, start, end, limit):
+        latest = {}
+        with self._timed('get_available_batches') as record:
+            for page in self.backend.iter_pages(start, end, columns=self.query_columns(('batches',), ingest=False), descending=True):
+                record['rows'] += len(page)
+                # Buckets and maxima on int64 UTC nanoseconds
+                times = to_ns(page['scraped_at'])
+                representatives = pd.Series(times).groupby(floor_ns(times, BATCH_FREQ)).max()
+                for bucket, ts in representatives.items():
+                    if bucket not in latest or ts > latest[bucket]:
+                        latest[bucket] = ts
+                # Pages are newest-first; the oldest bucket may continue on the next page
+                if limit and len(latest) > limit:
+                    break
+
+        batches = sorted(latest.values(), reverse=True)
+        batches = list(from_ns(batches[:limit] if limit else batches, PKT_TZ))
+        with self._lock:
+            self._lists[('batches', start, end, limit)] = (tm.monotonic() + self.list_ttl, batches)
+        return batches
+
+    def _revalidate(self, key, refresh, *args):
+        """Refresh in the background (once per key); the result if it is ready in time
+
+        Returns None when the refresh is still running after
+        ``revalidate_wait`` seconds or failed, so the caller serves its
+        stale copy.
+        """
+        with self._lock:
+            future = self._refreshing.get(key)
+            if future is None:
+                future = self._refresher.submit(refresh, *args)
+                self._refreshing[key] = future
+                future.add_done_callback(lambda _: self._refreshed(key, future))
+        try:
+            return future.result(timeout=self.revalidate_wait)
+        except FuturesTimeout:
+            return None
+        except Exception:
+            return None
+
+    def _refreshed(self, key, future):
+        with self._lock:
+            if self._refreshing.get(key) is future:
+                del self._refreshing[key]
+
+    def health(self):
+        """Circuit state and age of the newest data from the backend"""
+        breaker = getattr(self.backend, 'breaker', None)
+        with self._lock:
+            refreshing = len(self._refreshing)
+        return {
+            'state': breaker.state if breaker is not None else 'closed',
+            'retry_in': breaker.retry_in() if breaker is not None else 0.0,
+            'age': tm.time() - self.last_success if self.last_success is not None else None,
+            'last_error': breaker.last_error if breaker is not None else (self.last_failure[1] if self.last_failure is not None else None),
+            'refreshing': refreshing,
+        }
+
+    def get_session_batches(self, session_date=None):
+        """Batches of a trading session (default today, falling back to yesterday)"""
+        if session_date is not None:
+            return self.get_available_batches(*self.session_bounds(session_date))
+
+        today_pkt = datetime.now(PKT_TZ).date()
+        batches = self.get_available_batches(*self.session_bounds(today_pkt))
+        if not batches:
+            # Try yesterday if no data today
+            batches = self.get_available_batches(*self.session_bounds(today_pkt - timedelta(days=1)))
+        return batches
+
+    def _timed_hit(self, operation):
+        with self._timed(operation) as record:
+            record['cache_hit'] = True
+
+    def _cache_batch(self, bucket, df, views, complete=False):
+        """Keep completed batches in the batch store, with the columns they cover"""
+        if not complete and pd.Timestamp.now(tz='UTC') < bucket + BATCH_SETTLE:
+            return
+        self.batches.put(bucket, df, meta=frozenset(view_columns(views)))
+
+    def cached_batch(self, target_timestamp, views=BATCH_VIEWS):
+        """Batch from the cache without touching the backend, or None
+
+        A cached batch fetched without some of the columns the views need
+        is a miss.
+        """
+        bucket = batch_bucket([self._localize(target_timestamp)])[0]
+        entry = self.batches.get(bucket)
+        if entry is None or not entry[1].issuperset(view_columns(views)):
+            return None
+        return entry[0]
+
+    def has_batch(self, target_timestamp, views=BATCH_VIEWS):
+        """Whether the batch is cached with the columns of ``views`` (no decoding)"""
+        bucket = batch_bucket([self._localize(target_timestamp)])[0]
+        covered = self.batches.meta(bucket)
+        return covered is not None and covered.issuperset(view_columns(views))
+
+    @staticmethod
+    def _localize(timestamp):
+        """Timestamps without a timezone are taken to be PKT"""
+        timestamp = pd.Timestamp(timestamp)
+        if timestamp.tzinfo is None:
+            timestamp = pd.Timestamp(PKT_TZ.localize(timestamp.to_pydatetime()))
+        return timestamp
+
+    def get_data_by_timestamp(self, target_timestamp, previous=None, tolerance=timedelta(minutes=2), views=BATCH_VIEWS):
+        """Get the batch closest to a timestamp (within ``tolerance``)
+
+        ``previous`` is the prior batch, used to flag stale rows during
+        validation. Only the columns of ``views`` are fetched. Completed
+        batches are served from the cache; open batches fetched before are
+        served stale while they refresh.
+        """
+        try:
+            target = self._localize(target_timestamp)
+            cached = self.cached_batch(target, views)
+            if cached is not None:
+                self._timed_hit('get_data_by_timestamp')
+                return cached
+
+            bucket = batch_bucket([target])[0]
+            with self._lock:
+                recent = self._recent.get(bucket)
+            if recent is not None and recent[1].issuperset(view_columns(views)):
+                self._timed_hit('get_data_by_timestamp')
+                key = ('batch', bucket, tuple(views))
+                fresh = self._revalidate(key, self._fetch_batch, target, previous, tolerance, views)
+                return fresh if fresh is not None else recent[0]
+
+            return self._fetch_batch(target, previous, tolerance, views)
+        except Exception as e:
+            self._failure("Error fetching data by timestamp", e)
+            return None
+
+    def _fetch_batch(self, target, previous, tolerance, views):
+        with self._timed('get_data_by_timestamp') as record:
+            window = self.backend.fetch(target - tolerance, target + tolerance, columns=self.query_columns(views))
+            record['rows'] = len(window)
+        if window.empty:
+            return None
+
+        # Keep the 5-minute batch of the row closest to the target
+        times = to_ns(window['scraped_at'])
+        buckets = floor_ns(times, BATCH_FREQ)
+        closest = buckets[np.abs(times - target.value).argmin()]
+        bucket = from_ns([closest])[0]
+        df = window[buckets == closest].reset_index(drop=True)
+
+        # Validate once at ingest so display code can trust dtypes
+        df = validate_batch(self._to_pkt(df), previous=previous)
+        self._cache_batch(bucket, df, views)
+        with self._lock:
+            if bucket in self.batches:
+                self._recent.pop(bucket, None)
+            else:
+                # Still open: keep it as the last good copy
+                self._recent[bucket] = (df, frozenset(view_columns(views)))
+                self._recent.move_to_end(bucket)
+                while len(self._recent) > RECENT_BATCHES:
+                    self._recent.popitem(last=False)
+        return df
+
+    def cache_session(self, session_date, views=BATCH_VIEWS):
+        """Load every batch of a session into the batch store with one query
+
+        Each batch is validated against the one before it, as individual
+        loads are. Returns the number of batches cached (unsettled batches
+        are validated but not cached).
+        """
+        try:
+            start, end = self.session_bounds(session_date)
+            with self._timed('cache_session') as record:
+                df = self.backend.fetch(start, end, columns=self.query_columns(views))
+                record['rows'] = len(df)
+            if df.empty:
+                return 0
+
+            df = self._to_pkt(df)
+            buckets = batch_bucket(df['scraped_at'])
+            previous = None
+            cached = 0
+            for bucket, rows in df.groupby(buckets, sort=True):
+                batch = validate_batch(rows.reset_index(drop=True), previous=previous)
+                self._cache_batch(bucket, batch, views)
+                cached += int(bucket in self.batches)
+                previous = batch
+            return cached
+        except Exception as e:
+            self._failure("Error caching session", e)
+            return 0
+
+    def ingest_batch(self, rows, views=BATCH_VIEWS):
+        """Take a complete batch pushed by the realtime listener
+
+        The rows are passed to the backend (local stores keep them), merged
+        with any rows already cached for the batch, validated against the
+        preceding batch and cached. Batch listings are invalidated.
+        """
+        try:
+            with self._timed('ingest_batch') as record:
+                df = _parse_rows(rows)
+                record['rows'] = len(df)
+                if df.empty:
+                    return None
+                self.backend.ingest(df)
+
+                bucket = batch_bucket([df['scraped_at'].max()])[0]
+                cached = self.batches.get(bucket)
+                if cached is not None:
+                    df = pd.concat([cached[0].drop(columns='quality_flags', errors='ignore'), self._to_pkt(df)], ignore_index=True)
+                previous = self.batches.get(bucket - pd.Timedelta(BATCH_FREQ))
+                df = validate_batch(self._to_pkt(df), previous=previous[0] if previous else None)
+                self._cache_batch(bucket, df, views, complete=True)
+
+            with self._lock:
+                self._lists.clear()
+            return df
+        except Exception as e:
+            self._failure("Error ingesting pushed batch", e)
+            return None
+
+    def get_session_data(self, session_date, since=None, views=('history',)):
+        """Get every row scraped during one trading session
+
+        ``since`` restricts the fetch to rows newer than what the caller
+        already holds. Only the columns of ``views`` are fetched. Errors are
+        reported and give None, like a session without rows; use
+        ``load_session_data`` to tell the two apart.
+        """
+        try:
+            return self.load_session_data(session_date, since, views)
+        except Exception as e:
+            self._failure("Error fetching session data", e)
+            return None
+
+    def load_session_data(self, session_date, since=None, views=('history',)):
+        """``get_session_data`` that raises on errors (None only when the session has no rows)"""
+        start, end = self.session_bounds(session_date)
+        if since is not None and pd.Timestamp(since).tz_convert('UTC') > start:
+            start = pd.Timestamp(since).tz_convert('UTC')
+
+        with self._timed('get_session_data') as record:
+            df = self.backend.fetch(start, end, columns=self.query_columns(views))
+            record['rows'] = len(df)
+        if df.empty:
+            return None
+
+        return self._validate_batches(df)
+
+    def _validate_batches(self, df):
+        """Validate rows spanning several batches, grouped by 5-minute bucket
+
+        Rows of one batch are scraped seconds apart, so duplicates and stale
+        rows are matched per bucket rather than per exact ``scraped_at``.
+        """
+        df = self._to_pkt(df)
+        df['batch'] = batch_bucket(df['scraped_at'])
+        return validate_batch(df, batch_column='batch').drop(columns='batch')
+
+    @staticmethod
+    def format_data_for_display(df):
+        """Format the DataFrame to show only 11 relevant columns"""
+        if df is None or df.empty:
+            return df
+
+        # Only rename columns that exist (names are canonical after validate_batch)
+        rename_dict = {k: v for k, v in DISPLAY_COLUMNS.items() if k in df.columns}
+        display_df = df.rename(columns=rename_dict)
+
+        # Only include columns that exist, in CSV order
+        existing_columns = [col for col in DISPLAY_COLUMNS.values() if col in display_df.columns]
+        return display_df[existing_columns]
+
+    @staticmethod
+    def calculate_market_metrics(df, engine=None):
+        """Calculate market metrics from the data
+
+        ``engine`` is the batch's TopKEngine when the caller already has one.
+        """
+        if df is None or df.empty:
+            return {}
+
+        # Numeric dtypes are guaranteed by validate_batch at ingest
+        has_change = 'change_percent' in df.columns
+        metrics = {
+            'total_stocks': len(df),
+            'gainers': int((df['change_percent'] > 0).sum()) if has_change else 0,
+            'losers': int((df['change_percent'] < 0).sum()) if has_change else 0,
+            'unchanged': int((df['change_percent'] == 0).sum()) if has_change else 0,
+            'total_volume': df['volume'].sum() if 'volume' in df.columns else 0,
+            'avg_change': df['change_percent'].mean() if has_change else 0,
+        }
+
+        # Top performers come from the top-K engine for this batch
+        engine = engine if engine is not None else TopKEngine(df)
+        metrics['top_gainer'] = engine.leader('change_pct')
+        metrics['top_loser'] = engine.leader('change_pct', largest=False)
+        metrics['most_active'] = engine.leader('volume')
+
+        return metrics
@@ -0,0 +1,68 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from psx.history import batch_bucket
+
+
+class BatchPreloader:
+    """Warms a DataManager's batch store ahead of the time-travel slider
+
+    ``warm_session`` loads a whole session with one query in the
+    background; ``prefetch`` fetches the batches next to the one on screen
+    that are not cached (after eviction, or while the session is warming).
+    Requests already in flight are not submitted twice. ``load`` fetches
+    one batch (default ``get_data_by_timestamp``, without a previous batch
+    to flag stale rows against); pass the loader used on demand so
+    prefetched batches carry the same quality flags.
+    """
+
+    def __init__(self, data_manager, max_workers=2, load=None):
+        self.data_manager = data_manager
+        self.load = load or data_manager.get_data_by_timestamp
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch-preload')
+        self._inflight = {}
+        self._warmed = set()
+        self._lock = threading.Lock()
+
+    def _submit(self, key, func, *args):
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None and not future.done():
+                return future
+            future = self.executor.submit(func, *args)
+            self._inflight[key] = future
+        future.add_done_callback(lambda _: self._forget(key, future))
+        return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def warm_session(self, session_date):
+        """Background load of every batch of a session (one query, once)
+
+        Batches that land later are picked up by ``prefetch``.
+        """
+        with self._lock:
+            if session_date in self._warmed:
+                return None
+            self._warmed.add(session_date)
+        return self._submit(('session', session_date), self.data_manager.cache_session, session_date)
+
+    def prefetch(self, batches, index, radius=2):
+        """Background load of uncached batches within ``radius`` of ``index``"""
+        futures = []
+        for position in range(max(index - radius, 0), min(index + radius + 1, len(batches))):
+            if position == index:
+                continue
+            batch_time = batches[position]
+            if self.data_manager.has_batch(batch_time):
+                continue
+            key = ('batch', batch_bucket([batch_time])[0])
+            futures.append(self._submit(key, self.load, batch_time))
+        return futures
+
+    def pending(self):
+        with self._lock:
+            return len(self._inflight)
@@ -0,0 +1,79 @@
+from psx.history import HISTORY_FIELDS
+from psx.quality import COLUMN_ALIASES
+from psx.search import NAME_COLUMNS
+
+# The 11 columns shown in the data table, with their display names (CSV order)
+DISPLAY_COLUMNS = {
+    'symbol': 'Symbol',
+    'sector': 'Sector',
+    'listed_in': 'Listed_In',
+    'ldcp': 'LDCP',
+    'open_price': 'Open',
+    'high': 'High',
+    'low': 'Low',
+    'current_price': 'Current',
+    'change': 'Change',
+    'change_percent': 'Change(%)',
+    'volume': 'Volume'
+}
+
+# Columns validate_batch reads on every fetch (dedup, OHLC, volume and stale checks)
+INGEST_COLUMNS = ('symbol', 'scraped_at', 'open_price', 'high', 'low', 'current_price', 'volume')
+
+# Columns only some scraper versions store; requested when the table has them
+OPTIONAL_COLUMNS = NAME_COLUMNS
+
+# Canonical columns each view of the apps reads from a batch (the table
+# also feeds the symbol search its company names)
+VIEW_COLUMNS = {
+    'table': tuple(DISPLAY_COLUMNS) + NAME_COLUMNS,
+    'metrics': ('symbol', 'sector', 'current_price', 'high', 'low', 'change_percent', 'volume'),
+    'charts': ('symbol', 'sector', 'current_price', 'change_percent', 'volume'),
+    'history': ('symbol', 'scraped_at') + HISTORY_FIELDS,
+    'batches': ('scraped_at',),
+}
+
+# What a batch page renders: the table, the metric cards and the charts
+BATCH_VIEWS = ('table', 'metrics', 'charts')
+
+
+def view_columns(views, ingest=True):
+    """Canonical columns needed by a set of views (plus validation inputs)"""
+    columns = list(INGEST_COLUMNS) if ingest else []
+    for view in views:
+        if view not in VIEW_COLUMNS:
+            raise ValueError(f"Unknown view: {view}")
+        columns.extend(VIEW_COLUMNS[view])
+    return list(dict.fromkeys(columns))
+
+
+def stored_columns(columns, available):
+    """Map canonical names to the names the table actually stores
+
+    Older scraper versions stored some columns under an alias (``open``,
+    ``change_pct``...); those are requested instead and renamed back by
+    ``normalize_schema``. Columns the table lacks are left out. With an
+    unknown table layout (``available`` is None) the canonical names are
+    used, without the optional ones.
+    """
+    if available is None:
+        return [column for column in columns if column not in OPTIONAL_COLUMNS]
+    available = set(available)
+    aliases = {}
+    for alias, canonical in COLUMN_ALIASES.items():
+        aliases.setdefault(canonical, []).append(alias)
+
+    selected = []
+    for column in columns:
+        if column in available:
+            selected.append(column)
+        else:
+            selected.extend(alias for alias in aliases.get(column, []) if alias in available)
+    return list(dict.fromkeys(selected))
+
+
+def payload_bytes(df):
+    """Size of rows encoded as a JSON records array, as PostgREST sends them"""
+    if df is None or df.empty:
+        return 2
+    return len(df.to_json(orient='records', date_format='iso').encode('utf-8'))
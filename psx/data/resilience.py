@@ -0,0 +1,162 @@
+import os
+import threading
+import time as tm
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+
+from psx.data.backends import StockDataBackend
+
+# Per-query time limit (seconds) and circuit breaker settings
+QUERY_TIMEOUT = float(os.getenv("PSX_QUERY_TIMEOUT", "10"))
+BREAKER_FAILURES = int(os.getenv("PSX_BREAKER_FAILURES", "3"))
+BREAKER_RESET = float(os.getenv("PSX_BREAKER_RESET", "30"))
+
+
+class QueryTimeout(Exception):
+    """A backend query did not finish within the time limit"""
+
+
+class CircuitOpenError(Exception):
+    """The backend is failing; queries are refused until the breaker resets"""
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over consecutive failures
+
+    After ``failures`` consecutive failures the breaker opens and refuses
+    calls for ``reset_after`` seconds. It then lets a single trial call
+    through (half-open): success closes it, failure opens it again.
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, reset_after=BREAKER_RESET):
+        self.failures = failures
+        self.reset_after = reset_after
+        self.state = 'closed'
+        self.consecutive = 0
+        self.opened_at = None
+        self.trips = 0
+        self.last_error = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go to the backend now"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and tm.monotonic() - self.opened_at >= self.reset_after:
+                self.state = 'half-open'
+                self._trial = False
+            if self.state == 'half-open' and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.consecutive = 0
+            self._trial = False
+
+    def record_failure(self, error):
+        with self._lock:
+            self.consecutive += 1
+            self.last_error = str(error) or type(error).__name__
+            if self.state == 'half-open' or self.consecutive >= self.failures:
+                if self.state != 'open':
+                    self.trips += 1
+                self.state = 'open'
+                self.opened_at = tm.monotonic()
+                self._trial = False
+
+    def retry_in(self):
+        """Seconds until an open breaker lets a trial call through (0 otherwise)"""
+        with self._lock:
+            if self.state != 'open':
+                return 0.0
+            return max(self.reset_after - (tm.monotonic() - self.opened_at), 0.0)
+
+    def status(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive,
+                'trips': self.trips,
+                'last_error': self.last_error,
+            }
+
+
+class ResilientBackend(StockDataBackend):
+    """Wraps a backend with per-query timeouts and a circuit breaker
+
+    Each backend call (a page, a whole ``fetch`` for backends that read
+    ranges directly, a count or ping) runs on a worker thread and is
+    abandoned after ``timeout`` seconds with ``QueryTimeout``. Failures and
+    timeouts count towards the breaker; while it is open calls fail at once
+    with ``CircuitOpenError`` instead of waiting on a database that is down.
+    """
+
+    def __init__(self, backend, timeout=QUERY_TIMEOUT, breaker=None, max_workers=8):
+        self.backend = backend
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.name = backend.name
+        self.page_size = backend.page_size
+        self.batch_store = backend.batch_store
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='backend-query')
+
+    def _call(self, func, *args, **kwargs):
+        if not self.breaker.allow():
+            raise CircuitOpenError(
+                f"{self.name} unavailable ({self.breaker.last_error}); retrying in {self.breaker.retry_in():.0f}s"
+            )
+        future = self.executor.submit(func, *args, **kwargs)
+        try:
+            result = future.result(timeout=self.timeout)
+        except FuturesTimeout:
+            # The query keeps its worker thread until it returns; its result is dropped
+            error = QueryTimeout(f"{self.name} query exceeded {self.timeout:g}s")
+            self.breaker.record_failure(error)
+            raise error from None
+        except Exception as e:
+            self.breaker.record_failure(e)
+            raise
+        self.breaker.record_success()
+        return result
+
+    def fetch_page(self, start=None, end=None, columns=None, descending=False, offset=0, limit=None):
+        return self._call(self.backend.fetch_page, start, end, columns, descending, offset, limit)
+
+    def fetch(self, start=None, end=None, columns=None, descending=False, limit=None):
+        if type(self.backend).fetch is StockDataBackend.fetch:
+            # Paged backends: each page is one guarded query
+            return StockDataBackend.fetch(self, start, end, columns, descending, limit)
+        return self._call(self.backend.fetch, start, end, columns, descending, limit)
+
+    def count_rows(self):
+        return self._call(self.backend.count_rows)
+
+    def ingest(self, df):
+        return self.backend.ingest(df)
+
+    def delete_range(self, start, end):
+        return self._call(self.backend.delete_range, start, end)
+
+    def ping(self):
+        try:
+            return self._call(self.backend.ping)
+        except Exception as e:
+            return False, f"Connection error: {str(e)}"
+
+
+def resilient_backend(backend):
+    """Backend guarded by timeouts and a circuit breaker (None stays None)
+
+    Faults from PSX_FAULTS are injected underneath the guard, so the
+    resilience layer can be exercised against a local backend.
+    """
+    if backend is None:
+        return None
+    from psx.data.faults import inject_faults
+
+    return ResilientBackend(inject_faults(backend))
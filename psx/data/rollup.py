@@ -0,0 +1,375 @@
+"""End-of-day rollup of raw 5-minute snapshots into a compact daily store
+
+Once a session closes, every symbol's snapshots for the day are reduced to
+one row (open, high, low, close, LDCP, change, volume, VWAP, turnover) and
+the market to one breadth row. Rows go to a local Parquet store and,
+optionally, to Supabase, so multi-month views read one row per symbol per
+day instead of rescanning raw snapshots. Days already in the local store
+are skipped, so the job is cheap to run repeatedly.
+
+Usage:
+    python -m psx.data.rollup [--days 10] [--root data/daily] [--supabase] [--watch] [--interval 300]
+
+With --supabase the rows are upserted into these tables first:
+
+    create table daily_summary (
+        session_date date, symbol text, sector text, listed_in text,
+        open double precision, high double precision, low double precision,
+        close double precision, ldcp double precision, change double precision,
+        change_pct double precision, volume double precision, vwap double precision,
+        turnover double precision, batches integer,
+        primary key (session_date, symbol)
+    );
+    create table daily_breadth (
+        session_date date primary key, symbols integer, advances integer,
+        declines integer, unchanged integer, up_volume double precision,
+        down_volume double precision, total_volume double precision,
+        turnover double precision, batches integer,
+        first_batch timestamptz, last_batch timestamptz
+    );
+"""
+import argparse
+import math
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from psx.data.manager import BATCH_SETTLE, PKT_TZ, TRADING_END
+from psx.history import SessionHistory
+from psx.indicators import forward_fill
+
+# Local daily store and the optional Supabase tables
+ROLLUP_PATH = os.getenv("PSX_ROLLUP_PATH", "data/daily")
+ROLLUP_TABLE = os.getenv("PSX_ROLLUP_TABLE", "daily_summary")
+BREADTH_TABLE = os.getenv("PSX_BREADTH_TABLE", "daily_breadth")
+
+# Raw columns a rollup reads (see psx.data.projection)
+ROLLUP_VIEWS = ('table', 'history')
+ROLLUP_FIELDS = ('current_price', 'open_price', 'high', 'low', 'ldcp', 'volume')
+
+DAILY_COLUMNS = [
+    'session_date', 'symbol', 'sector', 'listed_in', 'open', 'high', 'low', 'close', 'ldcp',
+    'change', 'change_pct', 'volume', 'vwap', 'turnover', 'batches',
+]
+BREADTH_COLUMNS = [
+    'session_date', 'symbols', 'advances', 'declines', 'unchanged', 'up_volume', 'down_volume',
+    'total_volume', 'turnover', 'batches', 'first_batch', 'last_batch',
+]
+
+
+def _first(matrix):
+    """First finite value of each row (NaN when there is none)"""
+    valid = np.isfinite(matrix)
+    first = np.argmax(valid, axis=1)
+    values = matrix[np.arange(matrix.shape[0]), first]
+    return np.where(valid.any(axis=1), values, np.nan)
+
+
+def _last(matrix):
+    """Last finite value of each row (NaN when there is none)"""
+    return _first(matrix[:, ::-1])
+
+
+def daily_rollup(rows, session_date):
+    """(per-symbol daily frame, one-row breadth frame) for one session's raw rows
+
+    Snapshots are laid out as symbols x batches matrices and reduced in one
+    vectorized pass. Snapshot volume is the day's cumulative volume, so
+    each batch's traded volume is its increase over the previous snapshot;
+    VWAP and turnover weight each batch's price by that volume.
+    """
+    session = pd.Timestamp(session_date).strftime('%Y-%m-%d')
+    history = SessionHistory.from_frame(rows, fields=[field for field in ROLLUP_FIELDS if field in rows.columns])
+    matrix = {field: history.matrix(field) if field in history.fields else np.full((history.n_symbols, history.n_batches), np.nan)
+              for field in ROLLUP_FIELDS}
+
+    price = matrix['current_price']
+    close = _last(price)
+    open_price = _first(np.where(matrix['open_price'] > 0, matrix['open_price'], np.nan))
+    open_price = np.where(np.isfinite(open_price), open_price, _first(price))
+    # The day's range covers every snapshot price, the reported high/low and the open
+    high = np.fmax(np.fmax(np.fmax.reduce(price, axis=1), np.fmax.reduce(matrix['high'], axis=1)), open_price)
+    low = np.fmin.reduce(np.where(matrix['low'] > 0, matrix['low'], np.nan), axis=1)
+    low = np.fmin(np.fmin(np.fmin.reduce(price, axis=1), low), open_price)
+    ldcp = _last(matrix['ldcp'])
+
+    # Volume traded in each batch, priced at that batch's (last known) price
+    cumulative = np.fmax.accumulate(np.nan_to_num(forward_fill(matrix['volume']), nan=0.0), axis=1)
+    traded = np.diff(cumulative, axis=1, prepend=0.0)
+    value = np.where(traded > 0, traded * np.nan_to_num(forward_fill(price), nan=0.0), 0.0)
+    volume = cumulative[:, -1] if history.n_batches else np.zeros(history.n_symbols)
+    turnover = value.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vwap = np.where(volume > 0, turnover / volume, np.nan)
+        change = close - ldcp
+        change_pct = np.where(ldcp > 0, change / ldcp * 100.0, np.nan)
+
+    labels = rows.drop_duplicates('symbol', keep='last').set_index('symbol').reindex(history.symbols)
+    symbols = pd.DataFrame({
+        'session_date': session,
+        'symbol': history.symbols,
+        'sector': labels['sector'].to_numpy(dtype=object) if 'sector' in labels.columns else None,
+        'listed_in': labels['listed_in'].to_numpy(dtype=object) if 'listed_in' in labels.columns else None,
+        'open': open_price,
+        'high': high,
+        'low': low,
+        'close': close,
+        'ldcp': ldcp,
+        'change': change,
+        'change_pct': change_pct,
+        'volume': volume,
+        'vwap': vwap,
+        'turnover': turnover,
+        'batches': np.isfinite(price).sum(axis=1).astype(np.int64),
+    }, columns=DAILY_COLUMNS)
+    symbols = symbols[symbols['batches'] > 0].reset_index(drop=True)
+
+    advancing = symbols['change_pct'] > 0
+    declining = symbols['change_pct'] < 0
+    batch_times = pd.DatetimeIndex(history.batch_times)
+    breadth = pd.DataFrame([{
+        'session_date': session,
+        'symbols': len(symbols),
+        'advances': int(advancing.sum()),
+        'declines': int(declining.sum()),
+        'unchanged': int((symbols['change_pct'] == 0).sum()),
+        'up_volume': float(symbols.loc[advancing, 'volume'].sum()),
+        'down_volume': float(symbols.loc[declining, 'volume'].sum()),
+        'total_volume': float(symbols['volume'].sum()),
+        'turnover': float(symbols['turnover'].sum()),
+        'batches': history.n_batches,
+        'first_batch': batch_times.min() if len(batch_times) else pd.NaT,
+        'last_batch': batch_times.max() if len(batch_times) else pd.NaT,
+    }], columns=BREADTH_COLUMNS)
+    return symbols, breadth
+
+
+class DailyStore:
+    """Local Parquet store of daily rollups, partitioned by session date
+
+    Layout: ``<root>/symbols/session_date=YYYY-MM-DD/rollup.parquet`` and
+    ``<root>/breadth/session_date=YYYY-MM-DD/breadth.parquet``. Writing a
+    day replaces its files atomically, so re-running a rollup is safe.
+    """
+
+    def __init__(self, root=ROLLUP_PATH):
+        self.root = root
+
+    def _path(self, table, session_date):
+        session = pd.Timestamp(session_date).strftime('%Y-%m-%d')
+        return os.path.join(self.root, table, f"session_date={session}", f"{'rollup' if table == 'symbols' else table}.parquet")
+
+    def sessions(self):
+        """Session dates (YYYY-MM-DD) with a complete rollup"""
+        directory = os.path.join(self.root, 'breadth')
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            entry.split('=', 1)[1] for entry in os.listdir(directory)
+            if entry.startswith('session_date=') and os.path.exists(os.path.join(directory, entry, 'breadth.parquet'))
+        )
+
+    def __contains__(self, session_date):
+        return os.path.exists(self._path('breadth', session_date))
+
+    def write(self, session_date, symbols, breadth):
+        """Store one day's rollup (breadth last, so it marks the day complete)"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        for table, frame in (('symbols', symbols), ('breadth', breadth)):
+            path = self._path(table, session_date)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Dot-prefixed, so dataset reads skip a half-written file
+            temporary = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+            data = pa.Table.from_pandas(frame.drop(columns='session_date'), preserve_index=False)
+            pq.write_table(data, temporary, compression='zstd')
+            os.replace(temporary, path)
+        return len(symbols)
+
+    def _read(self, table, start, end, columns, condition=None):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        directory = os.path.join(self.root, table)
+        if not os.path.isdir(directory) or not os.listdir(directory):
+            return pd.DataFrame(columns=columns or (DAILY_COLUMNS if table == 'symbols' else BREADTH_COLUMNS))
+        partitioning = ds.partitioning(pa.schema([('session_date', pa.string())]), flavor='hive')
+        dataset = ds.dataset(directory, format='parquet', partitioning=partitioning)
+        if start is not None:
+            bound = ds.field('session_date') >= pd.Timestamp(start).strftime('%Y-%m-%d')
+            condition = bound if condition is None else condition & bound
+        if end is not None:
+            bound = ds.field('session_date') <= pd.Timestamp(end).strftime('%Y-%m-%d')
+            condition = bound if condition is None else condition & bound
+        wanted = None
+        if columns:
+            wanted = [col for col in dict.fromkeys(['session_date'] + list(columns)) if col in dataset.schema.names]
+        df = dataset.to_table(columns=wanted, filter=condition).to_pandas()
+        order = DAILY_COLUMNS if table == 'symbols' else BREADTH_COLUMNS
+        df = df[[col for col in order if col in df.columns]]
+        return df.sort_values(['session_date'] + (['symbol'] if 'symbol' in df.columns else []), kind='stable').reset_index(drop=True)
+
+    def read(self, start=None, end=None, symbols=None, columns=None):
+        """Daily rows between two dates (inclusive), optionally for some symbols"""
+        import pyarrow.dataset as ds
+
+        condition = ds.field('symbol').isin([symbol.upper() for symbol in symbols]) if symbols else None
+        return self._read('symbols', start, end, columns, condition)
+
+    def breadth(self, start=None, end=None):
+        """Daily breadth rows between two dates (inclusive)"""
+        return self._read('breadth', start, end, None)
+
+
+class SupabaseRollupTables:
+    """Upserts rollups into the Supabase daily tables (see the module docstring)"""
+
+    def __init__(self, client, table=ROLLUP_TABLE, breadth_table=BREADTH_TABLE, chunk=500):
+        self.client = client
+        self.table = table
+        self.breadth_table = breadth_table
+        self.chunk = chunk
+
+    @classmethod
+    def from_env(cls):
+        """Tables reached through SUPABASE_URL / SUPABASE_KEY, or None when not configured"""
+        from psx.data.backends import SupabaseBackend
+
+        backend = SupabaseBackend.from_env()
+        return cls(backend.client) if backend is not None else None
+
+    @staticmethod
+    def _records(frame):
+        records = []
+        for record in frame.to_dict('records'):
+            for key, value in record.items():
+                if isinstance(value, pd.Timestamp):
+                    record[key] = value.isoformat()
+                elif value is None or (isinstance(value, float) and math.isnan(value)) or value is pd.NaT:
+                    record[key] = None
+                elif isinstance(value, np.generic):
+                    record[key] = value.item()
+            records.append(record)
+        return records
+
+    def write(self, session_date, symbols, breadth):
+        records = self._records(symbols)
+        for offset in range(0, len(records), self.chunk):
+            self.client.table(self.table).upsert(records[offset:offset + self.chunk], on_conflict='session_date,symbol').execute()
+        self.client.table(self.breadth_table).upsert(self._records(breadth), on_conflict='session_date').execute()
+        return len(records)
+
+
+class RollupJob:
+    """Roll up every closed session of the last ``days`` days that is not stored yet
+
+    Sinks (e.g. Supabase tables) are written before the local store, and
+    the local store marks a day as done, so a failed upload is retried on
+    the next pass. Days confirmed to have no rows (holidays) are remembered
+    per job; a pass stops at the first day that fails to load.
+    """
+
+    def __init__(self, data_manager, store, sinks=(), days=10):
+        self.data_manager = data_manager
+        self.store = store
+        self.sinks = list(sinks)
+        self.days = days
+        self._empty = set()
+        self._lock = threading.Lock()
+
+    def closed_sessions(self, now=None):
+        """Weekdays of the window whose trading has ended and settled"""
+        now = now or datetime.now(PKT_TZ)
+        closes = PKT_TZ.localize(datetime.combine(now.date(), TRADING_END)) + BATCH_SETTLE.to_pytimedelta()
+        last = now.date() if now >= closes else now.date() - timedelta(days=1)
+        return [day.date() for day in pd.bdate_range(end=last, periods=self.days)]
+
+    def pending(self, now=None):
+        return [day for day in self.closed_sessions(now) if day not in self.store and day not in self._empty]
+
+    def roll(self, session_date):
+        """Roll up one session; returns the number of symbols (None without rows)
+
+        Fetch errors propagate, so a day the backend failed to return is
+        retried on the next pass instead of being taken for a holiday.
+        """
+        rows = self.data_manager.load_session_data(session_date, views=ROLLUP_VIEWS)
+        if rows is None or rows.empty:
+            return None
+        symbols, breadth = daily_rollup(rows, session_date)
+        for sink in self.sinks:
+            sink.write(session_date, symbols, breadth)
+        return self.store.write(session_date, symbols, breadth)
+
+    def run_once(self, now=None):
+        """One pass over pending sessions; returns {session_date: symbols}"""
+        with self._lock:
+            rolled = {}
+            for session_date in self.pending(now):
+                count = self.roll(session_date)
+                if count is None:
+                    self._empty.add(session_date)
+                else:
+                    rolled[session_date] = count
+            return rolled
+
+    def run(self, interval=300.0, stop=None):
+        """Roll up pending sessions every ``interval`` seconds until ``stop`` is set"""
+        stop = stop or threading.Event()
+        while True:
+            try:
+                for session_date, count in self.run_once().items():
+                    print(f"rollup: {session_date} ({count} symbols)")
+            except Exception as e:
+                print(f"rollup failed: {str(e)}")
+            if stop.wait(interval):
+                return
+
+
+def main():
+    from dotenv import load_dotenv
+
+    from psx.data.backends import create_backend
+    from psx.data.manager import DataManager
+    from psx.data.resilience import resilient_backend
+    from psx.data.tiering import tiered_backend
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', default=ROLLUP_PATH)
+    parser.add_argument('--days', type=int, default=10)
+    parser.add_argument('--supabase', action='store_true', help=f"also upsert into {ROLLUP_TABLE} / {BREADTH_TABLE}")
+    parser.add_argument('--watch', action='store_true', help="keep running and roll up each session as it closes")
+    parser.add_argument('--interval', type=float, default=300.0)
+    args = parser.parse_args()
+
+    load_dotenv()
+    backend = tiered_backend(resilient_backend(create_backend()))
+    if backend is None:
+        raise SystemExit("Data backend not configured (set SUPABASE_URL/SUPABASE_KEY or PSX_DATA_BACKEND)")
+    sinks = []
+    if args.supabase:
+        tables = SupabaseRollupTables.from_env()
+        if tables is None:
+            raise SystemExit("--supabase needs SUPABASE_URL and SUPABASE_KEY")
+        sinks.append(tables)
+
+    job = RollupJob(DataManager(backend, on_error=print), DailyStore(args.root), sinks, days=args.days)
+    if args.watch:
+        print(f"Rolling up closed sessions from {backend.name} into {args.root} every {args.interval:g}s")
+        try:
+            job.run(args.interval)
+        except KeyboardInterrupt:
+            pass
+        return
+    rolled = job.run_once()
+    for session_date, count in rolled.items():
+        print(f"{session_date}: {count} symbols")
+    print(f"{len(rolled)} session(s) rolled up into {args.root}")
+
+
+if __name__ == '__main__':
+    main()
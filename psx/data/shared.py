@@ -0,0 +1,333 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from psx.data.backends import StockDataBackend, _utc
+from psx.history import batch_bucket
+from psx.quality import QualityReport
+from psx.timestamps import utc_series
+
+# tmpfs-backed by default, so mapped batches live in shared memory
+SHARED_CACHE_DIR = os.getenv("PSX_SHARED_CACHE", "/dev/shm/psx-batches")
+
+# Decoded batches a worker keeps mapped (views onto the shared files)
+MAPPED_BATCHES = 128
+
+
+def _check_owner(path):
+    """Refuse a shared directory that another user owns or can write to
+
+    The default location is a predictable name in world-writable /dev/shm,
+    so workers only map files from a directory this user controls.
+    """
+    info = os.stat(path)
+    if info.st_uid != os.getuid() or info.st_mode & 0o022:
+        raise PermissionError(
+            f"Shared cache {path} must be owned by this user and not writable by others "
+            f"(owner uid {info.st_uid}, mode {oct(info.st_mode & 0o777)})"
+        )
+
+
+def _encode_attrs(attrs):
+    """Batch attrs as JSON (the quality report as its summary)"""
+    encoded = {key: value.as_dict() if isinstance(value, QualityReport) else value for key, value in attrs.items()}
+    return json.dumps(encoded, default=lambda value: value.item() if hasattr(value, 'item') else str(value)).encode()
+
+
+def _decode_attrs(data):
+    attrs = json.loads(data)
+    if isinstance(attrs.get('quality'), dict):
+        attrs['quality'] = QualityReport.from_dict(attrs['quality'])
+    return attrs
+
+
+def _batch_table(df, meta):
+    """Arrow table for a batch with its metadata, keeping NaN as values
+
+    Float columns are written as plain buffers rather than nullable ones,
+    so readers get NumPy arrays that are views onto the mapped file.
+    """
+    import pyarrow as pa
+
+    arrays = {}
+    for col in df.columns:
+        series = df[col]
+        if series.dtype.kind in 'fiub':
+            arrays[col] = pa.array(series.to_numpy())
+        else:
+            arrays[col] = pa.Array.from_pandas(series)
+    table = pa.table(arrays)
+    metadata = {
+        b'psx_meta': json.dumps(sorted(meta) if meta is not None else None).encode(),
+        b'psx_attrs': _encode_attrs(df.attrs),
+    }
+    return table.replace_schema_metadata(metadata)
+
+
+def _batch_meta(schema):
+    covered = json.loads(schema.metadata[b'psx_meta'])
+    return frozenset(covered) if covered is not None else None
+
+
+class SharedBatchStore:
+    """Batch store on a shared directory of uncompressed Arrow IPC files
+
+    One loader process writes validated batches (``writable=True``); any
+    number of worker processes map the files read-only. On tmpfs
+    (``/dev/shm``) every process reads the same physical pages, and numeric
+    columns decode as zero-copy views, so adding workers adds little memory
+    per batch. Files are replaced atomically; workers notice a replaced
+    batch by its modification time and map it again.
+
+    Offers the same interface as ``CompressedBatchStore``, so a
+    ``DataManager`` uses it unchanged. ``put`` is ignored on read-only
+    stores (workers never write). The directories are created private to
+    the loader's user, and nothing is read from them unless that user owns
+    them.
+    """
+
+    def __init__(self, root=SHARED_CACHE_DIR, writable=False, max_mapped=MAPPED_BATCHES):
+        self.root = root
+        self.writable = writable
+        self.max_mapped = max_mapped
+        self._mapped = OrderedDict()
+        self._lock = threading.RLock()
+        self.counters = {'hits': 0, 'misses': 0, 'maps': 0, 'writes': 0}
+        self._verified = False
+        if writable:
+            os.makedirs(self.root, mode=0o700, exist_ok=True)
+            os.makedirs(self._directory, mode=0o700, exist_ok=True)
+            self._verify()
+
+    def _verify(self):
+        """Check the shared directories' ownership (once both exist) before reading them"""
+        if self._verified:
+            return
+        present = [path for path in (self.root, self._directory) if os.path.isdir(path)]
+        for path in present:
+            _check_owner(path)
+        self._verified = len(present) == 2
+
+    @property
+    def _directory(self):
+        return os.path.join(self.root, 'batches')
+
+    def _path(self, key):
+        return os.path.join(self._directory, f"{pd.Timestamp(key).value}.arrow")
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def keys(self):
+        """Stored batch buckets, oldest first"""
+        self._verify()
+        if not os.path.isdir(self._directory):
+            return []
+        stamps = sorted(int(name[:-6]) for name in os.listdir(self._directory) if name.endswith('.arrow'))
+        return [pd.Timestamp(stamp, tz='UTC') for stamp in stamps]
+
+    def put(self, key, df, meta=None):
+        """Write a batch file atomically (loader only)"""
+        if not self.writable:
+            return
+        import pyarrow as pa
+
+        table = _batch_table(df, meta)
+        path = self._path(key)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with pa.OSFile(temp, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(temp, path)
+        with self._lock:
+            self._mapped.pop(key, None)
+            self.counters['writes'] += 1
+
+    def _map(self, key):
+        """(mtime, df, meta) for a batch file, reusing the current mapping"""
+        import pyarrow as pa
+
+        self._verify()
+        path = self._path(key)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            with self._lock:
+                self._mapped.pop(key, None)
+            return None
+        with self._lock:
+            entry = self._mapped.get(key)
+            if entry is not None and entry[0] == mtime:
+                self._mapped.move_to_end(key)
+                return entry
+
+        reader = pa.ipc.open_file(pa.memory_map(path))
+        table = reader.read_all()
+        df = table.to_pandas(split_blocks=True)
+        df.attrs.update(_decode_attrs(table.schema.metadata[b'psx_attrs']))
+        entry = (mtime, df, _batch_meta(table.schema))
+        with self._lock:
+            self._mapped[key] = entry
+            self._mapped.move_to_end(key)
+            while len(self._mapped) > self.max_mapped:
+                self._mapped.popitem(last=False)
+            self.counters['maps'] += 1
+        return entry
+
+    def get(self, key):
+        """(df, meta) for a stored batch, or None"""
+        entry = self._map(key)
+        with self._lock:
+            self.counters['hits' if entry is not None else 'misses'] += 1
+        return None if entry is None else (entry[1], entry[2])
+
+    def meta(self, key):
+        """Metadata of a stored batch (reads only the file footer)"""
+        import pyarrow as pa
+
+        with self._lock:
+            entry = self._mapped.get(key)
+        if entry is not None:
+            return entry[2]
+        self._verify()
+        try:
+            return _batch_meta(pa.ipc.open_file(pa.memory_map(self._path(key))).schema)
+        except FileNotFoundError:
+            return None
+
+    def table(self, key, columns=None):
+        """Zero-copy Arrow table of a batch file (optionally some columns)"""
+        import pyarrow as pa
+
+        self._verify()
+        try:
+            table = pa.ipc.open_file(pa.memory_map(self._path(key))).read_all()
+        except FileNotFoundError:
+            return None
+        if columns:
+            table = table.select([col for col in columns if col in table.column_names])
+        return table
+
+    def remove(self, key):
+        with self._lock:
+            self._mapped.pop(key, None)
+        if self.writable:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._mapped.clear()
+        if self.writable:
+            for key in self.keys():
+                self.remove(key)
+
+    def stats(self):
+        """Batches and bytes in the shared directory plus local mapping counters"""
+        keys = self.keys()
+        size = sum(os.path.getsize(self._path(key)) for key in keys if key in self)
+        with self._lock:
+            return {
+                'shared_batches': len(keys),
+                'shared_bytes': size,
+                'mapped_batches': len(self._mapped),
+                **self.counters,
+            }
+
+    def write_manifest(self, batches):
+        """Publish the batch listing (PKT timestamps, newest first) for workers"""
+        path = os.path.join(self.root, 'manifest.json')
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, 'w') as f:
+            json.dump({'updated': time.time(), 'batches': [ts.isoformat() for ts in batches]}, f)
+        os.replace(temp, path)
+
+    def manifest(self):
+        """Latest published listing, or None before the loader's first pass"""
+        self._verify()
+        try:
+            with open(os.path.join(self.root, 'manifest.json')) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+
+class SharedCacheBackend(StockDataBackend):
+    """Rows served from the loader's shared batch files instead of a database
+
+    Worker processes use this together with a read-only ``SharedBatchStore``
+    so they never query Supabase: range reads select the batch files whose
+    bucket overlaps the range and concatenate their mapped tables. Rows are
+    the loader's validated batches.
+    """
+
+    name = 'shared'
+    page_size = 1000000
+
+    def __init__(self, root=SHARED_CACHE_DIR):
+        self.root = root
+        self.store = SharedBatchStore(root)
+        self.batch_store = self.store
+
+    def _read(self, start, end, columns):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        start, end = _utc(start), _utc(end)
+        keys = self.store.keys()
+        if start is not None:
+            keys = [key for key in keys if key >= batch_bucket([start])[0]]
+        if end is not None:
+            keys = [key for key in keys if key <= end]
+        wanted = list(dict.fromkeys(list(columns) + ['scraped_at'])) if columns else None
+        tables = [table for table in (self.store.table(key, wanted) for key in keys) if table is not None]
+        if not tables:
+            return pd.DataFrame(columns=columns or [])
+
+        table = pa.concat_tables(tables, promote_options='permissive')
+        times = table.column('scraped_at')
+        mask = None
+        if start is not None:
+            mask = pc.greater_equal(times, pa.scalar(start.to_pydatetime(), type=times.type))
+        if end is not None:
+            upper = pc.less_equal(times, pa.scalar(end.to_pydatetime(), type=times.type))
+            mask = upper if mask is None else pc.and_(mask, upper)
+        if mask is not None:
+            table = table.filter(mask)
+        table = table.sort_by('scraped_at')
+        df = table.to_pandas(split_blocks=True)
+        df['scraped_at'] = utc_series(df['scraped_at'])
+        if not columns:
+            # Raw rows only; readers recompute the validation flags
+            return df.drop(columns='quality_flags', errors='ignore')
+        return df[[col for col in columns if col in df.columns]]
+
+    def fetch(self, start=None, end=None, columns=None, descending=False, limit=None):
+        df = self._read(start, end, columns)
+        if descending:
+            df = df.iloc[::-1].reset_index(drop=True)
+        return df.head(limit) if limit else df
+
+    def fetch_page(self, start=None, end=None, columns=None, descending=False, offset=0, limit=None):
+        df = self.fetch(start, end, columns, descending)
+        return df.iloc[offset:offset + limit if limit else None].reset_index(drop=True)
+
+    def count_rows(self):
+        tables = (self.store.table(key, ['scraped_at']) for key in self.store.keys())
+        return sum(table.num_rows for table in tables if table is not None)
+
+    def ping(self):
+        manifest = self.store.manifest()
+        if manifest is None:
+            return False, f"No loader has published to {self.root} yet (run python -m psx.data.loader)"
+        age = time.time() - manifest['updated']
+        return True, f"Shared cache OK. {len(self.store.keys())} batches, listing updated {age:.0f}s ago"
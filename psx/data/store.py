@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+# Default budget for uncompressed batches, overridable per deployment
+HOT_BUDGET_BYTES = int(os.getenv("PSX_HOT_BATCH_MB", "64")) * 1024 * 1024
+
+
+def frame_bytes(df):
+    """Memory held by a DataFrame, including Python string objects"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class CompressedBatchStore:
+    """LRU batch cache with a hot tier in memory and a compressed cold tier
+
+    Hot batches are plain DataFrames kept while their total size fits in
+    ``hot_budget`` bytes. Batches pushed out of the budget are serialized to
+    Arrow IPC buffers compressed with ``codec`` (lz4 or zstd) and decoded
+    again on access, which promotes them back to the hot tier. Cold buffers
+    beyond ``max_cold`` batches are dropped oldest-first.
+
+    ``meta`` stored with a batch (and the frame's ``attrs``) survive the round
+    trip. Decoded frames keep NumPy numeric and datetime columns, while text
+    comes back as pandas' Arrow-backed string dtype; ``arrow_backed`` maps
+    every column to an Arrow dtype instead.
+    """
+
+    def __init__(self, hot_budget=HOT_BUDGET_BYTES, codec='zstd', max_cold=None, arrow_backed=False):
+        if codec not in ('lz4', 'zstd', None):
+            raise ValueError(f"Unsupported codec: {codec}")
+        self.hot_budget = hot_budget
+        self.codec = codec
+        self.max_cold = max_cold
+        self.arrow_backed = arrow_backed
+        self.hot_bytes = 0
+        self.cold_bytes = 0
+        self._hot = OrderedDict()
+        self._cold = OrderedDict()
+        self._lock = threading.RLock()
+        self.counters = {
+            'hot_hits': 0, 'cold_hits': 0, 'misses': 0,
+            'compressions': 0, 'compress_seconds': 0.0, 'decompress_seconds': 0.0,
+        }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._hot) + len(self._cold)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._hot or key in self._cold
+
+    def keys(self):
+        """Keys from least to most recently used (cold first)"""
+        with self._lock:
+            return list(self._cold) + list(self._hot)
+
+    def put(self, key, df, meta=None):
+        """Store a batch as hot, compressing older batches to stay in budget"""
+        with self._lock:
+            self._discard(key)
+            size = frame_bytes(df)
+            self._hot[key] = (df, meta, size)
+            self.hot_bytes += size
+            self._enforce_budget()
+
+    def get(self, key):
+        """(df, meta) for a stored batch, or None"""
+        with self._lock:
+            entry = self._hot.get(key)
+            if entry is not None:
+                self._hot.move_to_end(key)
+                self.counters['hot_hits'] += 1
+                return entry[0], entry[1]
+
+            cold = self._cold.pop(key, None)
+            if cold is None:
+                self.counters['misses'] += 1
+                return None
+            self.cold_bytes -= cold[0].size
+            self.counters['cold_hits'] += 1
+
+        df = self._decode(*cold)
+        with self._lock:
+            # Another thread may have stored a fresher copy meanwhile
+            if key not in self._hot:
+                size = frame_bytes(df)
+                self._hot[key] = (df, cold[2], size)
+                self.hot_bytes += size
+                self._enforce_budget(keep=key)
+            return self._hot[key][0], self._hot[key][1]
+
+    def meta(self, key):
+        """Metadata of a stored batch without decoding or promoting it"""
+        with self._lock:
+            entry = self._hot.get(key)
+            if entry is not None:
+                return entry[1]
+            cold = self._cold.get(key)
+            return cold[2] if cold is not None else None
+
+    def remove(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._hot.clear()
+            self._cold.clear()
+            self.hot_bytes = 0
+            self.cold_bytes = 0
+
+    def stats(self):
+        """Tier sizes and access counters"""
+        with self._lock:
+            return {
+                'hot_batches': len(self._hot),
+                'hot_bytes': self.hot_bytes,
+                'cold_batches': len(self._cold),
+                'cold_bytes': self.cold_bytes,
+                **self.counters,
+            }
+
+    def _discard(self, key):
+        entry = self._hot.pop(key, None)
+        if entry is not None:
+            self.hot_bytes -= entry[2]
+        cold = self._cold.pop(key, None)
+        if cold is not None:
+            self.cold_bytes -= cold[0].size
+
+    def _enforce_budget(self, keep=None):
+        """Compress least recently used hot batches until the budget holds"""
+        while self.hot_bytes > self.hot_budget and len(self._hot) > 1:
+            key = next(iter(self._hot))
+            if key == keep:
+                self._hot.move_to_end(key)
+                key = next(iter(self._hot))
+            df, meta, size = self._hot.pop(key)
+            self.hot_bytes -= size
+            buffer, attrs = self._encode(df)
+            self._cold[key] = (buffer, attrs, meta)
+            self.cold_bytes += buffer.size
+
+        while self.max_cold is not None and len(self._cold) > self.max_cold:
+            buffer = self._cold.popitem(last=False)[1][0]
+            self.cold_bytes -= buffer.size
+
+    def _encode(self, df):
+        """Frame as a compressed Arrow IPC stream buffer, plus its attrs"""
+        import pyarrow as pa
+
+        started = time.perf_counter()
+        # attrs hold Python objects (the quality report); they are kept aside
+        plain = df.copy(deep=False)
+        plain.attrs = {}
+        table = pa.Table.from_pandas(plain, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        options = pa.ipc.IpcWriteOptions(compression=self.codec)
+        with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        buffer = sink.getvalue()
+        self.counters['compressions'] += 1
+        self.counters['compress_seconds'] += time.perf_counter() - started
+        return buffer, dict(df.attrs)
+
+    def _decode(self, buffer, attrs, meta):
+        import pyarrow as pa
+
+        started = time.perf_counter()
+        table = pa.ipc.open_stream(buffer).read_all()
+        if self.arrow_backed:
+            df = table.to_pandas(types_mapper=pd.ArrowDtype)
+        else:
+            # Column-per-block conversion avoids a consolidation copy
+            df = table.to_pandas(split_blocks=True)
+        df.attrs.update(attrs)
+        with self._lock:
+            self.counters['decompress_seconds'] += time.perf_counter() - started
+        return df
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+SECTORS = [
+    'COMMERCIAL BANKS', 'CEMENT', 'FERTILIZER', 'OIL & GAS EXPLORATION COMPANIES',
+    'POWER GENERATION & DISTRIBUTION', 'TECHNOLOGY & COMMUNICATION', 'TEXTILE COMPOSITE',
+    'AUTOMOBILE ASSEMBLER', 'PHARMACEUTICALS', 'FOOD & PERSONAL CARE PRODUCTS',
+]
+
+
+def synthetic_session(session_date='2025-01-06', n_symbols=500, n_batches=72, seed=0):
+    """Scraper-shaped rows for one trading session, one batch every 5 minutes
+
+    Prices follow independent random walks from 9:30 PKT; used by the
+    benchmarks and the in-memory backend when no database is available.
+    """
+    rng = np.random.default_rng(seed)
+    symbols = np.array([f"SYM{i:04d}" for i in range(n_symbols)])
+    sectors = np.array(SECTORS)[rng.integers(0, len(SECTORS), n_symbols)]
+    ldcp = np.round(rng.uniform(5.0, 500.0, n_symbols), 2)
+
+    start = pd.Timestamp(f"{session_date} 09:30", tz='Asia/Karachi').tz_convert('UTC')
+    # Each batch lands a few seconds into its 5-minute slot
+    times = start + pd.to_timedelta(np.arange(n_batches) * 300 + 7, unit='s')
+
+    steps = rng.normal(0.0, 0.004, (n_batches, n_symbols))
+    price = np.round(ldcp * np.exp(np.cumsum(steps, axis=0)), 2)
+    high = np.maximum.accumulate(price, axis=0)
+    low = np.minimum.accumulate(price, axis=0)
+    volume = np.cumsum(rng.integers(0, 50000, (n_batches, n_symbols)), axis=0)
+
+    change = np.round(price - ldcp, 2)
+    n_rows = n_batches * n_symbols
+    return pd.DataFrame({
+        'id': np.arange(1, n_rows + 1),
+        'symbol': np.tile(symbols, n_batches),
+        'sector': np.tile(sectors, n_batches),
+        'listed_in': 'KSE100',
+        'ldcp': np.tile(ldcp, n_batches),
+        'open_price': np.tile(ldcp, n_batches),
+        'high': high.ravel(),
+        'low': low.ravel(),
+        'current_price': price.ravel(),
+        'change': change.ravel(),
+        'change_percent': np.round(change / ldcp * 100.0, 2).ravel(),
+        'volume': volume.ravel().astype(float),
+        'scraped_at': np.repeat(times, n_symbols),
+        # Insert time as Supabase records it, a moment after the scrape
+        'created_at': np.repeat(times + pd.Timedelta(seconds=2), n_symbols),
+    })
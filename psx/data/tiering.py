@@ -0,0 +1,271 @@
+"""Retention and tiering of raw snapshots: a hot backend plus a Parquet archive
+
+Raw 5-minute rows stay in the hot backend (Supabase) for ``PSX_HOT_DAYS``
+days. Older days move, oldest first, to a zstd-compressed local Parquet
+archive partitioned by session date: each day is checked against its
+stored daily rollup (see psx.data.rollup), written to the archive, read
+back and compared, and only then deleted from the hot table. The job stops
+at the first day it cannot verify, so archived days always form one
+contiguous run ahead of the hot tier.
+
+``TieredBackend`` routes reads by that boundary, so a DataManager over it
+reads whichever tier holds the requested range (or both) transparently.
+
+Usage:
+    python -m psx.data.tiering [--hot-days 30] [--archive data/archive] [--rollup-root data/daily] [--dry-run]
+
+Run it daily (e.g. from cron) after the rollup job.
+"""
+import argparse
+import os
+from datetime import datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+
+from psx.data.backends import ParquetBackend, StockDataBackend, _utc
+from psx.data.manager import PKT_TZ, DataManager
+from psx.data.rollup import ROLLUP_PATH, DailyStore, daily_rollup
+from psx.history import batch_bucket
+from psx.quality import validate_batch
+
+# Days of raw rows kept in the hot backend and where older days are archived
+HOT_DAYS = int(os.getenv("PSX_HOT_DAYS", "30"))
+ARCHIVE_PATH = os.getenv("PSX_ARCHIVE_PATH", "data/archive")
+ARCHIVE_COMPRESSION = 'zstd'
+
+
+def day_bounds(session_date):
+    """UTC start and end (inclusive) of a PKT calendar day"""
+    start = pd.Timestamp(PKT_TZ.localize(datetime.combine(pd.Timestamp(session_date).date(), time(0)))).tz_convert('UTC')
+    return start, start + pd.Timedelta(days=1) - pd.Timedelta(1, unit='ns')
+
+
+def archive_backend(root=None):
+    """Parquet backend over the archive directory"""
+    return ParquetBackend(root or ARCHIVE_PATH, compression=ARCHIVE_COMPRESSION)
+
+
+class TieredBackend(StockDataBackend):
+    """Reads from the archive before the tier boundary and from the hot backend after it
+
+    The boundary is the start of the day after the newest archived session
+    and is re-read from the archive directory on every query, so days moved
+    by a running retention job are picked up without a restart. Writes,
+    pings and the circuit breaker belong to the hot backend.
+    """
+
+    def __init__(self, hot, archive):
+        self.hot = hot
+        self.archive = archive
+        self.name = hot.name
+        self.page_size = hot.page_size
+        self.batch_store = hot.batch_store
+        self.breaker = getattr(hot, 'breaker', None)
+
+    def boundary(self):
+        """UTC start of the first day served by the hot tier (None when nothing is archived)"""
+        for session in reversed(self.archive.sessions()):
+            if self.archive.has_session(session):
+                return day_bounds(pd.Timestamp(session) + pd.Timedelta(days=1))[0]
+        return None
+
+    def tiers(self, start=None, end=None):
+        """[(backend, start, end)] covering a range, oldest tier first"""
+        boundary = self.boundary()
+        if boundary is None:
+            return [(self.hot, start, end)]
+        parts = []
+        if start is None or _utc(start) < boundary:
+            upper = end if end is not None and _utc(end) < boundary else boundary - pd.Timedelta(1, unit='ns')
+            parts.append((self.archive, start, upper))
+        if end is None or _utc(end) >= boundary:
+            lower = start if start is not None and _utc(start) >= boundary else boundary
+            parts.append((self.hot, lower, end))
+        return parts
+
+    def fetch(self, start=None, end=None, columns=None, descending=False, limit=None):
+        # Newest-first reads start with the hot tier and stop once ``limit`` rows are found
+        parts = self.tiers(start, end)
+        frames = []
+        total = 0
+        for backend, lower, upper in (parts[::-1] if descending else parts):
+            df = backend.fetch(lower, upper, columns, descending, limit - total if limit else None)
+            if not df.empty:
+                frames.append(df)
+                total += len(df)
+            if limit and total >= limit:
+                break
+        if not frames:
+            return pd.DataFrame(columns=columns or [])
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+    def iter_pages(self, start=None, end=None, columns=None, descending=False, page_size=None):
+        parts = self.tiers(start, end)
+        for backend, lower, upper in (parts[::-1] if descending else parts):
+            yield from backend.iter_pages(lower, upper, columns, descending, page_size)
+
+    def fetch_page(self, start=None, end=None, columns=None, descending=False, offset=0, limit=None):
+        parts = self.tiers(start, end)
+        if len(parts) == 1:
+            backend, lower, upper = parts[0]
+            return backend.fetch_page(lower, upper, columns, descending, offset, limit)
+        df = self.fetch(start, end, columns, descending, offset + limit if limit else None)
+        return df.iloc[offset:].reset_index(drop=True)
+
+    def count_rows(self):
+        hot = self.hot.count_rows()
+        return None if hot is None else hot + self.archive.count_rows()
+
+    def ingest(self, df):
+        return self.hot.ingest(df)
+
+    def ping(self):
+        return self.hot.ping()
+
+
+def tiered_backend(backend, root=None):
+    """Backend that also serves days archived under ``root`` (None stays None)
+
+    Worker processes reading the shared cache (see psx.data.loader) only
+    serve recent sessions and are left as they are.
+    """
+    if backend is None or backend.name == 'shared':
+        return backend
+    return TieredBackend(backend, archive_backend(root))
+
+
+class RetentionJob:
+    """Moves raw days older than ``hot_days`` from the hot backend to the archive
+
+    Days are handled oldest first, one at a time, and the pass stops at the
+    first day that fails verification (missing or mismatched rollup,
+    archive read-back differences), leaving it and every later day hot.
+    With ``dry_run`` days are verified but nothing is written or deleted.
+    """
+
+    def __init__(self, hot, archive, daily_store, hot_days=HOT_DAYS, dry_run=False):
+        self.hot = hot
+        self.archive = archive
+        self.daily_store = daily_store
+        self.hot_days = hot_days
+        self.dry_run = dry_run
+
+    def cutoff(self, now=None):
+        """First PKT date that stays hot"""
+        now = now or datetime.now(PKT_TZ)
+        return now.date() - timedelta(days=self.hot_days)
+
+    def candidates(self, now=None):
+        """Days from the oldest hot row up to (excluding) the cutoff"""
+        oldest = self.hot.fetch(columns=['scraped_at'], limit=1)
+        if oldest.empty:
+            return []
+        first = oldest['scraped_at'].iloc[0].tz_convert(PKT_TZ).date()
+        return [day.date() for day in pd.date_range(first, self.cutoff(now) - timedelta(days=1))]
+
+    def check_rollup(self, session_date, rows):
+        """Problem with the stored rollup of a day's raw rows (None when it matches)"""
+        start, end = DataManager.session_bounds(session_date)
+        session = rows[rows['scraped_at'].between(start, end)].copy()
+        stored = self.daily_store.read(session_date, session_date, columns=['symbol', 'close', 'volume'])
+        if session.empty:
+            return None if stored.empty else "rollup has symbols but no rows fall in trading hours"
+        if session_date not in self.daily_store:
+            return "no daily rollup (run python -m psx.data.rollup with enough --days first)"
+
+        # Same preparation as DataManager.get_session_data, which the rollup job reads through
+        session['scraped_at'] = session['scraped_at'].dt.tz_convert(PKT_TZ)
+        session['batch'] = batch_bucket(session['scraped_at'])
+        session = validate_batch(session, batch_column='batch').drop(columns='batch')
+        expected, _ = daily_rollup(session, session_date)
+
+        merged = stored.merge(expected[['symbol', 'close', 'volume']], on='symbol', how='outer', suffixes=('_stored', '_raw'))
+        if len(merged) != len(stored) or len(merged) != len(expected):
+            return f"rollup has {len(stored)} symbols, raw rows have {len(expected)}"
+        for field in ('close', 'volume'):
+            if not np.allclose(merged[f'{field}_stored'], merged[f'{field}_raw'], equal_nan=True):
+                return f"rollup {field} differs from the raw rows"
+        return None
+
+    def check_archive(self, session_date, rows):
+        """Problem with the archived copy of a day (None when it matches the raw rows)"""
+        start, end = day_bounds(session_date)
+        archived = self.archive.fetch(start, end, columns=['symbol', 'scraped_at', 'volume'])
+        if len(archived) != len(rows):
+            return f"archive holds {len(archived)} rows, expected {len(rows)}"
+        if archived['symbol'].nunique() != rows['symbol'].nunique():
+            return "archived symbols differ from the raw rows"
+        volume = pd.to_numeric(rows['volume'], errors='coerce').sum()
+        if not np.isclose(pd.to_numeric(archived['volume'], errors='coerce').sum(), volume):
+            return "archived volume differs from the raw rows"
+        return None
+
+    def archive_day(self, session_date):
+        """Verify, archive and delete one day; returns a result row"""
+        start, end = day_bounds(session_date)
+        rows = self.hot.fetch(start, end)
+        result = {'session_date': session_date, 'rows': len(rows), 'status': 'empty', 'problem': None}
+        if rows.empty:
+            return result
+
+        result['problem'] = self.check_rollup(session_date, rows)
+        if result['problem'] is not None:
+            result['status'] = 'skipped'
+            return result
+        if self.dry_run:
+            result['status'] = 'verified'
+            return result
+
+        # One file per day; re-running after an interrupted pass replaces it
+        self.archive.write(rows, name='archive')
+        result['problem'] = self.check_archive(session_date, rows)
+        if result['problem'] is not None:
+            result['status'] = 'failed'
+            return result
+        self.hot.delete_range(start, end)
+        result['status'] = 'archived'
+        return result
+
+    def run_once(self, now=None):
+        """One pass over every day past the cutoff; returns the result rows"""
+        results = []
+        for session_date in self.candidates(now):
+            result = self.archive_day(session_date)
+            results.append(result)
+            if result['status'] in ('skipped', 'failed'):
+                break
+        return results
+
+
+def main():
+    from dotenv import load_dotenv
+
+    from psx.data.backends import create_backend
+    from psx.data.resilience import resilient_backend
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hot-days', type=int, default=HOT_DAYS)
+    parser.add_argument('--archive', default=ARCHIVE_PATH)
+    parser.add_argument('--rollup-root', default=ROLLUP_PATH)
+    parser.add_argument('--dry-run', action='store_true', help="verify days without archiving or deleting them")
+    args = parser.parse_args()
+
+    load_dotenv()
+    backend = resilient_backend(create_backend())
+    if backend is None or backend.name == 'shared':
+        raise SystemExit("Retention needs the hot backend (set SUPABASE_URL/SUPABASE_KEY or PSX_DATA_BACKEND)")
+
+    archive = archive_backend(args.archive)
+    job = RetentionJob(backend, archive, DailyStore(args.rollup_root), hot_days=args.hot_days, dry_run=args.dry_run)
+    print(f"Keeping {args.hot_days} day(s) hot in {backend.name}; archiving earlier days into {args.archive}")
+    results = job.run_once()
+    for result in results:
+        note = f" ({result['problem']})" if result['problem'] else ''
+        print(f"{result['session_date']}: {result['status']}, {result['rows']:,} rows{note}")
+    archived = sum(result['status'] == 'archived' for result in results)
+    print(f"{archived} day(s) archived; archive holds {len(archive.sessions())} session(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+
+from psx.history import HISTORY_FIELDS, SessionHistory
+
+
+def _same(a, b):
+    """Elementwise equality treating NaN == NaN"""
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+class DeltaHistory:
+    """Delta-encoded intraday history for one trading session
+
+    The first batch is stored in full; each later batch stores a bitmap of
+    the symbols whose tracked fields changed since the previous batch and
+    the new values of those rows only. Illiquid symbols that sit unchanged
+    for most of the day therefore cost one bit per batch. Any batch is
+    rebuilt by replaying every patch up to it in one vectorized scatter.
+    """
+
+    def __init__(self, fields=HISTORY_FIELDS):
+        self.fields = tuple(fields)
+        self.symbols = []
+        self.symbol_index = {}
+        self.batch_times = []
+        self._bitmaps = []
+        self._counts = []
+        self._values = {field: [] for field in self.fields}
+        # Latest full state, used to encode the next batch
+        self._latest = {field: np.empty(0) for field in self.fields}
+
+    @property
+    def n_symbols(self):
+        return len(self.symbols)
+
+    @property
+    def n_batches(self):
+        return len(self.batch_times)
+
+    def nbytes(self):
+        """Bytes held by bitmaps, changed-row values and the latest state"""
+        total = sum(bitmap.nbytes for bitmap in self._bitmaps)
+        for field in self.fields:
+            total += sum(values.nbytes for values in self._values[field])
+            total += self._latest[field].nbytes
+        return total
+
+    def _register(self, symbols):
+        """Row index for each symbol, registering unseen symbols"""
+        rows = np.empty(len(symbols), dtype=np.int64)
+        for i, symbol in enumerate(symbols):
+            row = self.symbol_index.get(symbol)
+            if row is None:
+                row = len(self.symbols)
+                self.symbol_index[symbol] = row
+                self.symbols.append(symbol)
+            rows[i] = row
+        return rows
+
+    def _push(self, batch_time, changed, values):
+        """Record one patch: ``changed`` is a bool mask over all known symbols"""
+        self.batch_times.append(batch_time)
+        self._bitmaps.append(np.packbits(changed))
+        self._counts.append(len(changed))
+        for field in self.fields:
+            self._values[field].append(values[field][changed].copy())
+
+    def append(self, batch_time, frame):
+        """Encode a batch (a frame indexed by symbol) against the previous one
+
+        Symbols missing from ``frame`` are recorded as NaN for this batch,
+        matching ``SessionHistory``.
+        """
+        if self.batch_times and batch_time <= self.batch_times[-1]:
+            return False
+        rows = self._register(list(frame.index))
+        n = self.n_symbols
+
+        changed = np.zeros(n, dtype=bool)
+        state = {}
+        for field in self.fields:
+            current = np.full(n, np.nan)
+            if field in frame.columns:
+                current[rows] = pd.to_numeric(frame[field], errors='coerce').to_numpy(dtype=np.float64)
+            previous = np.full(n, np.nan)
+            previous[:len(self._latest[field])] = self._latest[field]
+            changed |= ~_same(current, previous)
+            state[field] = current
+
+        self._push(batch_time, changed, state)
+        self._latest = state
+        return True
+
+    @classmethod
+    def from_history(cls, history):
+        """Encode every batch of a ``SessionHistory`` in one vectorized pass"""
+        delta = cls(history.fields)
+        delta.symbols = list(history.symbols)
+        delta.symbol_index = dict(history.symbol_index)
+        n, b = history.n_symbols, history.n_batches
+        if b == 0:
+            return delta
+
+        matrices = {field: history.matrix(field) for field in delta.fields}
+        changed = np.zeros((n, b), dtype=bool)
+        for matrix in matrices.values():
+            previous = np.empty_like(matrix)
+            previous[:, 0] = np.nan
+            previous[:, 1:] = matrix[:, :-1]
+            changed |= ~_same(matrix, previous)
+
+        for col, batch_time in enumerate(history.batch_times):
+            delta._push(batch_time, changed[:, col], {field: matrix[:, col] for field, matrix in matrices.items()})
+        delta._latest = {field: matrix[:, -1].copy() for field, matrix in matrices.items()}
+        return delta
+
+    def _patches(self, upto):
+        """Symbol rows and batch columns of every stored value up to a batch"""
+        positions = [
+            np.flatnonzero(np.unpackbits(bitmap, count=count))
+            for bitmap, count in zip(self._bitmaps[:upto + 1], self._counts[:upto + 1])
+        ]
+        rows = np.concatenate(positions) if positions else np.empty(0, dtype=np.int64)
+        cols = np.repeat(np.arange(len(positions)), [len(p) for p in positions])
+        return rows, cols
+
+    def state(self, col):
+        """Field arrays (one value per known symbol) as of batch ``col``"""
+        if col < 0:
+            col += self.n_batches
+        rows, _ = self._patches(col)
+
+        # The latest patch touching a symbol wins: first hit in reverse order
+        symbols, first = np.unique(rows[::-1], return_index=True)
+        source = len(rows) - 1 - first
+
+        result = {}
+        for field in self.fields:
+            values = np.concatenate(self._values[field][:col + 1])
+            column = np.full(self.n_symbols, np.nan)
+            column[symbols] = values[source]
+            result[field] = column
+        return result
+
+    def batch_frame(self, col):
+        """Rebuild one batch as a frame indexed by symbol"""
+        frame = pd.DataFrame(self.state(col), index=pd.Index(self.symbols, name='symbol'))
+        return frame.dropna(how='all')
+
+    def changed_symbols(self, col):
+        """Symbols whose fields changed in batch ``col`` (all present ones for the first)"""
+        mask = np.unpackbits(self._bitmaps[col], count=self._counts[col]).astype(bool)
+        return [self.symbols[row] for row in np.flatnonzero(mask)]
+
+    def to_history(self):
+        """Expand into a dense ``SessionHistory`` (every batch at once)"""
+        n, b = self.n_symbols, self.n_batches
+        if b == 0:
+            return SessionHistory(self.fields)
+        rows, cols = self._patches(b - 1)
+
+        # Each cell takes the value from the latest patch at or before its batch
+        written = np.full((n, b), -1, dtype=np.int64)
+        written[rows, cols] = cols
+        source_col = np.maximum.accumulate(written, axis=1)
+        known = source_col >= 0
+
+        matrices = {}
+        for field in self.fields:
+            sparse = np.full((n, b), np.nan)
+            sparse[rows, cols] = np.concatenate(self._values[field])
+            dense = np.take_along_axis(sparse, np.where(known, source_col, 0), axis=1)
+            dense[~known] = np.nan
+            matrices[field] = dense
+        return SessionHistory.from_matrices(self.symbols, self.batch_times, matrices)
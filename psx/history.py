@@ -0,0 +1,163 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from psx.timestamps import floor_ns, from_ns, to_ns
+
+# Scraper runs every 5 minutes; rows are grouped into batches on this grid
+BATCH_FREQ = '5min'
+
+# A batch is complete (and safe to cache) this long after its 5-minute bucket ends
+BATCH_SETTLE = pd.Timedelta(BATCH_FREQ) + pd.Timedelta(minutes=1)
+
+# Raw Supabase columns tracked per symbol and batch
+HISTORY_FIELDS = ('current_price', 'change_percent', 'volume', 'high', 'low', 'open_price')
+
+
+def batch_bucket(timestamps):
+    """Floor timestamps to the batch grid (a UTC DatetimeIndex)"""
+    return from_ns(floor_ns(to_ns(timestamps), BATCH_FREQ))
+
+
+class SessionHistory:
+    """Symbols x batches matrices for one trading session
+
+    Each tracked field is stored as a float64 matrix with one row per symbol
+    and one column per batch. Capacity grows geometrically on both axes so
+    appending the next 5-minute batch is amortised O(symbols).
+    """
+
+    def __init__(self, fields=HISTORY_FIELDS):
+        self.fields = tuple(fields)
+        self.symbols = []
+        self.symbol_index = {}
+        self.batch_times = []
+        self._data = {field: np.empty((0, 0)) for field in self.fields}
+        # Held by callers that share one history across sessions
+        self.lock = threading.RLock()
+
+    @property
+    def n_symbols(self):
+        return len(self.symbols)
+
+    @property
+    def n_batches(self):
+        return len(self.batch_times)
+
+    def matrix(self, field):
+        """View of a field as an (n_symbols, n_batches) matrix"""
+        return self._data[field][:self.n_symbols, :self.n_batches]
+
+    def _reserve(self, n_symbols, n_batches):
+        """Grow the backing arrays to hold at least the given shape"""
+        rows, cols = next(iter(self._data.values())).shape
+        if n_symbols <= rows and n_batches <= cols:
+            return
+        new_rows = max(n_symbols, rows * 2 if n_symbols > rows else rows, 16)
+        new_cols = max(n_batches, cols * 2 if n_batches > cols else cols, 8)
+        for field, old in self._data.items():
+            grown = np.full((new_rows, new_cols), np.nan)
+            grown[:old.shape[0], :old.shape[1]] = old
+            self._data[field] = grown
+
+    def _symbol_rows(self, symbols):
+        """Row index for each symbol, registering unseen symbols"""
+        rows = np.empty(len(symbols), dtype=np.int64)
+        for i, symbol in enumerate(symbols):
+            row = self.symbol_index.get(symbol)
+            if row is None:
+                row = len(self.symbols)
+                self.symbol_index[symbol] = row
+                self.symbols.append(symbol)
+            rows[i] = row
+        return rows
+
+    def _write(self, rows, cols, df):
+        """Scatter frame columns into the matrices (later rows win)"""
+        for field in self.fields:
+            if field in df.columns:
+                values = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype=np.float64)
+                self._data[field][rows, cols] = values
+
+    @classmethod
+    def from_frame(cls, df, fields=HISTORY_FIELDS):
+        """Build a history from long-format rows covering many batches"""
+        history = cls(fields)
+        if df is None or df.empty:
+            return history
+        history.extend_frame(df)
+        return history
+
+    @classmethod
+    def from_matrices(cls, symbols, batch_times, matrices):
+        """Build a history from ready (n_symbols, n_batches) field matrices"""
+        history = cls(tuple(matrices))
+        history.symbols = list(symbols)
+        history.symbol_index = {symbol: row for row, symbol in enumerate(history.symbols)}
+        history.batch_times = list(batch_times)
+        history._data = {field: np.array(matrix, dtype=np.float64) for field, matrix in matrices.items()}
+        return history
+
+    def extend_frame(self, df, now=None):
+        """Append rows for one or more batches newer than the last known batch
+
+        Batches still being written (less than ``BATCH_SETTLE`` past their
+        bucket at ``now``) are held back, so rows that land late are not
+        lost; callers fetch them again once ``needs_extend`` says so.
+        """
+        if df is None or df.empty or 'symbol' not in df.columns or 'scraped_at' not in df.columns:
+            return []
+
+        buckets = batch_bucket(df['scraped_at'])
+        now = pd.Timestamp.now(tz='UTC') if now is None else pd.Timestamp(now)
+        keep = np.asarray(buckets + BATCH_SETTLE <= now)
+        if self.batch_times:
+            keep &= np.asarray(buckets > self.batch_times[-1])
+        df = df[keep]
+        buckets = buckets[keep]
+        if df.empty:
+            return []
+
+        bucket_codes, new_times = pd.factorize(buckets, sort=True)
+        symbol_codes, new_symbols = pd.factorize(df['symbol'])
+        symbol_rows = self._symbol_rows(list(new_symbols))
+
+        first_col = self.n_batches
+        self._reserve(self.n_symbols, first_col + len(new_times))
+        self.batch_times.extend(pd.DatetimeIndex(new_times))
+
+        # Rows without a symbol or timestamp cannot be placed
+        valid = (bucket_codes >= 0) & (symbol_codes >= 0)
+        self._write(symbol_rows[symbol_codes[valid]], first_col + bucket_codes[valid], df[valid])
+        return list(range(first_col, self.n_batches))
+
+    def needs_extend(self, latest_batch, now=None):
+        """Whether to fetch rows after the last batch
+
+        True while the history is empty, or once the batch after the last
+        one is listed (``latest_batch``) and has settled.
+        """
+        if not self.batch_times:
+            return True
+        if latest_batch is None:
+            return False
+        now = pd.Timestamp.now(tz='UTC') if now is None else pd.Timestamp(now)
+        following = self.batch_times[-1] + pd.Timedelta(BATCH_FREQ)
+        return batch_bucket([latest_batch])[0] >= following and now >= following + BATCH_SETTLE
+
+    def extend(self, batch_time, df):
+        """Append a single batch; ignored if it is not newer than the last one"""
+        if df is None or df.empty:
+            return []
+        batch = df.copy()
+        batch['scraped_at'] = batch_time
+        return self.extend_frame(batch)
+
+    def batch_frame(self, col):
+        """Rebuild one batch as a frame indexed by symbol"""
+        frame = pd.DataFrame(
+            {field: self.matrix(field)[:, col] for field in self.fields},
+            index=pd.Index(self.symbols, name='symbol')
+        )
+        return frame.dropna(how='all')
@@ -0,0 +1,100 @@
+import warnings
+
+import numpy as np
+
+
+def forward_fill(matrix):
+    """Carry the last finite value along each row of a (symbols, time) matrix
+
+    Leading gaps stay NaN.
+    """
+    valid = np.isfinite(matrix)
+    index = np.where(valid, np.arange(matrix.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    filled = np.take_along_axis(matrix, index, axis=1)
+    filled[~np.maximum.accumulate(valid, axis=1)] = np.nan
+    return filled
+
+
+def ema(matrix, span):
+    """Exponential moving average along time, seeded with the first value
+
+    One vectorized step per column across all symbols; NaN inputs leave
+    the average unchanged.
+    """
+    alpha = 2.0 / (span + 1.0)
+    out = np.empty_like(matrix, dtype=np.float64)
+    current = matrix[:, 0].astype(np.float64)
+    out[:, 0] = current
+    for col in range(1, matrix.shape[1]):
+        value = matrix[:, col]
+        step = np.where(np.isfinite(value), value - current, 0.0)
+        current = np.where(np.isfinite(current), current + alpha * step, value)
+        out[:, col] = current
+    return out
+
+
+def rsi_series(prices, period=14):
+    """Wilder's relative strength index (0-100) at every column
+
+    The first ``period`` columns are NaN.
+    """
+    out = np.full(prices.shape, np.nan)
+    if prices.shape[1] <= period:
+        return out
+    moves = np.diff(prices, axis=1)
+    moves[~np.isfinite(moves)] = 0.0
+    gains = np.clip(moves, 0.0, None)
+    losses = np.clip(-moves, 0.0, None)
+
+    # Simple average over the first period, Wilder smoothing afterwards
+    gain = gains[:, :period].mean(axis=1)
+    loss = losses[:, :period].mean(axis=1)
+    for col in range(period, moves.shape[1] + 1):
+        if col > period:
+            gain = (gain * (period - 1) + gains[:, col - 1]) / period
+            loss = (loss * (period - 1) + losses[:, col - 1]) / period
+        with np.errstate(divide='ignore', invalid='ignore'):
+            strength = 100.0 - 100.0 / (1.0 + gain / loss)
+        strength[(loss == 0) & (gain > 0)] = 100.0
+        strength[(loss == 0) & (gain == 0)] = 50.0
+        out[:, col] = strength
+    return out
+
+
+def rsi(prices, period=14):
+    """Wilder's relative strength index of the last column (0-100)"""
+    return rsi_series(prices, period)[:, -1]
+
+
+def macd_histogram(prices, fast=12, slow=26, signal=9):
+    """MACD line minus its signal line at the last column"""
+    line = ema(prices, fast) - ema(prices, slow)
+    return line[:, -1] - ema(line, signal)[:, -1]
+
+
+def interval_volume(volume):
+    """Volume traded in each interval of a (symbols, time) matrix of cumulative volume
+
+    The first column and drops in the cumulative count are NaN.
+    """
+    intervals = np.diff(volume, axis=1, prepend=np.nan)
+    intervals[intervals < 0] = np.nan
+    return intervals
+
+
+def average_volume(intervals, window):
+    """Mean of the ``window`` intervals before each interval (NaN-aware)"""
+    padded = np.concatenate([np.full((intervals.shape[0], window), np.nan), intervals[:, :-1]], axis=1)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window, axis=1)
+    with warnings.catch_warnings():
+        # All-NaN windows average to NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmean(windows, axis=-1)
+
+
+def volume_ratio(intervals, window):
+    """Each interval's volume over its ``average_volume`` (NaN without a baseline)"""
+    average = average_volume(intervals, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(average > 0, intervals / average, np.nan)
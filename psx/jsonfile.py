@@ -0,0 +1,42 @@
+"""JSON files that several processes read and write (alert rules, saved screens)
+
+Writers take an exclusive lock on a ``<path>.lock`` file next to the data,
+re-read the file, apply their change and replace the file atomically, so a
+crash never leaves half-written JSON and one process does not overwrite
+another's changes with a stale copy.
+"""
+import json
+import os
+from contextlib import contextmanager
+
+
+def _fcntl():
+    """The fcntl module, or None where it is unavailable (Windows)"""
+    try:
+        import fcntl
+    except ImportError:
+        return None
+    return fcntl
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on ``<path>.lock`` (no-op without a path or fcntl)"""
+    fcntl = _fcntl()
+    if not path or fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def write_json(path, data):
+    """Write JSON through a temporary file replaced over ``path``"""
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'w', encoding='utf-8') as handle:
+        json.dump(data, handle, indent=2)
+    os.replace(temporary, path)
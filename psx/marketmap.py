@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+
+def _numeric(df, column):
+    if column not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+
+
+def market_map(df):
+    """Sector -> symbol treemap nodes for one batch, in layout order
+
+    Tiles are sized by turnover (volume x price) and coloured by change %.
+    Sectors take their summed turnover and turnover-weighted change. Nodes
+    are ordered by sector turnover, then by symbol turnover within the
+    sector, so the client can pack them as given without re-sorting.
+    Values are rounded to keep the payload small. Returns None when no
+    symbol traded.
+    """
+    if df is None or df.empty or 'symbol' not in df.columns:
+        return None
+    turnover = np.nan_to_num(_numeric(df, 'volume') * _numeric(df, 'current_price'))
+    change = _numeric(df, 'change_percent')
+    keep = turnover > 0
+    if not keep.any():
+        return None
+
+    symbols = df['symbol'].astype(str).to_numpy()[keep]
+    sectors = df['sector'].fillna('Other').astype(str).to_numpy()[keep] if 'sector' in df.columns else np.full(keep.sum(), 'Other')
+    turnover, change = turnover[keep], change[keep]
+
+    codes, names = pd.factorize(sectors)
+    names = np.asarray(names, dtype=object)
+    sector_turnover = np.bincount(codes, weights=turnover)
+    sector_change = np.bincount(codes, weights=turnover * np.nan_to_num(change)) / sector_turnover
+
+    sector_order = np.argsort(-sector_turnover, kind='stable')
+    sector_rank = np.empty_like(sector_order)
+    sector_rank[sector_order] = np.arange(len(sector_order))
+    order = np.lexsort((-turnover, sector_rank[codes]))
+
+    labels = np.concatenate([names[sector_order], symbols[order]])
+    parents = np.concatenate([np.full(len(names), ''), names[codes[order]]])
+    nodes = {
+        'labels': labels,
+        'parents': parents,
+        'values': np.concatenate([sector_turnover[sector_order], turnover[order]]).round(),
+        'colors': np.concatenate([sector_change[sector_order], change[order]]).round(2),
+    }
+    # Labels double as ids unless a symbol shares a sector's name
+    if len(set(labels)) < len(labels):
+        nodes['ids'] = np.concatenate([['sector:' + name for name in names[sector_order]], symbols[order]])
+        nodes['parents'] = np.concatenate([np.full(len(names), ''), ['sector:' + name for name in names[codes[order]]]])
+    return nodes
+
+
+def market_map_figure(nodes, height=560):
+    """Treemap figure dict for ``market_map`` nodes
+
+    Text and hover come from one template each rather than per-tile
+    strings; the colour scale is symmetric around zero and clipped at the
+    95th percentile of absolute change so one outlier does not wash out
+    the map.
+    """
+    colors = nodes['colors']
+    finite = np.abs(colors[np.isfinite(colors)])
+    bound = float(np.percentile(finite, 95)) if finite.size else 1.0
+    trace = {
+        'type': 'treemap',
+        'labels': nodes['labels'],
+        'parents': nodes['parents'],
+        'values': nodes['values'],
+        'branchvalues': 'total',
+        'sort': False,
+        'marker': {
+            'colors': colors,
+            'colorscale': 'RdYlGn',
+            'cmin': -max(bound, 0.01),
+            'cmid': 0,
+            'cmax': max(bound, 0.01),
+            'colorbar': {'title': {'text': 'Change(%)'}},
+        },
+        'texttemplate': "%{label}<br>%{color:.2f}%",
+        'hovertemplate': "<b>%{label}</b><br>Turnover=%{value:,.0f}<br>Change(%)=%{color:.2f}<extra></extra>",
+    }
+    if 'ids' in nodes:
+        trace['ids'] = nodes['ids']
+    return {
+        'data': [trace],
+        'layout': {'height': height, 'margin': {'t': 30, 'l': 10, 'r': 10, 'b': 10}},
+    }
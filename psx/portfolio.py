@@ -0,0 +1,285 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Holdings file columns and the (lower-case) names accepted for each
+HOLDING_COLUMNS = {
+    'symbol': ('symbol', 'ticker', 'scrip'),
+    'quantity': ('quantity', 'qty', 'shares', 'units'),
+    'cost': ('cost', 'avg_cost', 'average_cost', 'cost_price', 'buy_price'),
+}
+
+# Sector label for symbols the batch does not classify
+UNKNOWN_SECTOR = 'Unknown'
+
+
+def read_holdings(source):
+    """Holdings as (symbol, quantity, cost per share) from a CSV or a frame
+
+    Column names are matched case-insensitively with common aliases.
+    Symbols are upper-cased and repeated symbols merged at their
+    quantity-weighted average cost.
+    """
+    df = source if isinstance(source, pd.DataFrame) else pd.read_csv(source)
+    lookup = {str(col).strip().lower(): col for col in df.columns}
+    columns = {}
+    for name, aliases in HOLDING_COLUMNS.items():
+        found = next((lookup[alias] for alias in aliases if alias in lookup), None)
+        if found is None:
+            raise ValueError(f"Holdings need a '{name}' column (found: {', '.join(map(str, df.columns))})")
+        columns[name] = df[found]
+
+    holdings = pd.DataFrame({
+        'symbol': columns['symbol'].astype(str).str.strip().str.upper(),
+        'quantity': pd.to_numeric(columns['quantity'], errors='coerce'),
+        'cost': pd.to_numeric(columns['cost'], errors='coerce'),
+    }).dropna()
+    holdings = holdings[(holdings['symbol'] != '') & (holdings['quantity'] != 0)]
+    holdings['basis'] = holdings['quantity'] * holdings['cost']
+    merged = holdings.groupby('symbol', sort=True)[['quantity', 'basis']].sum()
+    merged = merged[merged['quantity'] != 0]
+    return pd.DataFrame({
+        'symbol': merged.index.to_numpy(dtype=object),
+        'quantity': merged['quantity'].to_numpy(),
+        'cost': (merged['basis'] / merged['quantity']).to_numpy(),
+    })
+
+
+class Valuation:
+    """Mark-to-market of every portfolio in a book against one batch
+
+    Position arrays are stacked portfolio after portfolio; ``offsets``
+    delimits each portfolio's slice and per-portfolio totals are indexed
+    by portfolio number.
+    """
+
+    def __init__(self, names, offsets, symbols, columns, totals, sectors, exposure):
+        self.names = names
+        self.offsets = offsets
+        self.symbols = symbols
+        self.columns = columns
+        self.totals = totals
+        self.sectors = sectors
+        self.exposure = exposure
+        self._number = {name: i for i, name in enumerate(names)}
+
+    def positions(self, name):
+        """Positions of one portfolio, largest market value first"""
+        i = self._number[name]
+        rows = slice(self.offsets[i], self.offsets[i + 1])
+        frame = pd.DataFrame({'symbol': self.symbols[rows]})
+        for column, values in self.columns.items():
+            frame[column] = values[rows]
+        return frame.sort_values('value', ascending=False, ignore_index=True)
+
+    def summary(self, name):
+        """Totals of one portfolio"""
+        i = self._number[name]
+        return {column: values[i] for column, values in self.totals.items()}
+
+    def summaries(self):
+        """Totals of every portfolio, one row each"""
+        return pd.DataFrame(self.totals, index=pd.Index(self.names, name='portfolio'))
+
+    def sector_exposure(self, name):
+        """Market value share (%) per sector of one portfolio, largest first"""
+        shares = self.exposure[self._number[name]]
+        series = pd.Series(shares, index=self.sectors, name='weight')
+        return series[series != 0].sort_values(ascending=False)
+
+
+class PortfolioBook:
+    """Holdings of many portfolios, marked to market together per batch
+
+    Symbols get process-wide integer codes. Holdings are stacked into flat
+    position arrays (portfolio number, symbol code, quantity, cost) and
+    each batch becomes price / LDCP / sector arrays indexed by code, so
+    joining every position of every portfolio to a batch is one gather,
+    and totals, sector exposure and contributions are ``np.bincount``
+    passes. Valuations are cached per batch and holdings version: a
+    portfolio is revalued only when a new batch arrives or holdings change.
+    """
+
+    def __init__(self, max_batches=16):
+        self.max_batches = max_batches
+        self.portfolios = {}
+        self.symbols = []
+        self.symbol_index = {}
+        self.version = 0
+        self._stacked = None
+        self._quotes = OrderedDict()
+        self._valuations = OrderedDict()
+        self.lock = threading.RLock()
+
+    def _codes(self, symbols):
+        """Code for each symbol, registering unseen symbols"""
+        codes = np.empty(len(symbols), dtype=np.int64)
+        for i, symbol in enumerate(symbols):
+            code = self.symbol_index.get(symbol)
+            if code is None:
+                code = len(self.symbols)
+                self.symbol_index[symbol] = code
+                self.symbols.append(symbol)
+            codes[i] = code
+        return codes
+
+    def set_portfolio(self, name, holdings):
+        """Create or replace a portfolio from ``read_holdings`` output (or a file)"""
+        if not isinstance(holdings, pd.DataFrame) or list(holdings.columns) != ['symbol', 'quantity', 'cost']:
+            holdings = read_holdings(holdings)
+        with self.lock:
+            self.portfolios[name] = holdings.reset_index(drop=True)
+            self._changed()
+
+    def remove_portfolio(self, name):
+        with self.lock:
+            if self.portfolios.pop(name, None) is not None:
+                self._changed()
+
+    def load_directory(self, path):
+        """Add every CSV in a directory as a portfolio named after the file"""
+        loaded = []
+        for entry in sorted(os.listdir(path)):
+            if entry.lower().endswith('.csv'):
+                self.set_portfolio(os.path.splitext(entry)[0], read_holdings(os.path.join(path, entry)))
+                loaded.append(os.path.splitext(entry)[0])
+        return loaded
+
+    def names(self):
+        with self.lock:
+            return list(self.portfolios)
+
+    def _changed(self):
+        self.version += 1
+        self._stacked = None
+        self._valuations.clear()
+
+    def _stack(self):
+        """Flat position arrays of every portfolio, rebuilt after holdings change"""
+        if self._stacked is None:
+            names = list(self.portfolios)
+            frames = [self.portfolios[name] for name in names]
+            sizes = [len(frame) for frame in frames]
+            symbols = np.concatenate([frame['symbol'].to_numpy(dtype=object) for frame in frames]) if frames else np.empty(0, dtype=object)
+            self._stacked = {
+                'names': names,
+                'offsets': np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64),
+                'portfolio': np.repeat(np.arange(len(names)), sizes),
+                'symbols': symbols,
+                'codes': self._codes(symbols),
+                'quantity': np.concatenate([frame['quantity'].to_numpy(dtype=np.float64) for frame in frames]) if frames else np.empty(0),
+                'cost': np.concatenate([frame['cost'].to_numpy(dtype=np.float64) for frame in frames]) if frames else np.empty(0),
+            }
+        return self._stacked
+
+    def _quote(self, batch_key, df):
+        """Price, LDCP and sector code per symbol code for a batch (once per batch)"""
+        quote = self._quotes.get(batch_key)
+        if quote is not None and quote['size'] >= len(self.symbols):
+            self._quotes.move_to_end(batch_key)
+            return quote
+
+        batch = df.drop_duplicates('symbol', keep='last')
+        codes = self._codes(batch['symbol'].astype(str).str.upper().tolist())
+        size = len(self.symbols)
+        price = np.full(size, np.nan)
+        price[codes] = pd.to_numeric(batch['current_price'], errors='coerce').to_numpy(dtype=np.float64)
+        ldcp = np.full(size, np.nan)
+        if 'ldcp' in batch.columns:
+            ldcp[codes] = pd.to_numeric(batch['ldcp'], errors='coerce').to_numpy(dtype=np.float64)
+        elif 'change' in batch.columns:
+            ldcp[codes] = price[codes] - pd.to_numeric(batch['change'], errors='coerce').to_numpy(dtype=np.float64)
+
+        sectors = batch['sector'].fillna(UNKNOWN_SECTOR) if 'sector' in batch.columns else pd.Series(UNKNOWN_SECTOR, index=batch.index)
+        sector_codes, sector_names = pd.factorize(sectors.astype(str))
+        labels = list(sector_names)
+        if UNKNOWN_SECTOR not in labels:
+            labels.append(UNKNOWN_SECTOR)
+        sector = np.full(size, labels.index(UNKNOWN_SECTOR), dtype=np.int64)
+        sector[codes] = sector_codes
+
+        quote = {'size': size, 'price': price, 'ldcp': ldcp, 'sector': sector, 'sectors': labels}
+        self._quotes[batch_key] = quote
+        self._quotes.move_to_end(batch_key)
+        while len(self._quotes) > self.max_batches:
+            self._quotes.popitem(last=False)
+        return quote
+
+    def mark(self, batch_key, df):
+        """Valuation of every portfolio against a batch (cached per batch and holdings)"""
+        with self.lock:
+            cached = self._valuations.get(batch_key)
+            if cached is not None:
+                self._valuations.move_to_end(batch_key)
+                return cached
+
+            stacked = self._stack()
+            quote = self._quote(batch_key, df)
+            valuation = self._value(stacked, quote)
+            self._valuations[batch_key] = valuation
+            while len(self._valuations) > self.max_batches:
+                self._valuations.popitem(last=False)
+            return valuation
+
+    @staticmethod
+    def _value(stacked, quote):
+        """One vectorized pass over every position of every portfolio"""
+        codes = stacked['codes']
+        portfolio = stacked['portfolio']
+        quantity = stacked['quantity']
+        cost = stacked['cost']
+        n_portfolios = len(stacked['names'])
+
+        price = quote['price'][codes]
+        ldcp = quote['ldcp'][codes]
+        priced = np.isfinite(price)
+        # Symbols missing from the batch are carried at cost
+        mark = np.where(priced, price, cost)
+        previous = np.where(priced & np.isfinite(ldcp), ldcp, mark)
+
+        value = quantity * mark
+        basis = quantity * cost
+        day_pnl = value - quantity * previous
+
+        total_value = np.bincount(portfolio, value, n_portfolios)
+        total_basis = np.bincount(portfolio, basis, n_portfolios)
+        total_day = np.bincount(portfolio, day_pnl, n_portfolios)
+        total_previous = np.bincount(portfolio, quantity * previous, n_portfolios)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            columns = {
+                'quantity': quantity,
+                'cost': cost,
+                'price': price,
+                'value': value,
+                'weight_pct': value / total_value[portfolio] * 100.0,
+                'unrealized_pnl': value - basis,
+                'unrealized_pct': (mark / cost - 1.0) * 100.0,
+                'day_pnl': day_pnl,
+                'day_change_pct': (mark / previous - 1.0) * 100.0,
+                # Share of the portfolio's day return contributed by the position
+                'contribution_pct': day_pnl / total_previous[portfolio] * 100.0,
+                'sector': np.asarray(quote['sectors'], dtype=object)[quote['sector'][codes]],
+                'priced': priced,
+            }
+            totals = {
+                'value': total_value,
+                'cost_basis': total_basis,
+                'unrealized_pnl': total_value - total_basis,
+                'unrealized_pct': (total_value / total_basis - 1.0) * 100.0,
+                'day_pnl': total_day,
+                'day_return_pct': total_day / total_previous * 100.0,
+                'positions': np.bincount(portfolio, minlength=n_portfolios),
+                'unpriced': np.bincount(portfolio, ~priced, n_portfolios).astype(np.int64),
+            }
+
+            n_sectors = len(quote['sectors'])
+            exposure = np.bincount(
+                portfolio * n_sectors + quote['sector'][codes], value, n_portfolios * n_sectors
+            ).reshape(n_portfolios, n_sectors)
+            exposure = exposure / total_value[:, None] * 100.0
+
+        return Valuation(stacked['names'], stacked['offsets'], stacked['symbols'], columns, totals, quote['sectors'], exposure)
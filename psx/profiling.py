@@ -0,0 +1,26 @@
+import os
+import sys
+import time
+
+# Set PSX_PROFILE_STARTUP=1 to print boot stage timings to stderr
+PROFILE_ENV = 'PSX_PROFILE_STARTUP'
+
+
+class BootProfile:
+    """Wall-clock marks for the stages of one script run"""
+
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.marks = []
+        self.enabled = os.getenv(PROFILE_ENV) == '1'
+
+    def mark(self, stage):
+        """Record the time since the run started for a named stage"""
+        elapsed_ms = (time.perf_counter() - self.started) * 1000.0
+        self.marks.append((stage, elapsed_ms))
+        if self.enabled:
+            print(f"[boot] {stage}: {elapsed_ms:.1f} ms", file=sys.stderr, flush=True)
+        return elapsed_ms
+
+    def as_dict(self):
+        return dict(self.marks)
@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+# Alternative column names seen from different scraper versions
+COLUMN_ALIASES = {
+    'open': 'open_price',
+    'current': 'current_price',
+    'change_pct': 'change_percent',
+    'change(%)': 'change_percent',
+}
+
+NUMERIC_COLUMNS = ['ldcp', 'open_price', 'high', 'low', 'current_price', 'change', 'change_percent', 'volume']
+TEXT_COLUMNS = ['symbol', 'sector', 'listed_in']
+
+# Bit flags stored per row in the ``quality_flags`` column
+FLAG_OHLC = 1
+FLAG_ZERO_VOLUME = 2
+FLAG_STALE = 4
+FLAG_MISSING_PRICE = 8
+
+FLAG_LABELS = {
+    FLAG_OHLC: 'OHLC inconsistent',
+    FLAG_ZERO_VOLUME: 'Zero volume',
+    FLAG_STALE: 'Stale (unchanged since previous batch)',
+    FLAG_MISSING_PRICE: 'Missing price',
+}
+
+
+def _to_number(series):
+    """Coerce a column to float, accepting strings such as '1,234.50'"""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(np.float64)
+    cleaned = series.astype('string').str.replace(',', '', regex=False).str.strip()
+    return pd.to_numeric(cleaned, errors='coerce').astype(np.float64)
+
+
+def normalize_schema(df):
+    """Canonical column names and dtypes for raw stock_data rows"""
+    renames = {}
+    for alias, canonical in COLUMN_ALIASES.items():
+        if alias in df.columns and canonical not in df.columns:
+            renames[alias] = canonical
+    df = df.rename(columns=renames)
+
+    # A later scraper may send both names; keep the canonical one
+    df = df.drop(columns=[alias for alias in COLUMN_ALIASES if alias in df.columns])
+
+    for column in NUMERIC_COLUMNS:
+        if column in df.columns:
+            df[column] = _to_number(df[column])
+
+    for column in TEXT_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('string').str.strip().astype(object)
+    if 'symbol' in df.columns:
+        df['symbol'] = df['symbol'].str.upper()
+
+    return df
+
+
+class QualityReport:
+    """Summary of the validation run for one batch (or a multi-batch fetch)"""
+
+    def __init__(self, rows_in, duplicates, flags):
+        self.rows_in = rows_in
+        self.duplicates = duplicates
+        self.rows_out = len(flags)
+        self.counts = {label: int(np.count_nonzero(flags & bit)) for bit, label in FLAG_LABELS.items()}
+        self.clean_rows = int(np.count_nonzero(flags == 0))
+
+    @property
+    def issues(self):
+        return self.duplicates + sum(self.counts.values())
+
+    @classmethod
+    def from_dict(cls, values):
+        """Rebuild a report from its ``as_dict`` summary"""
+        report = cls.__new__(cls)
+        report.rows_in = values['rows_in']
+        report.duplicates = values['duplicates_dropped']
+        report.rows_out = values['rows_out']
+        report.clean_rows = values['clean_rows']
+        report.counts = {label: values.get(label, 0) for label in FLAG_LABELS.values()}
+        return report
+
+    def as_dict(self):
+        return {
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'duplicates_dropped': self.duplicates,
+            'clean_rows': self.clean_rows,
+            **self.counts,
+        }
+
+
+def validate_batch(df, previous=None, batch_column=None):
+    """Normalize, de-duplicate and flag a fetched batch in one vectorized pass
+
+    Duplicate symbols are resolved per batch (``batch_column`` distinguishes
+    batches when several are fetched together), keeping the latest scrape.
+    Rows are flagged rather than dropped for OHLC inconsistencies, zero or
+    missing volume, missing prices and price and volume unchanged since the
+    symbol's previous batch (within the fetch, or the ``previous`` frame for
+    a single batch). The report is attached to ``df.attrs['quality']``.
+    """
+    if df is None or df.empty:
+        return df
+
+    rows_in = len(df)
+    df = normalize_schema(df)
+
+    # Duplicate symbols inside a batch: keep the most recent scrape
+    keys = ['symbol'] if batch_column is None else [batch_column, 'symbol']
+    duplicates = 0
+    if 'symbol' in df.columns:
+        if 'scraped_at' in df.columns:
+            df = df.sort_values('scraped_at', kind='stable')
+        duplicated = df.duplicated(subset=keys, keep='last').to_numpy()
+        duplicates = int(np.count_nonzero(duplicated))
+        if duplicates:
+            df = df[~duplicated]
+        df = df.reset_index(drop=True)
+
+    n = len(df)
+    nan = np.full(n, np.nan)
+    current = df['current_price'].to_numpy() if 'current_price' in df.columns else nan
+    high = df['high'].to_numpy() if 'high' in df.columns else nan
+    low = df['low'].to_numpy() if 'low' in df.columns else nan
+    volume = df['volume'].to_numpy() if 'volume' in df.columns else nan
+
+    flags = np.zeros(n, dtype=np.int8)
+    with np.errstate(invalid='ignore'):
+        ohlc_bad = (low > high) | (current < low) | (current > high)
+        if 'open_price' in df.columns:
+            open_price = df['open_price'].to_numpy()
+            ohlc_bad |= (open_price < low) | (open_price > high)
+    flags |= np.where(ohlc_bad, FLAG_OHLC, 0).astype(np.int8)
+    flags |= np.where(np.isnan(volume) | (volume == 0), FLAG_ZERO_VOLUME, 0).astype(np.int8)
+    flags |= np.where(np.isnan(current) | (current <= 0), FLAG_MISSING_PRICE, 0).astype(np.int8)
+
+    if batch_column is not None and 'symbol' in df.columns:
+        # Compare each row with the same symbol's row in the preceding batch
+        symbol_codes = pd.factorize(df['symbol'])[0]
+        batch_codes = pd.factorize(df[batch_column], sort=True)[0]
+        order = np.lexsort((batch_codes, symbol_codes))
+        sorted_codes = symbol_codes[order]
+        same_symbol = np.zeros(n, dtype=bool)
+        same_symbol[1:] = (sorted_codes[1:] == sorted_codes[:-1]) & (sorted_codes[1:] >= 0)
+        prior_price = np.full(n, np.nan)
+        prior_volume = np.full(n, np.nan)
+        prior_price[1:] = current[order][:-1]
+        prior_volume[1:] = volume[order][:-1]
+        stale_sorted = same_symbol & (current[order] == prior_price) & (volume[order] == prior_volume)
+        stale = np.zeros(n, dtype=bool)
+        stale[order] = stale_sorted
+        flags |= np.where(stale, FLAG_STALE, 0).astype(np.int8)
+    elif previous is not None and not previous.empty and 'symbol' in df.columns:
+        prior = previous.drop_duplicates('symbol', keep='last').set_index('symbol')
+        positions = prior.index.get_indexer(df['symbol'])
+        found = positions >= 0
+        prior_price = np.where(found, prior['current_price'].to_numpy()[positions], np.nan) if 'current_price' in prior.columns else nan
+        prior_volume = np.where(found, prior['volume'].to_numpy()[positions], np.nan) if 'volume' in prior.columns else nan
+        stale = found & (current == prior_price) & (volume == prior_volume)
+        flags |= np.where(stale, FLAG_STALE, 0).astype(np.int8)
+
+    df['quality_flags'] = flags
+    df.attrs['quality'] = QualityReport(rows_in, duplicates, flags)
+    return df
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+
+from psx.history import batch_bucket
+
+# Seconds without new rows after which an open batch counts as complete
+BATCH_QUIET_SECONDS = 15.0
+
+
+def insert_record(payload):
+    """Inserted row from a Supabase postgres_changes payload (or a bare row)"""
+    if not isinstance(payload, dict):
+        return None
+    data = payload.get('data', payload)
+    if 'record' not in data:
+        # Already a plain row, as sent by simple publishers
+        return data if 'scraped_at' in data else None
+    if data.get('type', 'INSERT') != 'INSERT':
+        return None
+    return data.get('record')
+
+
+class BatchCoalescer:
+    """Group inserted rows into 5-minute batches and report completed ones
+
+    A batch is complete once rows of a newer batch arrive (the scraper
+    finishes one snapshot before starting the next) or after ``quiet``
+    seconds without new rows for it. Late rows reopen their batch, which is
+    then reported again with just those rows (``DataManager.ingest_batch``
+    merges them into the cached batch).
+    """
+
+    def __init__(self, quiet=BATCH_QUIET_SECONDS, clock=time.monotonic):
+        self.quiet = quiet
+        self.clock = clock
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        bucket = batch_bucket([record['scraped_at']])[0]
+        with self._lock:
+            rows, _ = self._open.get(bucket, ([], None))
+            rows.append(record)
+            self._open[bucket] = (rows, self.clock())
+
+    def pending(self):
+        with self._lock:
+            return {bucket: len(rows) for bucket, (rows, _) in self._open.items()}
+
+    def complete(self):
+        """(batch_time, rows) for every batch that is now complete, oldest first"""
+        now = self.clock()
+        with self._lock:
+            if not self._open:
+                return []
+            newest = max(self._open)
+            done = sorted(
+                bucket for bucket, (_, last_seen) in self._open.items()
+                if bucket < newest or now - last_seen >= self.quiet
+            )
+            batches = [(bucket, pd.DataFrame(self._open.pop(bucket)[0])) for bucket in done]
+        return batches
+
+
+class WebSocketSource:
+    """Insert notifications from a websocket sending JSON payloads
+
+    Each message is a Supabase-style postgres_changes payload or a bare row;
+    ``python -m psx.realtime_stub`` serves this format locally.
+    """
+
+    name = 'websocket'
+
+    def __init__(self, uri):
+        self.uri = uri
+
+    def run(self, on_payload, stop):
+        asyncio.run(self._consume(on_payload, stop))
+
+    async def _consume(self, on_payload, stop):
+        from websockets.asyncio.client import connect
+
+        async with connect(self.uri) as socket:
+            while not stop.is_set():
+                try:
+                    message = await asyncio.wait_for(socket.recv(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    continue
+                on_payload(json.loads(message))
+
+
+class SupabaseRealtimeSource:
+    """INSERT notifications on the stock_data table via Supabase Realtime"""
+
+    name = 'supabase'
+
+    def __init__(self, url, key, table='stock_data'):
+        self.url = url
+        self.key = key
+        self.table = table
+
+    @classmethod
+    def from_env(cls):
+        supabase_url = os.getenv("SUPABASE_URL")
+        supabase_key = os.getenv("SUPABASE_KEY")
+        if not supabase_url or not supabase_key:
+            return None
+        return cls(supabase_url, supabase_key)
+
+    def run(self, on_payload, stop):
+        asyncio.run(self._consume(on_payload, stop))
+
+    async def _consume(self, on_payload, stop):
+        # Imported lazily; the async client is only needed by the listener thread
+        from supabase import acreate_client
+
+        client = await acreate_client(self.url, self.key)
+        channel = client.channel(f"{self.table}-inserts")
+        channel.on_postgres_changes('INSERT', schema='public', table=self.table, callback=on_payload)
+        await channel.subscribe()
+        try:
+            while not stop.is_set():
+                await asyncio.sleep(1.0)
+        finally:
+            await client.remove_channel(channel)
+
+
+def create_source(spec=None):
+    """Notification source from PSX_REALTIME: 'supabase', a ws:// URI, or off"""
+    spec = spec if spec is not None else os.getenv("PSX_REALTIME", "")
+    if not spec or spec.lower() in ('0', 'off', 'false'):
+        return None
+    if spec.lower() == 'supabase':
+        return SupabaseRealtimeSource.from_env()
+    if spec.startswith(('ws://', 'wss://')):
+        return WebSocketSource(spec)
+    raise ValueError(f"Unknown realtime source: {spec}")
+
+
+class RealtimeListener:
+    """One per process: turns insert notifications into batch-complete events
+
+    A source thread feeds inserted rows into a ``BatchCoalescer`` and a
+    ticker thread hands each completed batch to ``DataManager.ingest_batch``
+    (which caches it), then bumps ``version``. Sessions poll ``version``
+    to rerun only when a new batch has landed. The source is reconnected
+    with exponential backoff when it fails.
+    """
+
+    def __init__(self, data_manager, source, quiet=BATCH_QUIET_SECONDS, tick=1.0, clock=time.monotonic):
+        self.data_manager = data_manager
+        self.source = source
+        self.tick = tick
+        self.coalescer = BatchCoalescer(quiet, clock)
+        self.version = 0
+        self.latest_batch = None
+        self.events = deque(maxlen=100)
+        self.status = {'state': 'starting', 'received': 0, 'error': None}
+        self._subscribers = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """Call ``callback(batch_time, df)`` for every completed batch"""
+        self._subscribers.append(callback)
+
+    def start(self):
+        threading.Thread(target=self._listen, name="realtime-listener", daemon=True).start()
+        threading.Thread(target=self._ticker, name="realtime-batches", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def on_payload(self, payload):
+        record = insert_record(payload)
+        if record is None or 'scraped_at' not in record:
+            return
+        self.coalescer.add(record)
+        with self._lock:
+            self.status['received'] += 1
+
+    def flush(self):
+        """Publish every batch the coalescer considers complete"""
+        published = []
+        for bucket, rows in self.coalescer.complete():
+            df = self.data_manager.ingest_batch(rows)
+            if df is None:
+                continue
+            with self._lock:
+                self.version += 1
+                self.latest_batch = df['scraped_at'].max()
+                self.events.append((self.version, self.latest_batch, len(df)))
+            for callback in list(self._subscribers):
+                callback(self.latest_batch, df)
+            published.append(bucket)
+        return published
+
+    def _listen(self):
+        delay = 1.0
+        while not self._stop.is_set():
+            try:
+                with self._lock:
+                    self.status['state'] = 'listening'
+                self.source.run(self.on_payload, self._stop)
+                delay = 1.0
+            except Exception as e:
+                with self._lock:
+                    self.status.update(state='reconnecting', error=str(e))
+                delay = min(delay * 2, 60.0)
+            self._stop.wait(delay)
+        self.status['state'] = 'stopped'
+
+    def _ticker(self):
+        while not self._stop.wait(self.tick):
+            try:
+                self.flush()
+            except Exception as e:
+                with self._lock:
+                    self.status['error'] = str(e)
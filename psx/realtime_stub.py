@@ -0,0 +1,93 @@
+"""Local stand-in for Supabase Realtime inserts on stock_data
+
+Serves a websocket that broadcasts synthetic scraper batches as
+postgres_changes INSERT payloads, one message per row. Batches are stamped
+on the 5-minute scraper grid starting at the current slot and advance one
+slot per publish, so ``--interval`` compresses time for testing. Point the app at it with PSX_REALTIME=ws://127.0.0.1:8765
+(and PSX_DATA_BACKEND=memory or parquet to work fully offline).
+
+Usage:
+    python -m psx.realtime_stub [--port 8765] [--interval 10] [--symbols 200]
+"""
+import argparse
+import asyncio
+import json
+
+import pandas as pd
+
+from psx.data.synthetic import synthetic_session
+from psx.history import BATCH_FREQ
+
+
+def insert_payload(record, table='stock_data'):
+    """Row wrapped the way Supabase Realtime delivers an INSERT"""
+    return {
+        'data': {
+            'schema': 'public',
+            'table': table,
+            'type': 'INSERT',
+            'commit_timestamp': record['scraped_at'],
+            'errors': None,
+            'record': record,
+        },
+        'ids': [],
+    }
+
+
+def batch_records(rows, scraped_at):
+    """One synthetic batch as JSON-ready rows stamped with ``scraped_at``"""
+    batch = rows.drop(columns=['id', 'created_at'], errors='ignore').copy()
+    batch['scraped_at'] = scraped_at.isoformat()
+    return batch.to_dict(orient='records')
+
+
+class StubServer:
+    """Broadcast a new synthetic batch to every client every ``interval`` seconds"""
+
+    def __init__(self, interval=10.0, n_symbols=200, n_batches=72):
+        self.interval = interval
+        self.start = pd.Timestamp.now(tz='UTC').floor(BATCH_FREQ)
+        self.session = synthetic_session(n_symbols=n_symbols, n_batches=n_batches)
+        self.batches = [rows for _, rows in self.session.groupby('scraped_at', sort=True)]
+        self.clients = set()
+
+    async def handler(self, socket):
+        self.clients.add(socket)
+        try:
+            await socket.wait_closed()
+        finally:
+            self.clients.discard(socket)
+
+    async def publish(self, index):
+        scraped_at = self.start + index * pd.Timedelta(BATCH_FREQ) + pd.Timedelta(seconds=7)
+        messages = [json.dumps(insert_payload(record)) for record in batch_records(self.batches[index % len(self.batches)], scraped_at)]
+        for socket in list(self.clients):
+            for message in messages:
+                await socket.send(message)
+        return len(messages)
+
+    async def serve(self, host, port):
+        from websockets.asyncio.server import serve
+
+        async with serve(self.handler, host, port):
+            print(f"Realtime stub on ws://{host}:{port}, a batch every {self.interval:g}s")
+            index = 0
+            while True:
+                await asyncio.sleep(self.interval)
+                sent = await self.publish(index)
+                print(f"batch {index}: {sent} rows to {len(self.clients)} client(s)")
+                index += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--interval', type=float, default=10.0)
+    parser.add_argument('--symbols', type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(StubServer(args.interval, args.symbols).serve(args.host, args.port))
+
+
+if __name__ == '__main__':
+    main()
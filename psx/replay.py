@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+from psx.timestamps import PKT_TZ
+
+# Upper bound on animation frames; longer sessions are decimated evenly
+REPLAY_FRAME_BUDGET = 36
+
+# Largest marker diameter in pixels, as in the single-batch scatter
+REPLAY_MAX_MARKER = 20
+
+
+def frame_columns(n_batches, budget=REPLAY_FRAME_BUDGET):
+    """Evenly spaced batch columns within the budget, keeping the first and last"""
+    if n_batches <= budget:
+        return np.arange(n_batches)
+    return np.unique(np.linspace(0, n_batches - 1, budget).round().astype(np.int64))
+
+
+def replay_frames(history, budget=REPLAY_FRAME_BUDGET, symbols=None):
+    """Change-vs-volume scatter data for every replay frame in one pass
+
+    Slices the session's volume, change and price matrices at the decimated
+    batch columns, so each field is a (frames, symbols) array. Symbols with
+    no data in any kept batch are dropped. ``symbols`` restricts the replay
+    to a subset (e.g. the current filter).
+    """
+    with history.lock:
+        cols = frame_columns(history.n_batches, budget)
+        if symbols is None:
+            rows = np.arange(history.n_symbols)
+        else:
+            rows = np.array([history.symbol_index[s] for s in symbols if s in history.symbol_index], dtype=np.int64)
+        labels = [history.symbols[row] for row in rows]
+        times = [history.batch_times[col] for col in cols]
+        grid = np.ix_(rows, cols)
+        volume = history.matrix('volume')[grid].T
+        change = history.matrix('change_percent')[grid].T
+        price = history.matrix('current_price')[grid].T
+
+    present = ~np.all(np.isnan(volume) | np.isnan(change), axis=0)
+    return {
+        'times': pd.DatetimeIndex(times).tz_convert(PKT_TZ),
+        'symbols': np.asarray(labels, dtype=object)[present],
+        'volume': volume[:, present],
+        'change': change[:, present],
+        'price': np.nan_to_num(price[:, present], nan=0.0).clip(min=0),
+    }
+
+
+def _span(values, pad=0.05, symmetric=False):
+    """Axis range covering every frame, so points move against fixed axes"""
+    finite = values[np.isfinite(values)]
+    if finite.size == 0:
+        return [0, 1]
+    if symmetric:
+        bound = max(abs(finite.min()), abs(finite.max()), 1e-9) * (1 + pad)
+        return [-bound, bound]
+    low, high = finite.min(), finite.max()
+    margin = (high - low) * pad or 1.0
+    return [low - margin, high + margin]
+
+
+def replay_figure(history, budget=REPLAY_FRAME_BUDGET, symbols=None, duration=300):
+    """Animated change-vs-volume scatter for a session as a Plotly figure dict
+
+    Frames only carry the per-batch arrays; marker scaling, colour range and
+    axes are fixed once for the whole day. Points are keyed by symbol
+    (``ids``) so Plotly tweens each stock between batches. Returns None when
+    the session has no batches.
+    """
+    data = replay_frames(history, budget, symbols)
+    if len(data['times']) == 0:
+        return None
+
+    labels = [t.strftime('%H:%M') for t in data['times']]
+    sizeref = 2.0 * max(data['price'].max(), 1e-9) / (REPLAY_MAX_MARKER ** 2)
+    color_range = _span(data['change'], pad=0, symmetric=True)
+
+    def trace(i):
+        return {
+            'type': 'scatter',
+            'mode': 'markers',
+            'ids': data['symbols'],
+            'x': data['volume'][i],
+            'y': data['change'][i],
+            'hovertext': data['symbols'],
+            'hovertemplate': "<b>%{hovertext}</b><br>Change(%)=%{y}<br>Volume=%{x}<extra></extra>",
+            'marker': {
+                'size': data['price'][i],
+                'sizemode': 'area',
+                'sizeref': sizeref,
+                'sizemin': 2,
+                'color': data['change'][i],
+                'colorscale': 'RdYlGn',
+                'cmin': color_range[0],
+                'cmax': color_range[1],
+                'showscale': True,
+                'colorbar': {'title': {'text': 'Change(%)'}},
+            },
+        }
+
+    frames = [{'name': label, 'data': [trace(i)]} for i, label in enumerate(labels)]
+    animate = {'frame': {'duration': duration, 'redraw': False}, 'transition': {'duration': duration // 2}, 'fromcurrent': True}
+    layout = {
+        'title': {'text': '🎬 Session Replay: Change % vs Volume'},
+        'xaxis': {'title': {'text': 'Volume'}, 'range': _span(data['volume'])},
+        'yaxis': {'title': {'text': 'Change %'}, 'range': _span(data['change'])},
+        'updatemenus': [{
+            'type': 'buttons', 'showactive': False, 'x': 0, 'y': -0.15, 'xanchor': 'left',
+            'buttons': [
+                {'label': '▶ Play', 'method': 'animate', 'args': [None, animate]},
+                {'label': '⏸ Pause', 'method': 'animate',
+                 'args': [[None], {'frame': {'duration': 0, 'redraw': False}, 'mode': 'immediate'}]},
+            ],
+        }],
+        'sliders': [{
+            'active': len(labels) - 1, 'x': 0.15, 'len': 0.85, 'y': -0.1,
+            'currentvalue': {'prefix': 'Batch '},
+            'steps': [
+                {'label': label, 'method': 'animate',
+                 'args': [[label], {'frame': {'duration': 0, 'redraw': False}, 'mode': 'immediate'}]}
+                for label in labels
+            ],
+        }],
+    }
+    # The figure opens on the last frame, matching the slider position
+    return {'data': [trace(len(labels) - 1)], 'frames': frames, 'layout': layout}
@@ -0,0 +1,502 @@
+"""Stock screener expressions compiled to vectorized predicates
+
+A screen is a boolean expression over batch columns and derived
+indicators, for example::
+
+    change_pct > 3 and volume_ratio_12 > 2 and sector == "CEMENT"
+    between(rsi_14, 30, 45) and price > sma_20
+    sector in ("CEMENT", "FERTILIZER") and not symbol == "LUCK"
+
+Numbers support ``+ - * / ** %``, ``abs``, ``min``, ``max``, ``sqrt``,
+``log`` and ``between(x, lo, hi)``; conditions combine with ``and``,
+``or`` and ``not``. Text columns (``symbol``, ``sector``, ``listed_in``)
+are compared with ``==``, ``!=``, ``in`` and ``not in`` against string
+literals.
+
+Derived indicators take a window in batches (5-minute intervals of the
+session), e.g. ``sma_20`` or ``avg_volume_12``; see ``INDICATORS``.
+Volume in a snapshot is the day's cumulative volume, so interval
+indicators work on batch-to-batch differences.
+
+An expression is parsed and type-checked once, then compiled to a single
+array expression evaluated with numexpr when it is installed and NumPy
+otherwise. Text tests are resolved to boolean masks first, so the numeric
+part never touches strings.
+"""
+import ast
+import json
+import os
+import re
+import threading
+import warnings
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from psx.indicators import average_volume, ema, forward_fill, interval_volume, rsi_series, volume_ratio
+from psx.jsonfile import file_lock, write_json
+
+# Evaluation engine: 'auto' (numexpr when installed), 'numexpr' or 'numpy'
+SCREEN_ENGINE = os.getenv("PSX_SCREEN_ENGINE", "auto")
+
+# Numeric batch fields: screen name -> batch column
+FIELDS = {
+    'price': 'current_price',
+    'open': 'open_price',
+    'high': 'high',
+    'low': 'low',
+    'ldcp': 'ldcp',
+    'change': 'change',
+    'change_pct': 'change_percent',
+    'volume': 'volume',
+}
+# Column names are accepted as well
+FIELDS.update({column: column for column in list(FIELDS.values())})
+# Derived from batch columns
+COMPUTED = {
+    'turnover': ('current_price', 'volume'),
+}
+TEXT_FIELDS = ('symbol', 'sector', 'listed_in')
+
+# Windowed indicators ("<name>_<batches>"): description
+INDICATORS = {
+    'sma': 'Mean price over the window',
+    'ema': 'Exponential moving average of price',
+    'rsi': "Wilder's RSI of batch prices",
+    'return': 'Price change (%) over the window',
+    'high': 'Highest price over the window',
+    'low': 'Lowest price over the window',
+    'volatility': 'Std of batch-to-batch returns (%)',
+    'avg_volume': 'Mean interval volume over the window before the latest interval',
+    'volume_ratio': 'Latest interval volume over avg_volume',
+}
+# Indicators without a window
+INTERVAL_INDICATORS = {
+    'interval_volume': 'Volume traded in the latest 5-minute interval',
+}
+MAX_WINDOW = 288
+_INDICATOR_NAME = re.compile(r'^(%s)_(\d+)$' % '|'.join(sorted(INDICATORS, key=len, reverse=True)))
+
+# Ready-made screens offered next to the saved ones
+PRESET_SCREENS = {
+    'Strong gainers': 'change_pct > 3',
+    'Volume surge': 'volume_ratio_12 > 3 and interval_volume > 10000',
+    'Breakout': 'price >= high_36 and change_pct > 0 and volume_ratio_12 > 1.5',
+    'Oversold': 'rsi_14 < 30',
+    'Above trend': 'price > sma_20 and sma_20 > sma_60',
+}
+
+_FUNCTIONS = {'abs': 1, 'sqrt': 1, 'log': 1, 'min': 2, 'max': 2, 'between': 3}
+_COMPARE = {ast.Gt: '>', ast.GtE: '>=', ast.Lt: '<', ast.LtE: '<=', ast.Eq: '==', ast.NotEq: '!='}
+_ARITHMETIC = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/', ast.Pow: '**', ast.Mod: '%'}
+_NUMPY_NAMESPACE = {'__builtins__': {}, 'where': np.where, 'abs': np.abs, 'sqrt': np.sqrt, 'log': np.log}
+
+
+class ScreenError(ValueError):
+    """A screen expression that cannot be parsed or evaluated"""
+
+
+def _numexpr():
+    """The numexpr module, or None when it is not installed or disabled"""
+    if SCREEN_ENGINE == 'numpy':
+        return None
+    try:
+        import numexpr
+    except ImportError:
+        if SCREEN_ENGINE == 'numexpr':
+            raise
+        return None
+    return numexpr
+
+
+class _Compiler(ast.NodeVisitor):
+    """Type-checks a parsed screen and emits one array expression
+
+    Every node returns (kind, text) where kind is 'num' or 'bool'. Batch
+    fields and indicators become variables ``v<i>``; text tests become
+    precomputed masks ``m<i>``.
+    """
+
+    def __init__(self):
+        self.variables = OrderedDict()
+        self.masks = []
+
+    def _variable(self, name):
+        if name not in self.variables:
+            self.variables[name] = f"v{len(self.variables)}"
+        return self.variables[name]
+
+    def generic_visit(self, node):
+        raise ScreenError(f"Unsupported syntax: {ast.unparse(node)}")
+
+    def visit_Expression(self, node):
+        return self.visit(node.body)
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ScreenError(f"Unexpected literal {node.value!r}; text is only compared with symbol, sector or listed_in")
+        return 'num', repr(float(node.value))
+
+    def visit_Name(self, node):
+        name = node.id
+        if name in TEXT_FIELDS:
+            raise ScreenError(f"'{name}' is text; compare it with == / != / in")
+        if name in FIELDS or name in COMPUTED or name in INTERVAL_INDICATORS:
+            return 'num', self._variable(name)
+        match = _INDICATOR_NAME.match(name)
+        if match:
+            window = int(match.group(2))
+            if not 1 <= window <= MAX_WINDOW:
+                raise ScreenError(f"Window of {name} must be between 1 and {MAX_WINDOW} batches")
+            return 'num', self._variable(name)
+        raise ScreenError(f"Unknown field or indicator: {name}")
+
+    def visit_UnaryOp(self, node):
+        kind, text = self.visit(node.operand)
+        if isinstance(node.op, ast.Not):
+            self._expect('bool', kind, 'not')
+            return 'bool', f"(~{text})"
+        if isinstance(node.op, (ast.USub, ast.UAdd)):
+            self._expect('num', kind, 'a sign')
+            return 'num', f"({'-' if isinstance(node.op, ast.USub) else '+'}{text})"
+        return self.generic_visit(node)
+
+    def visit_BinOp(self, node):
+        op = _ARITHMETIC.get(type(node.op))
+        if op is None:
+            return self.generic_visit(node)
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        self._expect('num', left[0], op)
+        self._expect('num', right[0], op)
+        return 'num', f"({left[1]} {op} {right[1]})"
+
+    def visit_BoolOp(self, node):
+        op = ' & ' if isinstance(node.op, ast.And) else ' | '
+        parts = []
+        for value in node.values:
+            kind, text = self.visit(value)
+            self._expect('bool', kind, 'and' if op == ' & ' else 'or')
+            parts.append(text)
+        return 'bool', f"({op.join(parts)})"
+
+    def visit_Compare(self, node):
+        operands = [node.left] + list(node.comparators)
+        if any(self._text_field(operand) for operand in operands):
+            if len(node.ops) != 1:
+                raise ScreenError("Text comparisons cannot be chained")
+            return self._text_test(node.left, node.ops[0], node.comparators[0])
+
+        # Chained comparisons (a < b < c) become a conjunction
+        if any(type(op) not in _COMPARE for op in node.ops):
+            raise ScreenError("'in' only applies to symbol, sector or listed_in")
+        parts = []
+        texts = [self.visit(operand) for operand in operands]
+        for i, op in enumerate(node.ops):
+            symbol = _COMPARE[type(op)]
+            self._expect('num', texts[i][0], symbol)
+            self._expect('num', texts[i + 1][0], symbol)
+            parts.append(f"({texts[i][1]} {symbol} {texts[i + 1][1]})")
+        return 'bool', parts[0] if len(parts) == 1 else f"({' & '.join(parts)})"
+
+    def visit_Call(self, node):
+        name = node.func.id if isinstance(node.func, ast.Name) else None
+        if name not in _FUNCTIONS:
+            raise ScreenError(f"Unknown function: {ast.unparse(node.func)}")
+        if node.keywords or len(node.args) != _FUNCTIONS[name]:
+            raise ScreenError(f"{name}() takes {_FUNCTIONS[name]} argument(s)")
+        args = []
+        for arg in node.args:
+            kind, text = self.visit(arg)
+            self._expect('num', kind, f"{name}()")
+            args.append(text)
+        if name == 'between':
+            return 'bool', f"(({args[0]} >= {args[1]}) & ({args[0]} <= {args[2]}))"
+        if name in ('min', 'max'):
+            op = '<' if name == 'min' else '>'
+            return 'num', f"where({args[0]} {op} {args[1]}, {args[0]}, {args[1]})"
+        return 'num', f"{name}({args[0]})"
+
+    @staticmethod
+    def _text_field(node):
+        return isinstance(node, ast.Name) and node.id in TEXT_FIELDS
+
+    def _text_test(self, left, op, right):
+        if not self._text_field(left):
+            left, right = right, left
+            if isinstance(op, (ast.In, ast.NotIn)) or not self._text_field(left):
+                raise ScreenError("Write text tests as <field> == \"value\" or <field> in (...)")
+        if isinstance(op, (ast.Eq, ast.NotEq)):
+            values = [right]
+        elif isinstance(op, (ast.In, ast.NotIn)) and isinstance(right, (ast.Tuple, ast.List, ast.Set)):
+            values = right.elts
+        else:
+            raise ScreenError(f"{left.id} supports ==, !=, in and not in")
+        if not values or not all(isinstance(v, ast.Constant) and isinstance(v.value, str) for v in values):
+            raise ScreenError(f"{left.id} is compared with quoted text, e.g. {left.id} == \"CEMENT\"")
+
+        mask = f"m{len(self.masks)}"
+        self.masks.append((left.id, tuple(v.value for v in values)))
+        negate = isinstance(op, (ast.NotEq, ast.NotIn))
+        return 'bool', f"(~{mask})" if negate else mask
+
+    @staticmethod
+    def _expect(expected, kind, where):
+        if kind != expected:
+            what = 'a condition' if expected == 'bool' else 'a number'
+            raise ScreenError(f"{where} needs {what}")
+
+
+class Screen:
+    """A compiled screen expression
+
+    ``variables`` maps each field or indicator the expression reads to its
+    array name and ``masks`` lists the text tests; ``evaluate`` builds only
+    those inputs.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression.strip()
+        if not self.expression:
+            raise ScreenError("Empty screen")
+        try:
+            tree = ast.parse(self.expression.replace('\n', ' '), mode='eval')
+        except SyntaxError as e:
+            where = f" at column {e.offset}" if e.offset else ""
+            raise ScreenError(f"Syntax error{where}: {e.msg}") from None
+        compiler = _Compiler()
+        kind, self.source = compiler.visit(tree)
+        if kind != 'bool':
+            raise ScreenError("A screen must be a condition, e.g. change_pct > 3")
+        self.variables = dict(compiler.variables)
+        self.masks = list(compiler.masks)
+        self.indicators = [name for name in self.variables if name not in FIELDS and name not in COMPUTED]
+        self.code = compile(self.source, '<screen>', 'eval')
+
+    def _run(self, arrays, shape):
+        numexpr = _numexpr()
+        if numexpr is not None:
+            result = numexpr.evaluate(self.source, local_dict=arrays, global_dict={})
+        else:
+            with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+                result = eval(self.code, _NUMPY_NAMESPACE, arrays)
+        return np.broadcast_to(np.asarray(result, dtype=bool), shape)
+
+    def _text_masks(self, arrays, text_columns):
+        for i, (field, values) in enumerate(self.masks):
+            column = text_columns(field)
+            arrays[f"m{i}"] = np.isin(column, values)
+
+    def evaluate(self, df, history=None, upto=None):
+        """Boolean mask over the rows of a batch
+
+        Windowed indicators come from ``history`` (the batch's session,
+        limited to its first ``upto`` batches so older batches screen
+        against what was known then).
+        """
+        if df is None or df.empty:
+            return np.zeros(0, dtype=bool)
+        arrays = {}
+        for name, var in self.variables.items():
+            if name in FIELDS:
+                arrays[var] = _batch_column(df, FIELDS[name])
+            elif name in COMPUTED:
+                price, volume = (_batch_column(df, column) for column in COMPUTED[name])
+                arrays[var] = price * volume
+
+        if self.indicators:
+            if history is None:
+                raise ScreenError(f"Indicators ({', '.join(self.indicators)}) need the session history")
+            with history.lock:
+                symbols = df['symbol'].tolist()
+                rows = np.array([history.symbol_index.get(symbol, -1) for symbol in symbols], dtype=np.int64)
+                found = rows >= 0
+                values = indicator_values(history, self.indicators, upto=upto, last_only=True)
+            for name, column in values.items():
+                aligned = np.full(len(df), np.nan)
+                aligned[found] = column[rows[found]]
+                arrays[self.variables[name]] = aligned
+
+        self._text_masks(arrays, lambda field: _text_column(df, field))
+        return self._run(arrays, (len(df),))
+
+    def evaluate_session(self, history, text=None):
+        """Boolean (symbols x batches) matrix: which symbols pass at every batch
+
+        ``text`` maps text fields to per-symbol values (e.g. the sectors of
+        a batch frame indexed by symbol). Batch fields not tracked by the
+        history are rejected.
+        """
+        with history.lock:
+            shape = (history.n_symbols, history.n_batches)
+            arrays = {}
+            for name, var in self.variables.items():
+                if name in self.indicators:
+                    continue
+                columns = COMPUTED.get(name, (FIELDS.get(name),))
+                missing = [column for column in columns if column not in history.fields]
+                if missing:
+                    raise ScreenError(f"{name} is not tracked per batch")
+                matrices = [history.matrix(column) for column in columns]
+                arrays[var] = matrices[0] if len(matrices) == 1 else matrices[0] * matrices[1]
+            for name, matrix in indicator_values(history, self.indicators).items():
+                arrays[self.variables[name]] = matrix
+
+            def text_columns(field):
+                if field == 'symbol':
+                    return np.asarray(history.symbols, dtype=object)[:, None]
+                values = (text or {}).get(field)
+                if values is None:
+                    raise ScreenError(f"No {field} values for the session")
+                return pd.Series(values).reindex(history.symbols).to_numpy(dtype=object)[:, None]
+
+            self._text_masks(arrays, text_columns)
+            return self._run(arrays, shape)
+
+
+def _batch_column(df, column):
+    if column not in df.columns:
+        raise ScreenError(f"The batch has no {column} column")
+    return pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+
+
+def _text_column(df, field):
+    if field not in df.columns:
+        raise ScreenError(f"The batch has no {field} column")
+    return df[field].to_numpy(dtype=object)
+
+
+def _shift(matrix, n):
+    """Columns moved right by n, NaN-padded"""
+    out = np.full(matrix.shape, np.nan)
+    if n < matrix.shape[1]:
+        out[:, n:] = matrix[:, :matrix.shape[1] - n]
+    return out
+
+
+def _rolling(matrix, window, reduce):
+    """Apply a NaN-aware reduction over trailing windows of columns"""
+    padded = np.concatenate([np.full((matrix.shape[0], window - 1), np.nan), matrix], axis=1)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window, axis=1)
+    with warnings.catch_warnings():
+        # All-NaN windows reduce to NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return reduce(windows, axis=-1)
+
+
+def indicator_values(history, names, upto=None, last_only=False):
+    """Windowed indicators over a session history, as matrices or last columns
+
+    With ``last_only`` the non-recursive indicators are computed on their
+    trailing window only, so screening one batch does not scan the session.
+    """
+    all_prices = history.matrix('current_price')[:, :upto]
+    all_volume = history.matrix('volume')[:, :upto] if 'volume' in history.fields else None
+    filled = None
+    values = {}
+    for name in names:
+        if name == 'interval_volume':
+            indicator, window = name, 1
+        else:
+            indicator, window = _INDICATOR_NAME.match(name).groups()
+            window = int(window)
+        # Columns that can affect the last value (recursive averages need them all)
+        tail = slice(-(window + 2), None) if last_only and indicator not in ('ema', 'rsi') else slice(None)
+        prices = all_prices[:, tail]
+
+        if indicator in ('interval_volume', 'avg_volume', 'volume_ratio'):
+            # Shared with the volume-spike alerts, so screens and alerts agree
+            intervals = interval_volume(all_volume[:, tail])
+            if indicator == 'interval_volume':
+                values[name] = intervals
+            elif indicator == 'avg_volume':
+                values[name] = average_volume(intervals, window)
+            else:
+                values[name] = volume_ratio(intervals, window)
+        elif indicator == 'sma':
+            values[name] = _rolling(prices, window, np.nanmean)
+        elif indicator in ('ema', 'rsi'):
+            if filled is None:
+                filled = forward_fill(all_prices)
+            values[name] = ema(filled, window) if indicator == 'ema' else rsi_series(filled, window)
+        elif indicator == 'return':
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values[name] = (prices / _shift(prices, window) - 1.0) * 100.0
+        elif indicator == 'high':
+            values[name] = _rolling(prices, window, np.fmax.reduce)
+        elif indicator == 'low':
+            values[name] = _rolling(prices, window, np.fmin.reduce)
+        elif indicator == 'volatility':
+            with np.errstate(divide='ignore', invalid='ignore'):
+                returns = (prices / _shift(prices, 1) - 1.0) * 100.0
+            values[name] = _rolling(returns, window, np.nanstd)
+    if last_only:
+        return {name: matrix[:, -1] if matrix.shape[1] else np.full(matrix.shape[0], np.nan)
+                for name, matrix in values.items()}
+    return values
+
+
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def compile_screen(expression, max_cached=256):
+    """Compiled Screen for an expression, parsed once per process"""
+    key = expression.strip()
+    with _compiled_lock:
+        screen = _compiled.get(key)
+        if screen is not None:
+            _compiled.move_to_end(key)
+            return screen
+    screen = Screen(key)
+    with _compiled_lock:
+        _compiled[key] = screen
+        while len(_compiled) > max_cached:
+            _compiled.popitem(last=False)
+    return screen
+
+
+class ScreenBook:
+    """Saved screens of every user, persisted as JSON"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.screens = {}
+        self.lock = threading.RLock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def load(self):
+        """Read saved screens from the JSON file"""
+        with open(self.path, 'r', encoding='utf-8') as handle:
+            self.screens = json.load(handle).get('screens', {})
+
+    def save(self):
+        """Write saved screens to the JSON file (if configured)"""
+        if not self.path:
+            return
+        write_json(self.path, {'screens': self.screens})
+
+    @contextmanager
+    def _editing(self):
+        """Change the book on top of the file's latest contents (re-read under a file lock), then save"""
+        with self.lock, file_lock(self.path):
+            if self.path and os.path.exists(self.path):
+                self.load()
+            yield
+            self.save()
+
+    def save_screen(self, user, name, expression):
+        """Create or replace a user's screen (the expression must compile)"""
+        compile_screen(expression)
+        with self._editing():
+            self.screens.setdefault(user, {})[name] = expression.strip()
+
+    def remove_screen(self, user, name):
+        with self._editing():
+            self.screens.get(user, {}).pop(name, None)
+
+    def screens_for(self, user):
+        return dict(self.screens.get(user, {}))
@@ -0,0 +1,223 @@
+import re
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# Match kinds, best first
+MATCH_EXACT = 0
+MATCH_PREFIX = 1
+MATCH_WORD = 2
+MATCH_SUBSTRING = 3
+MATCH_FUZZY = 4
+
+MATCH_LABELS = {
+    MATCH_EXACT: 'symbol',
+    MATCH_PREFIX: 'symbol prefix',
+    MATCH_WORD: 'name/sector',
+    MATCH_SUBSTRING: 'contains',
+    MATCH_FUZZY: 'similar',
+}
+
+# Score distance from the closest near miss still kept by filters
+FUZZY_MARGIN = 0.1
+
+# Optional company-name columns, used when the scraper provides one
+NAME_COLUMNS = ('company_name', 'company', 'name')
+
+
+def normalize(text):
+    """Lowercase alphanumeric words separated by single spaces"""
+    return re.sub(r'[^0-9a-z]+', ' ', str(text).lower()).strip()
+
+
+def bigrams(term):
+    """Character bigrams of a term, padded so the first and last letters count"""
+    padded = f"^{term}$"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+class SymbolSearchIndex:
+    """Ranked symbol lookup over symbols, company names and sectors
+
+    Built once per symbol universe. Normalized symbols and every word of
+    the names and sectors go into a prefix trie whose nodes list the terms
+    below them, so autocomplete is one walk down the query. A bigram index
+    over the same terms finds substrings and near misses (typos) without
+    scanning: candidate terms are counted from the postings of the query's
+    bigrams and scored by Dice similarity.
+
+    Matches rank as exact symbol, symbol prefix, name/sector word prefix,
+    substring, then fuzzy. Multi-word queries keep symbols matched by every
+    word.
+    """
+
+    def __init__(self, symbols, names=None, sectors=None, min_similarity=0.4):
+        self.symbols = list(symbols)
+        self.min_similarity = min_similarity
+
+        # Term -> symbols it describes; symbol terms are kept apart from words
+        term_symbols = defaultdict(set)
+        symbol_terms = set()
+        for i, symbol in enumerate(self.symbols):
+            key = normalize(symbol).replace(' ', '')
+            if key:
+                term_symbols[key].add(i)
+                symbol_terms.add(key)
+            for text in (names[i] if names is not None else None, sectors[i] if sectors is not None else None):
+                if text is None or text != text:
+                    continue
+                for word in normalize(text).split():
+                    term_symbols[word].add(i)
+
+        self.terms = sorted(term_symbols)
+        self._term_array = np.array(self.terms, dtype=object)
+        self._is_symbol = np.array([term in symbol_terms for term in self.terms], dtype=bool)
+        self._exact = {term: t for t, term in enumerate(self.terms)}
+        # Flat (term, symbol) pairs so per-term results map to symbols in bulk
+        pairs = [(t, i) for t, term in enumerate(self.terms) for i in sorted(term_symbols[term])]
+        self._pair_term = np.array([t for t, _ in pairs], dtype=np.int64)
+        self._pair_symbol = np.array([i for _, i in pairs], dtype=np.int64)
+        self._symbol_array = np.array(self.symbols, dtype=object)
+        self._symbol_rank = np.argsort(np.argsort(self._symbol_array))
+        self._positions = pd.Index(self.symbols)
+
+        # Prefix trie: each node holds the term ids in its subtree under ''
+        self._trie = {'': []}
+        for t, term in enumerate(self.terms):
+            node = self._trie
+            for char in term:
+                node = node.setdefault(char, {'': []})
+                node[''].append(t)
+        self._freeze(self._trie)
+
+        postings = defaultdict(list)
+        for t, term in enumerate(self.terms):
+            for gram in bigrams(term):
+                postings[gram].append(t)
+        self._postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+        self._gram_counts = np.array([len(bigrams(term)) for term in self.terms], dtype=np.int64)
+
+    @classmethod
+    def _freeze(cls, node):
+        """Turn the trie's term lists into arrays once building is done"""
+        node[''] = np.array(node[''], dtype=np.int64)
+        for char, child in node.items():
+            if char:
+                cls._freeze(child)
+
+    @classmethod
+    def from_frame(cls, df, symbol_col='symbol', sector_col='sector', name_col=None):
+        """Index the symbols of a batch (raw or display column names)"""
+        columns = {col.lower(): col for col in df.columns}
+        symbol_col = columns.get(symbol_col.lower(), symbol_col)
+        sector_col = columns.get(sector_col.lower())
+        if name_col is None:
+            name_col = next((columns[col] for col in NAME_COLUMNS if col in columns), None)
+        unique = df.drop_duplicates(symbol_col)
+        return cls(
+            unique[symbol_col].tolist(),
+            names=unique[name_col].tolist() if name_col else None,
+            sectors=unique[sector_col].tolist() if sector_col else None,
+        )
+
+    def _prefix_terms(self, word):
+        node = self._trie
+        for char in word:
+            node = node.get(char)
+            if node is None:
+                return np.empty(0, dtype=np.int64)
+        return node['']
+
+    def _match_word(self, word):
+        """Rank key per symbol for one normalized query word (inf = no match)
+
+        The key is ``2 * kind - score`` with score in (0, 1], so lower keys
+        rank first: by match kind, then by score within a kind.
+        """
+        keys = np.full(len(self.terms), np.inf)
+
+        # Count shared bigrams per term from the query's posting lists
+        grams = bigrams(word)
+        inner = grams - {f"^{word[0]}", f"{word[-1]}$"}
+        lists = [self._postings[gram] for gram in grams if gram in self._postings]
+        if lists:
+            shared = np.bincount(np.concatenate(lists), minlength=len(self.terms))
+            inner_lists = [self._postings[gram] for gram in inner if gram in self._postings]
+            inner_shared = np.bincount(np.concatenate(inner_lists), minlength=len(self.terms)) if inner_lists else np.zeros(len(self.terms), dtype=np.int64)
+
+            # Near misses must share more than the padded first/last letters
+            similarity = 2.0 * shared / (len(grams) + self._gram_counts)
+            fuzzy = (similarity >= self.min_similarity) & (inner_shared > 0)
+            keys[fuzzy] = 2 * MATCH_FUZZY - similarity[fuzzy]
+
+            # Substring candidates share every inner bigram; confirm with 'in'
+            candidates = np.flatnonzero(inner_shared >= len(inner))
+            contains = np.array([word in term for term in self._term_array[candidates]], dtype=bool)
+            keys[candidates[contains]] = 2 * MATCH_SUBSTRING - 1
+
+        prefixed = self._prefix_terms(word)
+        if prefixed.size:
+            symbol_terms = self._is_symbol[prefixed]
+            keys[prefixed[~symbol_terms]] = 2 * MATCH_WORD - 1
+            keys[prefixed[symbol_terms]] = 2 * MATCH_PREFIX - 1
+        exact = self._exact.get(word)
+        if exact is not None and self._is_symbol[exact]:
+            keys[exact] = 2 * MATCH_EXACT - 1
+
+        # A symbol takes the best key among the terms describing it
+        symbol_keys = np.full(len(self.symbols), np.inf)
+        matched = np.flatnonzero(np.isfinite(keys[self._pair_term]))
+        np.minimum.at(symbol_keys, self._pair_symbol[matched], keys[self._pair_term[matched]])
+        return symbol_keys
+
+    def _keys(self, query):
+        """Rank key per indexed symbol; every query word must match"""
+        words = normalize(query).split()
+        if not words or not self.symbols:
+            return None
+        # A symbol ranks by its weakest word
+        keys = self._match_word(words[0])
+        for word in words[1:]:
+            keys = np.maximum(keys, self._match_word(word))
+        return keys
+
+    def search(self, query, limit=10):
+        """Ranked (symbol, kind, score) matches; ``limit=None`` returns all"""
+        keys = self._keys(query)
+        if keys is None:
+            return []
+        hits = np.flatnonzero(np.isfinite(keys))
+        order = hits[np.lexsort((self._symbol_rank[hits], keys[hits]))]
+        if limit is not None:
+            order = order[:limit]
+        results = []
+        for i in order:
+            kind = int((keys[i] + 1) // 2)
+            results.append((self.symbols[i], kind, float(2 * kind - keys[i])))
+        return results
+
+    def match_mask(self, query):
+        """Boolean mask over the indexed symbols, for filtering
+
+        Near misses are only used when nothing matches exactly, by prefix
+        or as a substring, and then only those within ``FUZZY_MARGIN`` of
+        the closest one, so a typo finds its symbol without a valid query
+        pulling in every similar one.
+        """
+        keys = self._keys(query)
+        if keys is None:
+            return np.zeros(len(self.symbols), dtype=bool)
+        strict = keys < 2 * MATCH_FUZZY - 1
+        if strict.any() or not np.isfinite(keys).any():
+            return strict
+        return keys <= keys.min() + FUZZY_MARGIN
+
+    def filter_mask(self, symbols, query):
+        """Boolean mask aligned with ``symbols`` (e.g. a frame's Symbol column)"""
+        positions = self._positions.get_indexer(symbols)
+        return (positions >= 0) & self.match_mask(query)[positions]
+
+    def matching_symbols(self, query):
+        """Set of symbols passing ``match_mask``"""
+        return set(self._symbol_array[self.match_mask(query)])
@@ -0,0 +1,71 @@
+"""UTC epoch-nanosecond codec for ``scraped_at`` timestamps
+
+Supabase returns ``scraped_at`` as ISO-8601 strings with a UTC offset and
+drops the fractional seconds when they are zero, so one page can mix two
+layouts. Strings are parsed in bulk by Arrow's ISO-8601 cast into int64
+nanoseconds since the epoch (UTC); comparisons, closest-match searches and
+batch bucketing work on those integers, and tz-aware timestamps are only
+rebuilt (in PKT) where times are shown.
+"""
+import numpy as np
+import pandas as pd
+import pytz
+
+# Exchange time zone; times are shown in PKT
+PKT_TZ = pytz.timezone('Asia/Karachi')
+
+# int64 form of a missing timestamp (NaT)
+NAT = np.iinfo(np.int64).min
+
+
+def parse_iso(values):
+    """ISO-8601 strings as int64 UTC epoch nanoseconds (missing values become NAT)
+
+    Strings without an offset are taken to be UTC and parsed by pandas,
+    as are any other layouts Arrow rejects.
+    """
+    import pyarrow as pa
+
+    try:
+        parsed = pa.array(values, type=pa.string(), from_pandas=True).cast(pa.timestamp('ns', tz='UTC'))
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        parsed = None
+    if parsed is None:
+        fallback = pd.to_datetime(pd.Series(values, dtype=object), utc=True, format='ISO8601')
+        return pd.DatetimeIndex(fallback).as_unit('ns').asi8
+    return parsed.cast(pa.int64()).fill_null(NAT).to_numpy(zero_copy_only=False)
+
+
+def to_ns(values):
+    """Timestamps in any form as int64 UTC epoch nanoseconds
+
+    Accepts ISO strings, datetimes, Timestamps or datetime64 arrays; naive
+    values are taken to be UTC, as with ``pd.to_datetime(..., utc=True)``.
+    """
+    if not isinstance(values, (pd.Series, pd.Index, np.ndarray)):
+        values = pd.Index(list(values))
+    if values.dtype.kind == 'M' or isinstance(values.dtype, pd.DatetimeTZDtype):
+        return pd.DatetimeIndex(values).as_unit('ns').asi8
+    series = values if isinstance(values, pd.Series) else pd.Series(values, copy=False)
+    first = series.first_valid_index()
+    if first is not None and isinstance(series.loc[first], str):
+        return parse_iso(series)
+    return pd.DatetimeIndex(pd.to_datetime(values, utc=True)).as_unit('ns').asi8
+
+
+def from_ns(ns, tz='UTC'):
+    """int64 UTC epoch nanoseconds as a tz-aware DatetimeIndex in ``tz``"""
+    index = pd.DatetimeIndex(np.asarray(ns, dtype=np.int64).view('M8[ns]')).tz_localize('UTC')
+    return index if tz == 'UTC' else index.tz_convert(tz)
+
+
+def floor_ns(ns, freq):
+    """Floor epoch nanoseconds to a fixed frequency (epoch-aligned, like ``DatetimeIndex.floor``)"""
+    ns = np.asarray(ns, dtype=np.int64)
+    step = pd.Timedelta(freq).value
+    return np.where(ns == NAT, NAT, ns - ns % step)
+
+
+def utc_series(values):
+    """A timestamp column as ``datetime64[ns, UTC]``, keeping its index and name"""
+    return pd.Series(from_ns(to_ns(values)), index=values.index, name=values.name)
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+# Ranking metrics and the raw Supabase columns they are derived from
+TOPK_METRICS = {
+    'change_pct': 'Change %',
+    'volume': 'Volume',
+    'turnover': 'Turnover',
+    'range_pct': 'Range %',
+}
+
+
+def _numeric(df, column):
+    """Return a column as a float64 array (NaN when missing)"""
+    if column not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+
+
+class TopKEngine:
+    """Ranks one batch by change %, volume, turnover and range % for any K
+
+    Each (metric, direction) is partitioned with ``np.argpartition`` once and
+    only the selected head is sorted, so asking for K rows costs O(n + K log K)
+    instead of a full sort. Smaller K requests reuse the cached head.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.n = len(df)
+
+        current = _numeric(df, 'current_price')
+        high = _numeric(df, 'high')
+        low = _numeric(df, 'low')
+        volume = _numeric(df, 'volume')
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            range_pct = np.where(low > 0, (high - low) / low * 100.0, np.nan)
+
+        self.values = {
+            'change_pct': _numeric(df, 'change_percent'),
+            'volume': volume,
+            'turnover': volume * current,
+            'range_pct': range_pct,
+        }
+
+        self._heads = {}
+        self._groups = None
+
+    def _keys(self, metric, largest):
+        """Sort keys with NaN pushed to the end of the ranking"""
+        values = self.values[metric]
+        if largest:
+            return np.where(np.isnan(values), np.inf, -values)
+        return np.where(np.isnan(values), np.inf, values)
+
+    @staticmethod
+    def _select(keys, positions, k):
+        """Ranked positions of the k smallest keys among ``positions``"""
+        sub = keys[positions]
+        valid = int(np.count_nonzero(np.isfinite(sub)))
+        k = min(k, valid)
+        if k <= 0:
+            return positions[:0]
+        if k < len(sub):
+            part = np.argpartition(sub, k - 1)[:k]
+        else:
+            part = np.arange(len(sub))
+        ordered = part[np.argsort(sub[part], kind='stable')][:k]
+        return positions[ordered]
+
+    def ranked_positions(self, metric, k, largest=True, mask=None):
+        """Row positions of the top (or bottom) k rows for a metric"""
+        if metric not in self.values:
+            raise ValueError(f"Unknown ranking metric: {metric}")
+
+        keys = self._keys(metric, largest)
+
+        # Subsets (filters) are partitioned on demand and never cached
+        if mask is not None:
+            positions = np.flatnonzero(np.asarray(mask, dtype=bool))
+            return self._select(keys, positions, k)
+
+        cache_key = (metric, largest)
+        head = self._heads.get(cache_key)
+        if head is None or (len(head[0]) < k and not head[1]):
+            head_positions = self._select(keys, np.arange(self.n), k)
+            # Remember whether the head already holds every valid row
+            self._heads[cache_key] = (head_positions, len(head_positions) < k)
+            head = self._heads[cache_key]
+        return head[0][:k]
+
+    def top(self, metric, k=10, largest=True, mask=None):
+        """Top-k rows of the batch for a metric as a DataFrame"""
+        positions = self.ranked_positions(metric, k, largest=largest, mask=mask)
+        result = self.df.iloc[positions].copy()
+        result['rank'] = np.arange(1, len(positions) + 1)
+        result['metric_value'] = self.values[metric][positions]
+        return result
+
+    def _sector_groups(self):
+        """Row positions per sector, grouped once per batch"""
+        if self._groups is None:
+            if 'sector' not in self.df.columns:
+                self._groups = {}
+            else:
+                codes, labels = pd.factorize(self.df['sector'], sort=True)
+                order = np.argsort(codes, kind='stable')
+                counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+                # Missing sectors (code -1) sort first; skip past them
+                start = int(np.count_nonzero(codes < 0))
+                groups = {}
+                for label, count in zip(labels, counts):
+                    groups[label] = order[start:start + count]
+                    start += count
+                self._groups = groups
+        return self._groups
+
+    def top_by_sector(self, metric, k=10, largest=True):
+        """Top-k rows per sector as a DataFrame with a per-sector rank"""
+        keys = self._keys(metric, largest)
+        frames = []
+        for sector, positions in self._sector_groups().items():
+            selected = self._select(keys, positions, k)
+            if len(selected) == 0:
+                continue
+            frame = self.df.iloc[selected].copy()
+            frame['rank'] = np.arange(1, len(selected) + 1)
+            frame['metric_value'] = self.values[metric][selected]
+            frames.append(frame)
+
+        if not frames:
+            return self.df.iloc[:0].assign(rank=[], metric_value=[])
+        return pd.concat(frames)
+
+    def leader(self, metric, largest=True):
+        """Single best row for a metric, or None when no values are valid"""
+        positions = self.ranked_positions(metric, 1, largest=largest)
+        if len(positions) == 0:
+            return None
+        return self.df.iloc[positions[0]]
@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from psx.history import BATCH_FREQ
+from psx.indicators import forward_fill
+from psx.timestamps import PKT_TZ, from_ns, to_ns
+
+# Past sessions averaged into the baseline and the ratio flagged as unusual
+BASELINE_SESSIONS = int(os.getenv("PSX_VOLUME_BASELINE_DAYS", "10"))
+UNUSUAL_RATIO = float(os.getenv("PSX_UNUSUAL_VOLUME_RATIO", "2"))
+
+# Time-of-day slots on the batch grid (288 five-minute slots)
+SLOT = pd.Timedelta(BATCH_FREQ)
+N_SLOTS = int(pd.Timedelta(days=1) / SLOT)
+
+
+def time_slots(batch_times):
+    """Time-of-day slot (PKT) of each batch time"""
+    local = from_ns(to_ns(batch_times), PKT_TZ)
+    return ((local - local.normalize()) // SLOT).to_numpy(dtype=np.int64)
+
+
+def session_profile(history):
+    """Cumulative volume per symbol at every time-of-day slot of a session
+
+    Returns an (n_symbols, N_SLOTS) matrix: each batch fills its slot and
+    the last known cumulative volume carries forward into later slots;
+    slots before a symbol's first snapshot stay NaN.
+    """
+    with history.lock:
+        profile = np.full((history.n_symbols, N_SLOTS), np.nan)
+        if history.n_batches:
+            # Later batches in the same slot win
+            profile[:, time_slots(history.batch_times)] = history.matrix('volume')
+        return forward_fill(profile)
+
+
+class VolumeBaseline:
+    """Mean cumulative volume per symbol and time of day over past sessions
+
+    Built once from a window of session histories; comparing a batch is a
+    gather of one slot column per symbol.
+    """
+
+    def __init__(self, symbols, mean, counts, sessions):
+        self.symbols = list(symbols)
+        self.symbol_index = {symbol: row for row, symbol in enumerate(self.symbols)}
+        self.mean = mean
+        self.counts = counts
+        self.sessions = tuple(sessions)
+
+    @classmethod
+    def from_histories(cls, histories, sessions=()):
+        """Average the session profiles of several histories (symbols aligned by name)"""
+        symbols = []
+        symbol_index = {}
+        profiles = []
+        for history in histories:
+            with history.lock:
+                names = list(history.symbols)
+            profile = session_profile(history)
+            rows = np.empty(len(names), dtype=np.int64)
+            for i, symbol in enumerate(names):
+                row = symbol_index.get(symbol)
+                if row is None:
+                    row = len(symbols)
+                    symbol_index[symbol] = row
+                    symbols.append(symbol)
+                rows[i] = row
+            profiles.append((rows, profile))
+
+        total = np.zeros((len(symbols), N_SLOTS))
+        counts = np.zeros((len(symbols), N_SLOTS), dtype=np.int32)
+        for rows, profile in profiles:
+            observed = np.isfinite(profile)
+            total[rows] += np.where(observed, profile, 0.0)
+            counts[rows] += observed
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(counts > 0, total / counts, np.nan)
+        return cls(symbols, mean, counts, sessions)
+
+    def expected(self, symbols, batch_time):
+        """Baseline volume and the number of sessions behind it for each symbol"""
+        slot = time_slots([batch_time])[0]
+        rows = np.array([self.symbol_index.get(symbol, -1) for symbol in symbols], dtype=np.int64)
+        found = rows >= 0
+        expected = np.full(len(rows), np.nan)
+        counts = np.zeros(len(rows), dtype=np.int32)
+        expected[found] = self.mean[rows[found], slot]
+        counts[found] = self.counts[rows[found], slot]
+        return expected, counts
+
+    def unusual(self, df, batch_time, min_ratio=UNUSUAL_RATIO, min_sessions=3, min_expected=1000, top=25):
+        """Symbols trading at least ``min_ratio`` times their usual volume by this time of day
+
+        Baselines from fewer than ``min_sessions`` sessions or below
+        ``min_expected`` shares are skipped. Ranked by ratio, highest first.
+        """
+        if df is None or df.empty:
+            return pd.DataFrame(columns=['symbol', 'volume', 'expected_volume', 'ratio', 'sessions'])
+        volume = pd.to_numeric(df['volume'], errors='coerce').to_numpy(dtype=np.float64)
+        expected, counts = self.expected(df['symbol'].tolist(), batch_time)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(expected > 0, volume / expected, np.nan)
+        keep = (ratio >= min_ratio) & (counts >= min_sessions) & (expected >= min_expected)
+
+        picked = np.flatnonzero(keep)
+        picked = picked[np.argsort(-ratio[picked], kind='stable')][:top]
+        result = pd.DataFrame({
+            'symbol': df['symbol'].to_numpy()[picked],
+            'volume': volume[picked],
+            'expected_volume': expected[picked],
+            'ratio': ratio[picked],
+            'sessions': counts[picked],
+        })
+        for column in ('sector', 'current_price', 'change_percent'):
+            if column in df.columns:
+                result[column] = df[column].to_numpy()[picked]
+        return result
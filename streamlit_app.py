@@ -1,17 +1,34 @@
+import time as tm
+_BOOT_STARTED = tm.perf_counter()
 import streamlit as st
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta, time
-import time as tm
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+from datetime import datetime
 import io
 import os
-from supabase import create_client, Client
 from dotenv import load_dotenv
-import pytz
 import streamlit.components.v1 as components
+from psx.topk import TopKEngine, TOPK_METRICS
+from psx.history import SessionHistory, BATCH_FREQ, batch_bucket
+from psx.delta import DeltaHistory
+from psx.breadth import BreadthTracker
+from psx.analytics import AnalyticsExecutor, correlation_job, summary_job
+from psx.alerts import AlertBook, AlertMonitor, RULE_KINDS, volume_spike_ratio
+from psx.portfolio import PortfolioBook, read_holdings
+from psx.volumeprofile import BASELINE_SESSIONS, UNUSUAL_RATIO, VolumeBaseline
+from psx.screener import INDICATORS, INTERVAL_INDICATORS, PRESET_SCREENS, ScreenBook, ScreenError, compile_screen
+from psx.quality import FLAG_LABELS
+from psx.profiling import BootProfile
+from psx.data import BatchPreloader, DataManager, create_backend, resilient_backend, tiered_backend, PKT_TZ
+from psx.realtime import RealtimeListener, create_source
+from psx.replay import replay_figure
+from psx.marketmap import market_map, market_map_figure
+from psx.search import MATCH_LABELS, NAME_COLUMNS, SymbolSearchIndex
+
+# Plotly and the Supabase client are imported where they are first needed,
+# so the header paints before those modules load on a cold start
+BOOT = BootProfile(started=_BOOT_STARTED)
+BOOT.mark("imports")
 
 # Load environment variables
 load_dotenv()
@@ -304,310 +321,446 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize Supabase client
+# Initialize the shared data manager
 @st.cache_resource
-def init_supabase():
-    """Initialize Supabase client"""
+def get_data_manager():
+    """Shared DataManager over the configured backend (Supabase by default)"""
     try:
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_KEY")
-        
-        if not supabase_url or not supabase_key:
+        backend = tiered_backend(resilient_backend(create_backend()))
+        if backend is None:
             st.error("Supabase credentials not found. Please set SUPABASE_URL and SUPABASE_KEY in .env file")
             return None
         
-        return create_client(supabase_url, supabase_key)
+        return DataManager(backend, on_error=st.error)
     except Exception as e:
-        st.error(f"Error initializing Supabase: {str(e)}")
+        st.error(f"Error initializing data backend: {str(e)}")
         return None
 
-# Initialize
-supabase = init_supabase()
-
 # Constants
-PKT_TZ = pytz.timezone('Asia/Karachi')
-TRADING_START = time(9, 30)  # 9:30 AM
-TRADING_END = time(15, 30)   # 3:30 PM
+ALERTS_FILE = os.getenv("PSX_ALERTS_FILE", "alerts.json")
+LIVE_POLL_SECONDS = float(os.getenv("PSX_LIVE_POLL_SECONDS", "2"))
+ANALYTICS_POLL_SECONDS = float(os.getenv("PSX_ANALYTICS_POLL_SECONDS", "0.5"))
+PORTFOLIO_DIR = os.getenv("PSX_PORTFOLIO_DIR", "")
+SCREENS_FILE = os.getenv("PSX_SCREENS_FILE", "screens.json")
+
+def get_topk_engine(df):
+    """Return the top-K engine for the loaded batch, building it once per batch"""
+    cached = st.session_state.get('topk_engine')
+    if cached is None or cached.df is not df:
+        cached = TopKEngine(df)
+        st.session_state.topk_engine = cached
+    return cached
+
+def get_market_map(df):
+    """Return the validated market map figure for the loaded batch, building it once per batch"""
+    cached = st.session_state.get('market_map')
+    if cached is None or cached[0] is not df:
+        import plotly.graph_objects as go
+        
+        nodes = market_map(df)
+        cached = (df, go.Figure(market_map_figure(nodes)) if nodes is not None else None)
+        st.session_state.market_map = cached
+    return cached[1]
+
+@st.cache_resource(max_entries=4)
+def get_search_index(universe):
+    """Symbol search index, built once per (symbol, sector, name) universe"""
+    symbols, sectors, names = zip(*universe) if universe else ((), (), ())
+    return SymbolSearchIndex(symbols, names=names, sectors=sectors)
+
+def search_universe(df):
+    """Hashable (symbol, sector, company name) rows of a batch"""
+    name_col = next((col for col in NAME_COLUMNS if col in df.columns), None)
+    missing = [None] * len(df)
+    return tuple(zip(
+        df['symbol'],
+        df['sector'] if 'sector' in df.columns else missing,
+        df[name_col] if name_col else missing,
+    ))
 
-class DataManager:
-    """Manages data fetching and aggregation from Supabase"""
+@st.cache_resource(max_entries=30)
+def get_compact_session(session_date):
+    """Delta-encoded history of a closed trading day, kept for many days
     
-    @staticmethod
-    def get_latest_trading_data():
-        """Get the latest data within trading hours (9:30 AM - 3:30 PM PKT)"""
-        try:
-            if supabase is None:
-                return None
-            
-            # Get current time in PKT
-            now_pkt = datetime.now(PKT_TZ)
-            
-            # Determine if we're in trading hours
-            current_time = now_pkt.time()
-            
-            # If outside trading hours, use the last trading day's data
-            if current_time < TRADING_START or current_time > TRADING_END:
-                # Get data from yesterday's trading session
-                target_date = now_pkt - timedelta(days=1)
-            else:
-                target_date = now_pkt
-            
-            # Create start and end times for the trading day
-            trading_start = datetime.combine(target_date.date(), TRADING_START)
-            trading_end = datetime.combine(target_date.date(), TRADING_END)
-            
-            # Make timezone aware
-            trading_start = PKT_TZ.localize(trading_start)
-            trading_end = PKT_TZ.localize(trading_end)
-            
-            # Convert to UTC for database query
-            trading_start_utc = trading_start.astimezone(pytz.UTC)
-            trading_end_utc = trading_end.astimezone(pytz.UTC)
-            
-            # Query for data within trading hours
-            response = supabase.table('stock_data')\
-                .select('*')\
-                .gte('scraped_at', trading_start_utc.isoformat())\
-                .lte('scraped_at', trading_end_utc.isoformat())\
-                .order('scraped_at', desc=True)\
-                .limit(1000)\
-                .execute()
-            
-            if not response.data:
-                return None
-            
-            # Convert to DataFrame
-            df = pd.DataFrame(response.data)
-            
-            # Convert scraped_at to PKT - FIXED timezone handling
-            if 'scraped_at' in df.columns:
-                # Parse as UTC first, then convert to PKT
-                df['scraped_at'] = pd.to_datetime(df['scraped_at'], utc=True).dt.tz_convert(PKT_TZ)
-            
-            return df
-            
-        except Exception as e:
-            st.error(f"Error fetching trading data: {str(e)}")
-            return None
+    A failed fetch raises, so only loaded (or confirmed empty) days are cached.
+    """
+    return DeltaHistory.from_history(SessionHistory.from_frame(get_data_manager().load_session_data(session_date)))
+
+@st.cache_resource(max_entries=4)
+def load_session_history(session_date):
+    """Shared symbols x batches history for one trading day (raises when the fetch fails)
+    
+    Closed days are expanded from their compact delta encoding, so only a
+    few dense matrices are held and evicted days are rebuilt without a query.
+    """
+    if session_date < datetime.now(PKT_TZ).date():
+        return get_compact_session(session_date).to_history()
+    return SessionHistory.from_frame(get_data_manager().load_session_data(session_date))
+
+def get_session_history(session_date):
+    """``load_session_history``, or an empty uncached history when the day fails to load"""
+    try:
+        return load_session_history(session_date)
+    except Exception as e:
+        st.error(f"Error loading session {session_date}: {str(e)}")
+        return SessionHistory()
+
+@st.cache_resource(max_entries=8)
+def get_replay_figure(session_date, n_batches, symbols):
+    """Validated replay animation for a session, rebuilt when batches land"""
+    import plotly.graph_objects as go
+    
+    figure = replay_figure(load_session_history(session_date), symbols=symbols)
+    return go.Figure(figure) if figure is not None else None
+
+def baseline_window(session_date, days):
+    """The trading days before a session that its volume baseline averages"""
+    return [d.date() for d in pd.bdate_range(end=pd.Timestamp(session_date) - pd.Timedelta(days=1), periods=days)]
+
+def build_volume_baseline(compact_sessions):
+    """Volume baseline from (day, compact history) pairs, skipping days without batches"""
+    histories, sessions = [], []
+    for day, compact in compact_sessions:
+        history = compact.to_history()
+        if history.n_batches:
+            histories.append(history)
+            sessions.append(day)
+    return VolumeBaseline.from_histories(histories, sessions)
+
+@st.cache_resource(max_entries=4)
+def load_volume_baseline(session_date, days=BASELINE_SESSIONS):
+    """Same-time-of-day volume baseline from the trading days before a session
     
-    @staticmethod
-    def get_data_by_timestamp(target_timestamp):
-        """Get data for a specific timestamp with tolerance of 1-2 minutes"""
+    Raises when any day of the window fails to load, so only complete
+    baselines are cached.
+    """
+    return build_volume_baseline([(day, get_compact_session(day)) for day in baseline_window(session_date, days)])
+
+def get_volume_baseline(session_date, days=BASELINE_SESSIONS):
+    """The cached baseline, or one from the days that load (uncached) while others fail"""
+    try:
+        return load_volume_baseline(session_date, days)
+    except Exception as e:
+        st.warning(f"Volume baseline leaves out days that failed to load: {str(e)}")
+    loaded = []
+    for day in baseline_window(session_date, days):
         try:
-            if supabase is None:
-                return None
-            
-            # Ensure target_timestamp is timezone aware (PKT)
-            if target_timestamp.tzinfo is None:
-                target_timestamp = PKT_TZ.localize(target_timestamp)
-            
-            # Add tolerance of 2 minutes
-            start_time = target_timestamp - timedelta(minutes=2)
-            end_time = target_timestamp + timedelta(minutes=2)
-            
-            # Convert to UTC
-            start_time_utc = start_time.astimezone(pytz.UTC)
-            end_time_utc = end_time.astimezone(pytz.UTC)
-            
-            # Query data
-            response = supabase.table('stock_data')\
-                .select('*')\
-                .gte('scraped_at', start_time_utc.isoformat())\
-                .lte('scraped_at', end_time_utc.isoformat())\
-                .order('scraped_at', desc=True)\
-                .limit(500)\
-                .execute()
-            
-            if not response.data:
-                return None
-            
-            # Get the closest timestamp
-            data = response.data
-            closest_item = min(data, key=lambda x: abs(
-                pd.Timestamp(x['scraped_at']).tz_convert(PKT_TZ) - target_timestamp
-            ))
-            
-            # Get all data for this exact timestamp
-            exact_time = pd.Timestamp(closest_item['scraped_at']).tz_convert(PKT_TZ)
-            
-            exact_response = supabase.table('stock_data')\
-                .select('*')\
-                .gte('scraped_at', (exact_time - timedelta(seconds=30)).astimezone(pytz.UTC).isoformat())\
-                .lte('scraped_at', (exact_time + timedelta(seconds=30)).astimezone(pytz.UTC).isoformat())\
-                .execute()
-            
-            if not exact_response.data:
-                return None
-            
-            df = pd.DataFrame(exact_response.data)
-            
-            # Convert scraped_at to PKT
-            if 'scraped_at' in df.columns:
-                df['scraped_at'] = pd.to_datetime(df['scraped_at'], utc=True).dt.tz_convert(PKT_TZ)
-            
-            return df
-            
-        except Exception as e:
-            st.error(f"Error fetching data by timestamp: {str(e)}")
+            loaded.append((day, get_compact_session(day)))
+        except Exception:
+            continue
+    return build_volume_baseline(loaded)
+
+@st.cache_resource(max_entries=3)
+def get_breadth_tracker(session_date):
+    """Shared breadth tracker over a session's history"""
+    return BreadthTracker(load_session_history(session_date))
+
+@st.cache_resource
+def get_analytics_executor():
+    """Shared process pool for heavy analytics, deduplicating jobs across sessions"""
+    return AnalyticsExecutor()
+
+def window_matrices(window, symbols, fields, consumed=None):
+    """Per-session (symbols x batches) matrices of a window, rows aligned to symbols
+    
+    Returns the arrays named ``<name>_<i>`` for each field and the
+    (session date, batch count) of each session used (days with fewer than
+    two batches are skipped). ``consumed`` maps sessions to the batches an
+    earlier job already covered: those sessions start at their last covered
+    batch, so the first new return has a base, or are left out when nothing
+    was added.
+    """
+    arrays = {}
+    counts = []
+    consumed = consumed or {}
+    for session_date in window:
+        history = get_session_history(session_date)
+        with history.lock:
+            covered = consumed.get(session_date, 0)
+            if history.n_batches < 2 or history.n_batches <= covered:
+                continue
+            start = max(covered - 1, 0)
+            rows = np.array([history.symbol_index.get(symbol, -1) for symbol in symbols], dtype=np.int64)
+            found = rows >= 0
+            for field, name in fields.items():
+                aligned = np.full((len(symbols), history.n_batches - start), np.nan)
+                aligned[found] = history.matrix(field)[rows[found], start:]
+                arrays[f"{name}_{len(counts)}"] = aligned
+            counts.append((session_date, history.n_batches))
+    return arrays, tuple(counts)
+
+def covered_batches(base, window):
+    """Batch counts per session covered by a finished job, or None if its sessions have since shrunk
+    
+    A job's key ends with the (session date, batch count) pairs it covered.
+    """
+    consumed = dict(base.key[-1])
+    for session_date, n_batches in consumed.items():
+        if session_date not in window or get_session_history(session_date).n_batches < n_batches:
             return None
+    return consumed
+
+def submit_analytics(kind, func, window, symbols, fields, outputs=None, incremental=False):
+    """Submit (or join) an analytics job over a window; None without enough batches
     
-    @staticmethod
-    def get_available_batches():
-        """Get all available data batches (timestamps) from today's trading"""
-        try:
-            if supabase is None:
-                return []
-            
-            # Get today's date in PKT
-            today_pkt = datetime.now(PKT_TZ)
-            
-            # Create trading day boundaries for today
-            trading_start = datetime.combine(today_pkt.date(), TRADING_START)
-            trading_end = datetime.combine(today_pkt.date(), TRADING_END)
-            
-            # Make timezone aware
-            trading_start = PKT_TZ.localize(trading_start)
-            trading_end = PKT_TZ.localize(trading_end)
-            
-            # Convert to UTC
-            trading_start_utc = trading_start.astimezone(pytz.UTC)
-            trading_end_utc = trading_end.astimezone(pytz.UTC)
-            
-            # Query distinct timestamps - FIXED: using distinct in query
-            response = supabase.table('stock_data')\
-                .select('scraped_at')\
-                .gte('scraped_at', trading_start_utc.isoformat())\
-                .lte('scraped_at', trading_end_utc.isoformat())\
-                .order('scraped_at', desc=True)\
-                .execute()
-            
-            if not response.data:
-                # Try yesterday if no data today
-                yesterday = today_pkt - timedelta(days=1)
-                trading_start = datetime.combine(yesterday.date(), TRADING_START)
-                trading_end = datetime.combine(yesterday.date(), TRADING_END)
-                trading_start = PKT_TZ.localize(trading_start)
-                trading_end = PKT_TZ.localize(trading_end)
-                trading_start_utc = trading_start.astimezone(pytz.UTC)
-                trading_end_utc = trading_end.astimezone(pytz.UTC)
-                
-                response = supabase.table('stock_data')\
-                    .select('scraped_at')\
-                    .gte('scraped_at', trading_start_utc.isoformat())\
-                    .lte('scraped_at', trading_end_utc.isoformat())\
-                    .order('scraped_at', desc=True)\
-                    .execute()
-            
-            if not response.data:
-                return []
-            
-            # Extract and deduplicate timestamps - FIXED timezone handling
-            timestamps = []
-            seen_times = set()
-            
-            for item in response.data:
-                try:
-                    # Parse timestamp correctly
-                    ts = pd.to_datetime(item['scraped_at'], utc=True).tz_convert(PKT_TZ)
-                    # Round to nearest 5 minutes for grouping (since scraper runs every 5 min)
-                    rounded_ts = ts.replace(second=0, microsecond=0)
-                    minute = rounded_ts.minute
-                    rounded_minute = (minute // 5) * 5
-                    rounded_ts = rounded_ts.replace(minute=rounded_minute)
-                    
-                    if rounded_ts not in seen_times:
-                        seen_times.add(rounded_ts)
-                        timestamps.append(ts)  # Store original timestamp
-                except Exception as e:
-                    st.error(f"Error processing timestamp: {item['scraped_at']} - {e}")
-                    continue
-            
-            return sorted(timestamps, reverse=True)
-            
-        except Exception as e:
-            st.error(f"Error fetching available batches: {str(e)}")
-            return []
-    
-    @staticmethod
-    def format_data_for_display(df):
-        """Format the DataFrame to show only 11 relevant columns"""
-        if df is None or df.empty:
-            return df
-        
-        # Create a copy to avoid modifying original
-        display_df = df.copy()
-        
-        # Define the 11 columns we want to show (matching your CSV)
-        display_columns = {
-            'symbol': 'Symbol',
-            'sector': 'Sector',
-            'listed_in': 'Listed_In',
-            'ldcp': 'LDCP',
-            'open_price': 'Open',
-            'high': 'High',
-            'low': 'Low',
-            'current_price': 'Current',
-            'change': 'Change',
-            'change_percent': 'Change(%)',
-            'volume': 'Volume'
-        }
-        
-        # Rename columns to match CSV format
-        # Only rename columns that exist
-        rename_dict = {k: v for k, v in display_columns.items() if k in display_df.columns}
-        display_df = display_df.rename(columns=rename_dict)
-        
-        # Select only the columns we want to display
-        column_order = [
-            'Symbol', 'Sector', 'Listed_In', 'LDCP', 'Open', 'High', 
-            'Low', 'Current', 'Change', 'Change(%)', 'Volume'
-        ]
-        
-        # Only include columns that exist
-        existing_columns = [col for col in column_order if col in display_df.columns]
-        
-        return display_df[existing_columns]
+    ``incremental`` jobs extend the family's last finished result (its
+    ``sum``, ``cross`` and ``n_obs`` statistics) with only the batches
+    added since, rather than recomputing the window.
+    """
+    family = (kind, window, tuple(symbols))
+    executor = get_analytics_executor()
+    base = executor.latest(family) if incremental else None
+    consumed = covered_batches(base, window) if base is not None else None
+    arrays, counts = window_matrices(window, symbols, fields, consumed)
+    params = {'n_sessions': len(counts)}
+    if consumed is not None:
+        result = base.result()
+        arrays.update(base_sum=result['sum'], base_cross=result['cross'])
+        params['base_obs'] = result['n_obs']
+        counts = tuple(sorted({**consumed, **dict(counts)}.items()))
+    if not counts:
+        return None
+    return executor.submit(
+        family + (counts,),
+        func,
+        arrays,
+        params,
+        outputs=outputs,
+        family=family
+    )
+
+@st.fragment(run_every=ANALYTICS_POLL_SECONDS)
+def watch_analytics_job(job, label, show_partial=None):
+    """Progress (and partial results) of a running job; reruns the page when it is done
     
-    @staticmethod
-    def calculate_market_metrics(df):
-        """Calculate market metrics from the data"""
-        if df is None or df.empty:
-            return {}
-        
-        # Ensure numeric columns are numeric
-        numeric_columns = ['change_percent', 'volume', 'current_price']
-        for col in numeric_columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+    Only this fragment reruns on the timer, so widgets stay responsive
+    while the pool computes.
+    """
+    if job.done():
+        st.rerun()
+    st.progress(job.progress(), text=label)
+    if show_partial is not None:
+        show_partial(job)
+
+def update_session_breadth(session_date, latest_batch):
+    """Extend the cached session history up to the latest batch and return breadth"""
+    tracker = get_breadth_tracker(session_date)
+    history = tracker.history
+    
+    with history.lock:
+        # Fetch only the batches that settled since the history was last extended
+        if latest_batch is not None and history.needs_extend(latest_batch):
+            since = history.batch_times[-1] + pd.Timedelta(BATCH_FREQ) if history.batch_times else None
+            history.extend_frame(get_data_manager().get_session_data(session_date, since=since))
         
-        metrics = {
-            'total_stocks': len(df),
-            'gainers': len(df[df['change_percent'] > 0]) if 'change_percent' in df.columns else 0,
-            'losers': len(df[df['change_percent'] < 0]) if 'change_percent' in df.columns else 0,
-            'unchanged': len(df[df['change_percent'] == 0]) if 'change_percent' in df.columns else 0,
-            'total_volume': df['volume'].sum() if 'volume' in df.columns else 0,
-            'avg_change': df['change_percent'].mean() if 'change_percent' in df.columns else 0,
-        }
+        return tracker.update()
+
+def load_batch(batch_time):
+    """Fetch a batch, validating it against the preceding batch of its session"""
+    previous = None
+    batch_key = batch_bucket([batch_time])[0]
+    history = get_session_history(batch_key.tz_convert(PKT_TZ).date())
+    with history.lock:
+        if batch_key in history.batch_times and history.batch_times.index(batch_key) > 0:
+            previous = history.batch_frame(history.batch_times.index(batch_key) - 1).reset_index()
+    return get_data_manager().get_data_by_timestamp(batch_time, previous=previous)
+
+@st.cache_resource
+def get_api_server():
+    """HTTP API sharing this process's DataManager, when PSX_API_PORT is set"""
+    port = os.getenv("PSX_API_PORT")
+    data_manager = get_data_manager()
+    if not port or data_manager is None:
+        return None
+    try:
+        from psx.api import start_api_server
+        from psx.data.rollup import ROLLUP_PATH, DailyStore
         
-        # Safely calculate top performers
+        return start_api_server(data_manager, os.getenv("PSX_API_HOST", "127.0.0.1"), int(port), DailyStore(ROLLUP_PATH))
+    except Exception as e:
+        st.error(f"Error starting API server: {str(e)}")
+        return None
+
+@st.cache_resource
+def get_realtime_listener():
+    """Single server-side listener turning stock_data inserts into batch events
+    
+    Enabled with PSX_REALTIME=supabase (or a ws:// URI for a local stub).
+    """
+    try:
+        data_manager = get_data_manager()
+        source = create_source()
+        if data_manager is None or source is None:
+            return None
+        return RealtimeListener(data_manager, source).start()
+    except Exception as e:
+        st.error(f"Error starting realtime listener: {str(e)}")
+        return None
+
+@st.fragment(run_every=LIVE_POLL_SECONDS)
+def watch_live_batches(listener):
+    """Poll the listener's batch counter and rerun the page on a new batch
+    
+    Only this fragment reruns on the timer and it does not query the
+    database; the full rerun happens once per completed batch.
+    """
+    state = listener.status['state']
+    if listener.latest_batch is not None:
+        st.caption(f"🟢 Live ({state}) · last batch {listener.latest_batch.strftime('%H:%M:%S')}")
+    else:
+        st.caption(f"🟡 Live ({state}) · waiting for the next batch")
+    
+    seen = st.session_state.setdefault('live_version', listener.version)
+    if listener.version <= seen:
+        return
+    st.session_state.live_version = listener.version
+    if not st.session_state.get('live_follow', True):
+        return
+    
+    # The batch is already validated and cached by the listener
+    latest_batch = listener.latest_batch
+    latest_key = batch_bucket([latest_batch])[0]
+    st.session_state.available_batches = [latest_batch] + [
+        batch for batch in st.session_state.available_batches
+        if batch_bucket([batch])[0] != latest_key
+    ]
+    st.session_state.selected_batch = latest_batch
+    st.session_state.current_data = load_batch(latest_batch)
+    st.session_state.last_refresh = datetime.now(PKT_TZ)
+    st.rerun()
+
+@st.cache_resource
+def get_batch_preloader():
+    """Shared background preloader feeding the DataManager's batch store (validated as load_batch does)"""
+    return BatchPreloader(get_data_manager(), load=load_batch)
+
+def step_batch(batches, offset):
+    """Move the time-travel slider one batch back or forward"""
+    position = batches.index(st.session_state.batch_slider) + offset
+    st.session_state.batch_slider = batches[min(max(position, 0), len(batches) - 1)]
+
+def display_batch_slider(data_manager):
+    """Scrubbable slider over the session's batches, rendered from the cache
+    
+    The first use warms the whole session into the batch store with one
+    background query; each step then prefetches the neighbouring batches.
+    """
+    batches = sorted(st.session_state.available_batches)
+    selected = st.session_state.selected_batch
+    
+    # Follow batches selected elsewhere (refresh, live updates)
+    if selected is not None and selected in batches and st.session_state.get('slider_synced') != selected:
+        st.session_state.batch_slider = selected
+    if st.session_state.get('batch_slider') not in batches:
+        st.session_state.batch_slider = batches[-1]
+    
+    choice = st.select_slider(
+        "Batch time (PKT)",
+        options=batches,
+        format_func=lambda batch: batch.strftime("%H:%M"),
+        key="batch_slider"
+    )
+    col1, col2 = st.columns(2)
+    col1.button("◀ Previous", use_container_width=True, on_click=step_batch, args=(batches, -1))
+    col2.button("Next ▶", use_container_width=True, on_click=step_batch, args=(batches, 1))
+    
+    if choice != selected or st.session_state.current_data is None:
         try:
-            if 'change_percent' in df.columns and not df.empty and not df['change_percent'].isna().all():
-                metrics['top_gainer'] = df.loc[df['change_percent'].idxmax()] if df['change_percent'].notna().any() else None
-                metrics['top_loser'] = df.loc[df['change_percent'].idxmin()] if df['change_percent'].notna().any() else None
-            else:
-                metrics['top_gainer'] = None
-                metrics['top_loser'] = None
-                
-            if 'volume' in df.columns and not df.empty and not df['volume'].isna().all():
-                metrics['most_active'] = df.loc[df['volume'].idxmax()] if df['volume'].notna().any() else None
-            else:
-                metrics['most_active'] = None
-        except:
-            metrics['top_gainer'] = None
-            metrics['top_loser'] = None
-            metrics['most_active'] = None
-        
-        return metrics
+            st.session_state.selected_batch = choice
+            st.session_state.current_data = load_batch(choice)
+            st.session_state.last_refresh = datetime.now(PKT_TZ)
+        except Exception as e:
+            st.error(f"Error loading batch: {str(e)}")
+    st.session_state.slider_synced = choice
+    
+    preloader = get_batch_preloader()
+    preloader.warm_session(choice.date())
+    preloader.prefetch(batches, batches.index(choice))
+    st.caption(f"{batches.index(choice) + 1} of {len(batches)} batches · {choice.strftime('%Y-%m-%d')}")
+
+@st.cache_resource
+def get_alert_monitor():
+    """Shared alert book and monitor for every session in this process"""
+    return AlertMonitor(AlertBook(ALERTS_FILE))
+
+def evaluate_alerts(df, batch_time):
+    """Run every user's alert rules against the loaded batch (once per batch)"""
+    monitor = get_alert_monitor()
+    batch_key = batch_bucket([batch_time])[0]
+    
+    # Volume spikes need the session history up to this batch
+    volume_ratio = None
+    history, upto = history_upto(batch_time)
+    with history.lock:
+        if upto and history.batch_times[upto - 1] == batch_key:
+            volume_ratio = volume_spike_ratio(history, upto=upto)
+    
+    monitor.process(batch_key, df, volume_ratio)
+    return monitor
+
+@st.cache_resource
+def get_screen_book():
+    """Shared saved screens for every session in this process"""
+    return ScreenBook(SCREENS_FILE)
+
+def history_upto(batch_time):
+    """The batch's session history and how many of its batches precede or are the batch"""
+    batch_key = batch_bucket([batch_time])[0]
+    history = get_session_history(batch_key.tz_convert(PKT_TZ).date())
+    with history.lock:
+        return history, int(np.searchsorted(pd.DatetimeIndex(history.batch_times, tz='UTC'), batch_key, side='right'))
+
+@st.cache_resource
+def get_portfolio_book():
+    """Portfolios preloaded from the CSVs in PSX_PORTFOLIO_DIR, shared by every session"""
+    book = PortfolioBook()
+    if PORTFOLIO_DIR and os.path.isdir(PORTFOLIO_DIR):
+        book.load_directory(PORTFOLIO_DIR)
+    return book
+
+def get_uploaded_portfolios():
+    """Portfolios uploaded in this browser session (other visitors never see them)"""
+    if 'portfolio_book' not in st.session_state:
+        st.session_state.portfolio_book = PortfolioBook()
+    return st.session_state.portfolio_book
+
+def format_age(seconds):
+    """Short human-readable age"""
+    if seconds < 90:
+        return f"{seconds:.0f}s"
+    if seconds < 5400:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+def display_data_age(data_manager):
+    """Sidebar indicator of data age and database reachability
+    
+    While the circuit breaker is open, pages render from the last good
+    cached batches and listings; this says how old they are.
+    """
+    health = data_manager.health()
+    age = health['age']
+    if health['state'] == 'closed' and age is not None and age < 120:
+        level = 'fresh'
+    elif age is not None and age < 600:
+        level = 'stale'
+    else:
+        level = 'old'
+    
+    if health['state'] == 'closed':
+        text = f"Data age {format_age(age)}" if age is not None else "No data fetched yet"
+    else:
+        since = f"from {format_age(age)} ago" if age is not None else "none cached yet"
+        retry = f" · retrying in {health['retry_in']:.0f}s" if health['state'] == 'open' else " · retrying now"
+        text = f"Database unavailable · serving cached data {since}{retry}"
+    if health['refreshing']:
+        text += " · refreshing"
+    st.markdown(
+        f'<span class="data-freshness-indicator {level}"></span><small>{text}</small>',
+        unsafe_allow_html=True
+    )
+    if health['state'] != 'closed' and health['last_error']:
+        st.caption(f"Last error: {health['last_error']}")
 
 def display_header_with_nav():
     """Display professional header with navigation menu"""
@@ -716,6 +869,410 @@ def display_market_metrics(metrics):
         st.metric("Total Volume", volume_formatted)
         st.markdown('</div>', unsafe_allow_html=True)
 
+def display_market_breadth(breadth):
+    """Display the session's advance/decline line, volume ratio and new highs/lows"""
+    if breadth is None or breadth.empty:
+        return
+    
+    st.markdown("### 🌊 Market Breadth (Session)")
+    
+    def build():
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
+        
+        fig = make_subplots(
+            rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.06,
+            subplot_titles=("Advance/Decline", "Up/Down Volume Ratio", "New Intraday Highs / Lows")
+        )
+        fig.add_trace(go.Scatter(name="A/D Line", line=dict(color="#1e90ff")), row=1, col=1)
+        fig.add_trace(go.Bar(name="Net Advances", marker_color="#87ceeb", opacity=0.6), row=1, col=1)
+        fig.add_trace(go.Scatter(name="Up/Down Volume", line=dict(color="#ff9800")), row=2, col=1)
+        fig.add_trace(go.Bar(name="New Highs", marker_color="#4CAF50"), row=3, col=1)
+        fig.add_trace(go.Bar(name="New Lows", marker_color="#d32f2f"), row=3, col=1)
+        fig.update_layout(height=600, barmode="relative", legend=dict(orientation="h", y=-0.08))
+        return fig
+    
+    times = pd.to_datetime(breadth['batch_time'], utc=True).dt.tz_convert(PKT_TZ)
+    series = [breadth['ad_line'], breadth['net_advances'], breadth['up_down_volume_ratio'], breadth['new_highs'], -breadth['new_lows']]
+    
+    def update(fig):
+        for trace, values in zip(fig.data, series):
+            trace.x = times
+            trace.y = values.to_numpy()
+    
+    st.plotly_chart(batch_figure("breadth", build, update), use_container_width=True)
+
+def batch_figure(name, build, update):
+    """Per-session figure whose layout is built once; later runs only swap trace data
+    
+    Building Plotly figures (templates, axes, colour scales) dominates a
+    rerun, so stepping through batches reuses the session's figure and
+    assigns the new arrays to its traces.
+    """
+    figures = st.session_state.setdefault('batch_figures', {})
+    fig = figures.get(name)
+    if fig is None:
+        fig = build()
+        figures[name] = fig
+    with fig.batch_update():
+        update(fig)
+    return fig
+
+def color_bar(title, colorscale):
+    """Bar chart with a continuous colour scale on its values (px.bar style)"""
+    import plotly.graph_objects as go
+    
+    fig = go.Figure(go.Bar(marker=dict(colorscale=colorscale, showscale=True, colorbar=dict(title=title))))
+    return fig
+
+def correlation_heatmap(labels, corr, title):
+    """Heatmap figure of a correlation matrix"""
+    import plotly.graph_objects as go
+    
+    fig = go.Figure(go.Heatmap(
+        z=corr,
+        x=labels,
+        y=labels,
+        zmin=-1,
+        zmax=1,
+        colorscale='RdBu',
+        reversescale=True
+    ))
+    fig.update_layout(
+        title=title,
+        height=700,
+        yaxis=dict(autorange="reversed")
+    )
+    return fig
+
+def display_correlation_clusters(df, session_date):
+    """Display a clustered correlation heatmap of intraday returns
+    
+    The matrix and clustering are computed in the analytics pool; while a
+    job runs, the previous result for the same selection (or the estimate
+    over the sessions done so far) is shown instead.
+    """
+    with st.expander("🔗 Correlation Clusters (intraday returns)"):
+        col1, col2 = st.columns(2)
+        with col1:
+            days = st.selectbox("Window (trading days)", [1, 3, 5, 10], key="corr_days")
+        with col2:
+            n_symbols = st.slider("Symbols (by turnover)", min_value=10, max_value=200, value=50, step=10, key="corr_symbols")
+        
+        window = tuple(d.date() for d in pd.bdate_range(end=session_date, periods=days))
+        symbols = get_topk_engine(df).top('turnover', n_symbols)['symbol'].tolist()
+        job = submit_analytics(
+            'correlation',
+            correlation_job,
+            window,
+            symbols,
+            {'current_price': 'prices'},
+            outputs={'corr': ((len(symbols), len(symbols)), 'f8')},
+            incremental=True
+        )
+        if job is None or len(symbols) < 2:
+            st.info("Not enough batches in this window to compute correlations")
+            return
+        
+        def show(result, note=""):
+            order = result['order']
+            fig = correlation_heatmap(
+                [symbols[i] for i in order],
+                result['corr'][np.ix_(order, order)],
+                f"Return correlation over {result['n_obs']} intervals ({days} day window){note}"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        
+        def show_partial(running):
+            previous = get_analytics_executor().latest(running.family)
+            if previous is not None:
+                show(previous.result(), " · updating")
+                return
+            corr = running.partial('corr')
+            if corr is not None and np.isfinite(corr).any():
+                st.plotly_chart(correlation_heatmap(symbols, corr, "Partial estimate (unclustered)"), use_container_width=True)
+        
+        if not job.done():
+            watch_analytics_job(job, "Computing correlations...", show_partial)
+        elif job.failed():
+            st.error(f"Error computing correlations: {str(job.future.exception())}")
+        else:
+            show(job.result())
+
+def display_window_summary(df, session_date):
+    """Display multi-day returns, volatility and indicators for every symbol"""
+    with st.expander("📅 Multi-day Summary"):
+        days = st.selectbox("Window (trading days)", [3, 5, 10], key="summary_days")
+        window = tuple(d.date() for d in pd.bdate_range(end=session_date, periods=days))
+        symbols = sorted(df['symbol'].dropna().unique().tolist())
+        job = submit_analytics(
+            'summary',
+            summary_job,
+            window,
+            symbols,
+            {'current_price': 'price', 'high': 'high', 'low': 'low', 'volume': 'volume'}
+        )
+        if job is None:
+            st.info("No batches in this window yet")
+            return
+        
+        if not job.done():
+            watch_analytics_job(job, f"Aggregating {days} trading days...")
+            return
+        if job.failed():
+            st.error(f"Error computing the multi-day summary: {str(job.future.exception())}")
+            return
+        
+        result = job.result()
+        summary = pd.DataFrame({
+            'Symbol': symbols,
+            'Return %': result['return_pct'],
+            'Volatility %': result['volatility_pct'],
+            'Avg Range %': result['range_pct'],
+            'Volume': result['volume'],
+            'Up Days': result['up_days'],
+            'RSI (14)': result['rsi'],
+            'MACD Hist': result['macd_hist'],
+        })
+        st.caption(f"{len(job.key[-1])} session(s) with data · volatility is the std of 5-minute returns · RSI and MACD over the window's batch closes")
+        st.dataframe(
+            summary.sort_values('Return %', ascending=False),
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                'Return %': st.column_config.NumberColumn(format="%.2f"),
+                'Volatility %': st.column_config.NumberColumn(format="%.3f"),
+                'Avg Range %': st.column_config.NumberColumn(format="%.2f"),
+                'Volume': st.column_config.NumberColumn(format="%.0f"),
+                'Up Days': st.column_config.NumberColumn(format="%d"),
+                'RSI (14)': st.column_config.NumberColumn(format="%.1f"),
+                'MACD Hist': st.column_config.NumberColumn(format="%.3f"),
+            }
+        )
+
+def display_portfolio(df, batch_time):
+    """Display mark-to-market, P&L and sector exposure of a holdings file"""
+    uploaded = get_uploaded_portfolios()
+    
+    with st.expander("💼 Portfolio Tracker"):
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            upload = st.file_uploader("Holdings CSV (symbol, quantity, cost)", type=['csv'], key="portfolio_file")
+        with col2:
+            name = st.text_input("Portfolio name", value="My Portfolio", key="portfolio_name").strip() or "My Portfolio"
+            if st.button("Load Holdings", use_container_width=True, disabled=upload is None):
+                try:
+                    uploaded.set_portfolio(name, read_holdings(upload))
+                    st.session_state.portfolio_selected = name
+                except ValueError as e:
+                    st.error(f"Error reading holdings: {str(e)}")
+        
+        # An uploaded portfolio hides a preloaded one of the same name
+        books = {name: get_portfolio_book() for name in get_portfolio_book().names()}
+        books.update((name, uploaded) for name in uploaded.names())
+        names = list(books)
+        if not names:
+            st.info("Upload a holdings file to value it against every batch")
+            return
+        if st.session_state.get('portfolio_selected') not in names:
+            st.session_state.portfolio_selected = names[0]
+        selected = st.selectbox("Portfolio", names, key="portfolio_selected")
+        
+        # Every portfolio is valued once per batch; reruns reuse the valuation
+        valuation = books[selected].mark(batch_bucket([batch_time])[0], df)
+        summary = valuation.summary(selected)
+        
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Market Value", f"{summary['value']:,.0f}")
+        col2.metric("Unrealized P&L", f"{summary['unrealized_pnl']:+,.0f}", f"{summary['unrealized_pct']:+.2f}%")
+        col3.metric("Day P&L", f"{summary['day_pnl']:+,.0f}", f"{summary['day_return_pct']:+.2f}%")
+        col4.metric("Positions", f"{summary['positions']:,}")
+        if summary['unpriced']:
+            st.caption(f"{summary['unpriced']} position(s) not in this batch are carried at cost")
+        
+        positions = valuation.positions(selected)
+        col1, col2 = st.columns([3, 2])
+        with col1:
+            st.dataframe(
+                positions.drop(columns=['priced']).rename(columns={
+                    'symbol': 'Symbol', 'quantity': 'Qty', 'cost': 'Cost', 'price': 'Price',
+                    'value': 'Value', 'weight_pct': 'Weight %', 'unrealized_pnl': 'Unrealized P&L',
+                    'unrealized_pct': 'Unrealized %', 'day_pnl': 'Day P&L', 'day_change_pct': 'Day %',
+                    'contribution_pct': 'Contribution %', 'sector': 'Sector',
+                }),
+                use_container_width=True,
+                hide_index=True,
+                height=350,
+                column_config={
+                    'Qty': st.column_config.NumberColumn(format="%.0f"),
+                    'Cost': st.column_config.NumberColumn(format="%.2f"),
+                    'Price': st.column_config.NumberColumn(format="%.2f"),
+                    'Value': st.column_config.NumberColumn(format="%.0f"),
+                    'Weight %': st.column_config.NumberColumn(format="%.2f"),
+                    'Unrealized P&L': st.column_config.NumberColumn(format="%.0f"),
+                    'Unrealized %': st.column_config.NumberColumn(format="%.2f"),
+                    'Day P&L': st.column_config.NumberColumn(format="%.0f"),
+                    'Day %': st.column_config.NumberColumn(format="%.2f"),
+                    'Contribution %': st.column_config.NumberColumn(format="%.3f"),
+                }
+            )
+        with col2:
+            import plotly.graph_objects as go
+            
+            exposure = valuation.sector_exposure(selected).iloc[::-1]
+            fig = go.Figure(go.Bar(
+                x=exposure.values,
+                y=exposure.index,
+                orientation='h',
+                marker_color='#3b82f6',
+                hovertemplate='%{y}: %{x:.1f}%<extra></extra>'
+            ))
+            fig.update_layout(
+                title="Sector Exposure (% of value)",
+                height=350,
+                margin=dict(l=10, r=10, t=40, b=10),
+                xaxis_title=None,
+                yaxis_title=None
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+def display_screener(df, batch_time):
+    """Screen expression over the loaded batch; returns its row mask (None when unused)"""
+    book = get_screen_book()
+    user = st.session_state.get('alert_user', 'default').strip() or 'default'
+    saved = book.screens_for(user)
+    choices = {f"⭐ {name}": expression for name, expression in saved.items()}
+    choices.update(PRESET_SCREENS)
+    
+    with st.expander("🧮 Screener", expanded=bool(st.session_state.get('screen_expression'))):
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            preset = st.selectbox("Saved & preset screens", ["—"] + list(choices), key="screen_preset")
+        # Load a picked screen into the editor once; later edits are kept
+        if preset != "—" and st.session_state.get('screen_loaded') != preset:
+            st.session_state.screen_expression = choices[preset]
+        st.session_state.screen_loaded = preset
+        with col2:
+            expression = st.text_input(
+                "Screen expression",
+                key="screen_expression",
+                placeholder='change_pct > 3 and volume_ratio_12 > 2 and sector == "CEMENT"'
+            )
+        windowed = ", ".join(f"{name}_N" for name in INDICATORS)
+        st.caption(
+            "Fields: price, open, high, low, ldcp, change, change_pct, volume, turnover, symbol, sector, listed_in · "
+            f"Indicators (N = window in 5-minute batches): {windowed}, {', '.join(INTERVAL_INDICATORS)} · "
+            "Operators: and, or, not, in, + - * / **, abs, min, max, sqrt, log, between(x, lo, hi)"
+        )
+        if not expression or not expression.strip():
+            return None
+        
+        try:
+            screen = compile_screen(expression)
+            history, upto = history_upto(batch_time) if screen.indicators else (None, None)
+            mask = screen.evaluate(df, history, upto=upto)
+        except ScreenError as e:
+            st.error(f"Invalid screen: {str(e)}")
+            return None
+        
+        col1, col2, col3 = st.columns([2, 2, 1])
+        col1.markdown(f"**{int(mask.sum())}** of {len(mask)} symbols match")
+        name = col2.text_input("Save as", key="screen_name", placeholder="Screen name", label_visibility="collapsed")
+        if col3.button("💾 Save", use_container_width=True, disabled=not name):
+            book.save_screen(user, name, expression)
+            st.rerun()
+        if preset.startswith("⭐ ") and st.button(f"🗑 Delete {preset[2:]}"):
+            book.remove_screen(user, preset[2:])
+            st.rerun()
+        return mask
+
+def display_alerts_sidebar(monitor, df):
+    """Sidebar panel for watchlists, alert rules and triggered alerts"""
+    book = monitor.book
+    
+    st.markdown("---")
+    st.subheader("🔔 Watchlists & Alerts")
+    
+    user = st.text_input("Alert profile", value="default", key="alert_user").strip() or "default"
+    symbols = sorted(df['symbol'].dropna().unique().tolist()) if 'symbol' in df.columns else []
+    watchlists = book.watchlists.get(user, {})
+    
+    with st.expander("📝 Watchlists"):
+        name = st.text_input("Watchlist name", key="watchlist_name")
+        # Saved symbols missing from this batch (delisted or not scraped) cannot be defaults;
+        # keyed by name so switching watchlists loads its members
+        saved = watchlists.get(name, [])
+        missing = [symbol for symbol in saved if symbol not in symbols]
+        members = st.multiselect("Symbols", symbols, default=[symbol for symbol in saved if symbol in symbols], key=f"watchlist_members_{name}")
+        if missing:
+            st.caption(f"Not in this batch (dropped if you save): {', '.join(missing)}")
+        if st.button("Save Watchlist", use_container_width=True) and name:
+            book.set_watchlist(user, name, members)
+            st.rerun()
+        for existing, existing_members in watchlists.items():
+            st.markdown(f"**{existing}**: {', '.join(existing_members) or '—'}")
+    
+    with st.expander("➕ New Alert Rule"):
+        target = st.selectbox("Symbol or watchlist", list(watchlists) + symbols, key="alert_target")
+        kind = st.selectbox(
+            "Condition",
+            list(RULE_KINDS),
+            format_func=lambda key: RULE_KINDS[key][0],
+            key="alert_kind"
+        )
+        threshold = st.number_input("Threshold", value=0.0, step=0.5, key="alert_threshold")
+        if st.button("Add Rule", use_container_width=True) and target:
+            book.add_rule(user, target, kind, threshold)
+            st.rerun()
+    
+    rules = book.rules_for(user)
+    if rules:
+        with st.expander(f"📋 My Rules ({len(rules)})"):
+            for rule in rules:
+                col1, col2 = st.columns([4, 1])
+                col1.markdown(f"{rule['target']}: {RULE_KINDS[rule['kind']][0]} {rule['threshold']:g}")
+                if col2.button("✖", key=f"remove_rule_{rule['id']}"):
+                    book.remove_rule(rule['id'])
+                    st.rerun()
+    
+    # Conditions currently true and recent crossings for this profile
+    active = monitor.active[monitor.active['user'] == user]
+    if not active.empty:
+        st.warning(f"⚡ {len(active)} alert condition(s) active")
+        st.dataframe(
+            active[['symbol', 'kind', 'threshold', 'value']],
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    events = monitor.events_for(user)[:20]
+    if events:
+        st.markdown("**Recent triggers:**")
+        for event in events:
+            when = pd.Timestamp(event['batch']).tz_convert(PKT_TZ).strftime('%H:%M')
+            st.markdown(f"- {when} **{event['symbol']}** {RULE_KINDS[event['kind']][0]} {event['threshold']:g} ({event['value']:,.2f})")
+
+def display_quality_report(df):
+    """Display the ingest validation report attached to the loaded batch"""
+    report = df.attrs.get('quality')
+    if report is None:
+        return
+    
+    if report.issues == 0:
+        st.caption(f"🧪 Data quality: {report.rows_out} rows, no issues detected")
+        return
+    
+    with st.expander(f"🧪 Data Quality ({report.clean_rows}/{report.rows_out} clean rows)"):
+        st.json(report.as_dict())
+        flagged = df[df['quality_flags'] != 0]
+        if not flagged.empty:
+            flagged = flagged.assign(issues=[
+                ", ".join(label for bit, label in FLAG_LABELS.items() if flags & bit)
+                for flags in flagged['quality_flags']
+            ])
+            columns = [col for col in ['symbol', 'open_price', 'high', 'low', 'current_price', 'volume', 'issues'] if col in flagged.columns]
+            st.dataframe(flagged[columns], use_container_width=True, hide_index=True, height=250)
+
 def display_top_performers(metrics, df):
     """Display top gainers, losers, and most active stocks"""
     if df is None or df.empty:
@@ -770,9 +1327,91 @@ def display_top_performers(metrics, df):
             st.markdown("No data available")
             st.markdown('</div>', unsafe_allow_html=True)
 
+def display_unusual_volume(df, batch_time):
+    """Display symbols trading well above their usual volume for this time of day"""
+    st.markdown("### 📈 Unusual Volume")
+    
+    session_date = pd.Timestamp(batch_time).tz_convert(PKT_TZ).date()
+    baseline = get_volume_baseline(session_date)
+    if not baseline.sessions:
+        st.info("No earlier sessions to compare against yet")
+        return
+    
+    unusual = baseline.unusual(df, batch_time)
+    st.caption(
+        f"Cumulative volume vs the average at this time of day over the previous {len(baseline.sessions)} session(s) · "
+        f"showing ratios of {UNUSUAL_RATIO:g}x or more"
+    )
+    if unusual.empty:
+        st.markdown("No unusual volume at this batch")
+        return
+    
+    st.dataframe(
+        unusual.rename(columns={
+            'symbol': 'Symbol', 'sector': 'Sector', 'current_price': 'Price', 'change_percent': 'Change %',
+            'volume': 'Volume', 'expected_volume': 'Usual by now', 'ratio': 'Ratio', 'sessions': 'Sessions',
+        }),
+        use_container_width=True,
+        hide_index=True,
+        column_order=['Symbol', 'Sector', 'Price', 'Change %', 'Volume', 'Usual by now', 'Ratio', 'Sessions'],
+        column_config={
+            'Price': st.column_config.NumberColumn(format="%.2f"),
+            'Change %': st.column_config.NumberColumn(format="%+.2f"),
+            'Volume': st.column_config.NumberColumn(format="%.0f"),
+            'Usual by now': st.column_config.NumberColumn(format="%.0f"),
+            'Ratio': st.column_config.NumberColumn(format="%.1fx"),
+        }
+    )
+
+def display_topk_rankings(df):
+    """Display ranked top-K lists for a chosen metric, optionally per sector"""
+    if df is None or df.empty:
+        return
+    
+    st.markdown("### 🥇 Top-K Rankings")
+    
+    engine = get_topk_engine(df)
+    
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+    
+    with col1:
+        metric = st.selectbox(
+            "Rank by",
+            options=list(TOPK_METRICS.keys()),
+            format_func=lambda key: TOPK_METRICS[key],
+            key="topk_metric"
+        )
+    
+    with col2:
+        k = st.number_input("K", min_value=1, max_value=100, value=10, step=1, key="topk_k")
+    
+    with col3:
+        direction = st.radio("Order", ["Top", "Bottom"], horizontal=True, key="topk_direction")
+    
+    with col4:
+        per_sector = st.checkbox("Per sector", key="topk_per_sector")
+    
+    largest = direction == "Top"
+    if per_sector:
+        ranked = engine.top_by_sector(metric, int(k), largest=largest)
+    else:
+        ranked = engine.top(metric, int(k), largest=largest)
+    
+    if ranked.empty:
+        st.info("No rankable data for this metric")
+        return
+    
+    columns = [col for col in ['rank', 'symbol', 'sector', 'current_price', 'change_percent', 'volume'] if col in ranked.columns]
+    table = ranked[columns + ['metric_value']].rename(columns={'metric_value': TOPK_METRICS[metric]})
+    st.dataframe(table, use_container_width=True, hide_index=True, height=300)
+
 def main():
     # Display professional header with navigation
     display_header_with_nav()
+    BOOT.mark("first_paint")
+    
+    # Backend creation (and the supabase import) happens after the header is on screen
+    data_manager = get_data_manager()
     
     # Cloud-themed subheader
     st.markdown("""
@@ -798,23 +1437,36 @@ def main():
         st.markdown("---")
         
         # Connection status
-        if supabase:
+        if data_manager:
             st.success("✅ Connected to PSX Cloud Database")
         else:
             st.error("❌ Database Connection Failed")
             st.info("Check your .env file for SUPABASE_URL and SUPABASE_KEY")
         
+        # Optional headless API over the same caches
+        api_server = get_api_server() if data_manager else None
+        if api_server is not None:
+            host, port = api_server.server_address[:2]
+            st.caption(f"🔌 API on http://{host}:{port}")
+        
+        # Live updates replace manual refreshes when a listener is configured
+        listener = get_realtime_listener() if data_manager else None
+        if listener is not None:
+            st.markdown("---")
+            st.checkbox("Follow live batches", value=True, key="live_follow")
+            watch_live_batches(listener)
+        
         # Refresh data button
         st.markdown("---")
         if st.button("🔄 Refresh Market Data", use_container_width=True, type="primary"):
             with st.spinner("Fetching latest market data..."):
                 try:
-                    st.session_state.available_batches = DataManager.get_available_batches()
+                    st.session_state.available_batches = get_data_manager().get_session_batches()
                     if st.session_state.available_batches:
                         # Get the latest batch
                         latest_batch = st.session_state.available_batches[0]
                         st.session_state.selected_batch = latest_batch
-                        st.session_state.current_data = DataManager.get_data_by_timestamp(latest_batch)
+                        st.session_state.current_data = load_batch(latest_batch)
                         st.session_state.last_refresh = datetime.now(PKT_TZ)
                         st.rerun()
                     else:
@@ -827,52 +1479,12 @@ def main():
         st.subheader("📅 Select Data Batch")
         
         # Get available batches if not already loaded
-        if not st.session_state.available_batches:
+        if not st.session_state.available_batches and data_manager:
             with st.spinner("Loading available batches..."):
-                st.session_state.available_batches = DataManager.get_available_batches()
+                st.session_state.available_batches = data_manager.get_session_batches()
         
         if st.session_state.available_batches:
-            # Format batch times for display
-            batch_options = []
-            for batch in st.session_state.available_batches:
-                if hasattr(batch, 'strftime'):
-                    formatted_time = batch.strftime("%Y-%m-%d %H:%M:%S")
-                    batch_options.append((formatted_time, batch))
-                else:
-                    # Handle if batch is not a datetime object
-                    try:
-                        formatted_time = pd.Timestamp(batch).strftime("%Y-%m-%d %H:%M:%S")
-                        batch_options.append((formatted_time, batch))
-                    except:
-                        continue
-            
-            if batch_options:
-                # Create selectbox
-                selected_option = st.selectbox(
-                    "Available Batches",
-                    options=[opt[0] for opt in batch_options],
-                    index=0
-                )
-                
-                # Find selected batch
-                selected_batch = None
-                for opt in batch_options:
-                    if opt[0] == selected_option:
-                        selected_batch = opt[1]
-                        break
-                
-                # Load button for selected batch
-                if st.button("📥 Load Selected Batch", use_container_width=True) and selected_batch:
-                    with st.spinner(f"Loading data for {selected_option}..."):
-                        try:
-                            st.session_state.selected_batch = selected_batch
-                            st.session_state.current_data = DataManager.get_data_by_timestamp(selected_batch)
-                            st.session_state.last_refresh = datetime.now(PKT_TZ)
-                            st.rerun()
-                        except Exception as e:
-                            st.error(f"Error loading batch: {str(e)}")
-            else:
-                st.info("No valid batches available")
+            display_batch_slider(data_manager)
         else:
             st.info("No data batches available")
         
@@ -882,10 +1494,14 @@ def main():
             st.markdown(f"**Last Refresh:**")
             st.markdown(f"{st.session_state.last_refresh.strftime('%H:%M:%S')}")
         
+        # Data age and database reachability (stale data is served during outages)
+        if data_manager:
+            display_data_age(data_manager)
+        
         st.markdown('</div>', unsafe_allow_html=True)
     
     # Main content area
-    if not supabase:
+    if not data_manager:
         st.error("""
         ## ⚠️ Database Setup Required
         
@@ -918,15 +1534,59 @@ def main():
             except:
                 st.success(f"📊 Displaying market data")
         
+        # Show the ingest validation report
+        display_quality_report(df)
+        
         # Calculate metrics
-        metrics = DataManager.calculate_market_metrics(df)
+        metrics = DataManager.calculate_market_metrics(df, engine=get_topk_engine(df))
         
         # Display metrics
         display_market_metrics(metrics)
         
+        # Display session breadth from the shared, incrementally extended history
+        if st.session_state.selected_batch is not None:
+            try:
+                session_batch = pd.Timestamp(st.session_state.selected_batch).tz_convert(PKT_TZ)
+                latest_batch = st.session_state.available_batches[0] if st.session_state.available_batches else None
+                display_market_breadth(update_session_breadth(session_batch.date(), latest_batch))
+            except Exception as e:
+                st.error(f"Error creating breadth chart: {str(e)}")
+            
+            try:
+                display_correlation_clusters(df, session_batch.date())
+            except Exception as e:
+                st.error(f"Error creating correlation heatmap: {str(e)}")
+            
+            try:
+                display_window_summary(df, session_batch.date())
+            except Exception as e:
+                st.error(f"Error creating multi-day summary: {str(e)}")
+            
+            try:
+                display_portfolio(df, st.session_state.selected_batch)
+            except Exception as e:
+                st.error(f"Error valuing portfolio: {str(e)}")
+            
+            try:
+                monitor = evaluate_alerts(df, st.session_state.selected_batch)
+                with st.sidebar:
+                    display_alerts_sidebar(monitor, df)
+            except Exception as e:
+                st.error(f"Error evaluating alerts: {str(e)}")
+        
         # Display top performers
         display_top_performers(metrics, df)
         
+        # Volume against the same time of day in earlier sessions
+        if st.session_state.selected_batch is not None:
+            try:
+                display_unusual_volume(df, st.session_state.selected_batch)
+            except Exception as e:
+                st.error(f"Error detecting unusual volume: {str(e)}")
+        
+        # Display configurable top-K rankings
+        display_topk_rankings(df)
+        
         # Format data for display (11 columns)
         display_df = DataManager.format_data_for_display(df)
         
@@ -952,7 +1612,12 @@ def main():
         
         with col2:
             # Search symbol
-            search_symbol = st.text_input("🔎 Search Symbol", placeholder="Enter stock symbol...")
+            search_symbol = st.text_input("🔎 Search Symbol", placeholder="Symbol, company or sector...")
+            search_index = get_search_index(search_universe(df)) if 'symbol' in df.columns else None
+            if search_symbol and search_index is not None:
+                suggestions = search_index.search(search_symbol, limit=5)
+                if suggestions:
+                    st.caption("Top matches: " + " · ".join(f"**{symbol}** ({MATCH_LABELS[kind]})" for symbol, kind, _ in suggestions))
             
             # Sort options
             sort_by = st.selectbox(
@@ -963,29 +1628,35 @@ def main():
                  "Current Price (High to Low)", "Current Price (Low to High)"]
             )
         
+        # Screen expression over the raw batch columns (rows align with display_df)
+        try:
+            screen_mask = display_screener(df, st.session_state.selected_batch) if st.session_state.selected_batch is not None else None
+        except Exception as e:
+            screen_mask = None
+            st.error(f"Error running screen: {str(e)}")
+        
         # Apply filters
-        filtered_df = display_df.copy()
+        filtered_df = display_df[screen_mask] if screen_mask is not None else display_df.copy()
         
         # Apply sector filter
         if 'Sector' in filtered_df.columns and selected_sector != 'All':
             filtered_df = filtered_df[filtered_df['Sector'] == selected_sector]
         
-        # Apply change filter - ensure Change(%) is numeric
+        # Apply change filter
         if 'Change(%)' in filtered_df.columns:
-            try:
-                filtered_df['Change(%)'] = pd.to_numeric(filtered_df['Change(%)'], errors='coerce')
-                if change_filter == "Gainers (+)":
-                    filtered_df = filtered_df[filtered_df['Change(%)'] > 0]
-                elif change_filter == "Losers (-)":
-                    filtered_df = filtered_df[filtered_df['Change(%)'] < 0]
-                elif change_filter == "Unchanged":
-                    filtered_df = filtered_df[filtered_df['Change(%)'] == 0]
-            except:
-                pass
+            if change_filter == "Gainers (+)":
+                filtered_df = filtered_df[filtered_df['Change(%)'] > 0]
+            elif change_filter == "Losers (-)":
+                filtered_df = filtered_df[filtered_df['Change(%)'] < 0]
+            elif change_filter == "Unchanged":
+                filtered_df = filtered_df[filtered_df['Change(%)'] == 0]
         
         # Apply search filter
         if search_symbol and 'Symbol' in filtered_df.columns:
-            filtered_df = filtered_df[filtered_df['Symbol'].str.contains(search_symbol, case=False, na=False)]
+            if search_index is not None:
+                filtered_df = filtered_df[search_index.filter_mask(filtered_df['Symbol'], search_symbol)]
+            else:
+                filtered_df = filtered_df[filtered_df['Symbol'].str.contains(search_symbol, case=False, na=False)]
         
         # Apply sorting
         if sort_by == "Symbol (A-Z)" and 'Symbol' in filtered_df.columns:
@@ -1073,64 +1744,88 @@ def main():
                 # Volume distribution
                 if 'Volume' in filtered_df.columns and 'Symbol' in filtered_df.columns:
                     try:
-                        top_volume = filtered_df.nlargest(10, 'Volume')[['Symbol', 'Volume']].copy()
-                        top_volume['Volume'] = pd.to_numeric(top_volume['Volume'], errors='coerce')
+                        # Rank within the current filter using the batch's top-K engine
+                        engine = get_topk_engine(df)
+                        top_volume = engine.top('volume', 10, mask=df.index.isin(filtered_df.index))
+                        
+                        def build_volume():
+                            fig = color_bar('Volume', 'Viridis')
+                            fig.update_layout(title='📊 Top 10 Stocks by Volume', xaxis_title="Symbol", yaxis_title="Volume")
+                            return fig
+                        
+                        def update_volume(fig):
+                            fig.data[0].x = top_volume['symbol'].to_numpy()
+                            fig.data[0].y = top_volume['volume'].to_numpy()
+                            fig.data[0].marker.color = top_volume['volume'].to_numpy()
                         
-                        fig1 = px.bar(
-                            top_volume,
-                            x='Symbol',
-                            y='Volume',
-                            title='📊 Top 10 Stocks by Volume',
-                            color='Volume',
-                            color_continuous_scale='Viridis'
-                        )
-                        fig1.update_layout(xaxis_title="Symbol", yaxis_title="Volume")
-                        st.plotly_chart(fig1, use_container_width=True)
+                        st.plotly_chart(batch_figure("top_volume", build_volume, update_volume), use_container_width=True)
                     except Exception as e:
                         st.error(f"Error creating volume chart: {str(e)}")
             
             with col2:
-                # Performance scatter
-                if all(col in filtered_df.columns for col in ['Change(%)', 'Volume', 'Symbol']):
+                # Performance scatter, or the whole session animated batch by batch
+                replay = st.toggle("🎬 Replay the day", key="replay_mode", help="Animate this chart across every batch of the session")
+                if replay and st.session_state.selected_batch is not None and 'Symbol' in filtered_df.columns:
                     try:
-                        scatter_df = filtered_df.copy()
-                        scatter_df['Change(%)'] = pd.to_numeric(scatter_df['Change(%)'], errors='coerce')
-                        scatter_df['Volume'] = pd.to_numeric(scatter_df['Volume'], errors='coerce')
-                        
-                        # Try to get current price for sizing
-                        if 'Current' in scatter_df.columns:
-                            scatter_df['Current'] = pd.to_numeric(scatter_df['Current'], errors='coerce')
-                            size_col = 'Current'
+                        session_date = pd.Timestamp(st.session_state.selected_batch).tz_convert(PKT_TZ).date()
+                        history = load_session_history(session_date)
+                        fig = get_replay_figure(session_date, history.n_batches, tuple(filtered_df['Symbol']))
+                        if fig is not None:
+                            st.plotly_chart(fig, use_container_width=True)
                         else:
-                            size_col = None
+                            st.info("No batches recorded for this session yet")
+                    except Exception as e:
+                        st.error(f"Error creating replay: {str(e)}")
+                elif all(col in filtered_df.columns for col in ['Change(%)', 'Volume', 'Symbol']):
+                    try:
+                        scatter_df = filtered_df
+                        
+                        def build_scatter():
+                            import plotly.graph_objects as go
+                            
+                            fig = go.Figure(go.Scattergl(
+                                mode='markers',
+                                marker=dict(colorscale='RdYlGn', showscale=True, colorbar=dict(title='Change(%)'), sizemode='area', sizemin=2),
+                                hovertemplate="<b>%{hovertext}</b><br>Change(%)=%{y}<br>Volume=%{x}<extra></extra>"
+                            ))
+                            fig.update_layout(title='📈 Performance: Change % vs Volume', xaxis_title="Volume", yaxis_title="Change %")
+                            return fig
+                        
+                        def update_scatter(fig):
+                            trace = fig.data[0]
+                            trace.x = scatter_df['Volume'].to_numpy()
+                            trace.y = scatter_df['Change(%)'].to_numpy()
+                            trace.hovertext = scatter_df['Symbol'].to_numpy()
+                            trace.marker.color = scatter_df['Change(%)'].to_numpy()
+                            # Size markers by current price when available (area scaled like px)
+                            if 'Current' in scatter_df.columns:
+                                sizes = scatter_df['Current'].fillna(0).clip(lower=0).to_numpy()
+                                trace.marker.size = sizes
+                                trace.marker.sizeref = 2.0 * max(sizes.max(), 1e-9) / (20 ** 2)
+                            else:
+                                trace.marker.size = None
                         
-                        fig2 = px.scatter(
-                            scatter_df,
-                            x='Volume',
-                            y='Change(%)',
-                            size=size_col,
-                            color='Change(%)',
-                            hover_name='Symbol',
-                            title='📈 Performance: Change % vs Volume',
-                            color_continuous_scale='RdYlGn',
-                            hover_data=['Symbol', 'Change(%)', 'Volume']
-                        )
-                        fig2.update_layout(
-                            xaxis_title="Volume",
-                            yaxis_title="Change %"
-                        )
-                        st.plotly_chart(fig2, use_container_width=True)
+                        st.plotly_chart(batch_figure("performance", build_scatter, update_scatter), use_container_width=True)
                     except Exception as e:
                         st.error(f"Error creating scatter chart: {str(e)}")
             
+            # Market map of the whole batch
+            st.markdown("### 🗺️ Market Map")
+            try:
+                fig = get_market_map(df)
+                if fig is not None:
+                    st.caption("Tiles sized by turnover (volume × price), coloured by change %")
+                    st.plotly_chart(fig, use_container_width=True)
+                else:
+                    st.info("No traded symbols in this batch")
+            except Exception as e:
+                st.error(f"Error creating market map: {str(e)}")
+            
             # Sector analysis
             st.markdown("### 🏢 Sector Analysis")
             if 'Sector' in filtered_df.columns and 'Change(%)' in filtered_df.columns:
                 try:
-                    sector_df = filtered_df.copy()
-                    sector_df['Change(%)'] = pd.to_numeric(sector_df['Change(%)'], errors='coerce')
-                    
-                    sector_stats = sector_df.groupby('Sector').agg({
+                    sector_stats = filtered_df.groupby('Sector').agg({
                         'Symbol': 'count',
                         'Change(%)': 'mean'
                     }).reset_index()
@@ -1139,28 +1834,30 @@ def main():
                     col1, col2 = st.columns(2)
                     
                     with col1:
-                        fig3 = px.bar(
-                            sector_stats,
-                            x='Sector',
-                            y='Count',
-                            title='📊 Stocks per Sector',
-                            color='Count',
-                            color_continuous_scale='Blues'
-                        )
-                        fig3.update_layout(xaxis_title="Sector", yaxis_title="Number of Stocks")
-                        st.plotly_chart(fig3, use_container_width=True)
+                        def build_count():
+                            fig = color_bar('Count', 'Blues')
+                            fig.update_layout(title='📊 Stocks per Sector', xaxis_title="Sector", yaxis_title="Number of Stocks")
+                            return fig
+                        
+                        def update_count(fig):
+                            fig.data[0].x = sector_stats['Sector'].to_numpy()
+                            fig.data[0].y = sector_stats['Count'].to_numpy()
+                            fig.data[0].marker.color = sector_stats['Count'].to_numpy()
+                        
+                        st.plotly_chart(batch_figure("sector_count", build_count, update_count), use_container_width=True)
                     
                     with col2:
-                        fig4 = px.bar(
-                            sector_stats,
-                            x='Sector',
-                            y='Change(%)',
-                            title='📈 Average Change % per Sector',
-                            color='Change(%)',
-                            color_continuous_scale='RdYlGn'
-                        )
-                        fig4.update_layout(xaxis_title="Sector", yaxis_title="Average Change %")
-                        st.plotly_chart(fig4, use_container_width=True)
+                        def build_change():
+                            fig = color_bar('Change(%)', 'RdYlGn')
+                            fig.update_layout(title='📈 Average Change % per Sector', xaxis_title="Sector", yaxis_title="Average Change %")
+                            return fig
+                        
+                        def update_change(fig):
+                            fig.data[0].x = sector_stats['Sector'].to_numpy()
+                            fig.data[0].y = sector_stats['Change(%)'].to_numpy()
+                            fig.data[0].marker.color = sector_stats['Change(%)'].to_numpy()
+                        
+                        st.plotly_chart(batch_figure("sector_change", build_change, update_change), use_container_width=True)
                 except Exception as e:
                     st.error(f"Error creating sector charts: {str(e)}")
         
@@ -1174,7 +1871,7 @@ def main():
             try:
                 latest_batch = st.session_state.available_batches[0]
                 st.session_state.selected_batch = latest_batch
-                st.session_state.current_data = DataManager.get_data_by_timestamp(latest_batch)
+                st.session_state.current_data = load_batch(latest_batch)
                 st.session_state.last_refresh = datetime.now(PKT_TZ)
                 st.rerun()
             except Exception as e:
@@ -1231,6 +1928,7 @@ def main():
     # Display footer at the bottom
     st.markdown("---")
     display_footer()
+    BOOT.mark("render_complete")
 
 if __name__ == "__main__":
     main()